@@ -0,0 +1,133 @@
+"""
+Text splitter benchmark.
+
+Splits synthetic pages with LangChain's RecursiveCharacterTextSplitter and
+with services.chunker.RecursiveChunker, records chars/sec, chunks/sec and
+peak RSS for each, and checks that both produce identical chunk texts.
+Pages mix paragraphs, short lines and unbroken runs (table rows, URLs)
+so every separator level is exercised.
+
+Run from the chat_pdf directory:
+
+    python -m benchmarks.chunker_benchmark --pages 100 1000 --output bench_chunker.json
+    python -m benchmarks.chunker_benchmark --baseline bench_chunker.json
+"""
+
+import argparse
+import os
+import platform
+import random
+import sys
+import time
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from benchmarks.common import Stage, compare_to_baseline, rate, synthetic_text, write_results
+from config import settings
+from services.chunker import RecursiveChunker
+
+DEFAULT_PAGES = [100, 1000]
+COMPARED_METRICS = ["chunker_chars_per_sec", "chunker_chunks_per_sec"]
+
+
+def synthetic_pages(pages: int, seed: int = 0):
+    rng = random.Random(seed)
+    documents = []
+    for page in range(pages):
+        paragraphs = []
+        for _ in range(rng.randint(2, 6)):
+            paragraphs.append("\n".join(synthetic_text(rng, rng.randint(20, 180))))
+        if rng.random() < 0.2:
+            # Text without any whitespace forces the character-level fallback
+            paragraphs.append("".join(rng.choice("abcdef0123456789|-") for _ in range(rng.randint(600, 3000))))
+        documents.append(Document(page_content="\n\n".join(paragraphs), metadata={"source": "synthetic.pdf", "page": page}))
+    return documents
+
+
+def run_splitter(splitter, documents):
+    with Stage() as stage:
+        chunks = splitter.split_documents(documents)
+    return chunks, stage
+
+
+def run_case(pages: int, repeats: int):
+    documents = synthetic_pages(pages, seed=pages)
+    characters = sum(len(document.page_content) for document in documents)
+    splitters = {
+        "langchain": RecursiveCharacterTextSplitter(chunk_size=settings.CHUNK_SIZE, chunk_overlap=settings.CHUNK_OVERLAP),
+        "chunker": RecursiveChunker(
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            token_encoding=settings.CHUNK_TOKEN_ENCODING,
+        ),
+    }
+
+    run = {"pages": pages, "characters": characters}
+    outputs = {}
+    for name, splitter in splitters.items():
+        best = None
+        for _ in range(repeats):
+            chunks, stage = run_splitter(splitter, documents)
+            best = stage if best is None or stage.seconds < best.seconds else best
+        outputs[name] = chunks
+        run[f"{name}_seconds"] = round(best.seconds, 4)
+        run[f"{name}_chars_per_sec"] = rate(characters, best.seconds)
+        run[f"{name}_chunks_per_sec"] = rate(len(chunks), best.seconds)
+        run[f"{name}_peak_rss_bytes"] = best.peak_rss_bytes
+        run[f"{name}_chunks"] = len(chunks)
+
+    expected = [chunk.page_content for chunk in outputs["langchain"]]
+    actual = [chunk.page_content for chunk in outputs["chunker"]]
+    run["boundaries_match"] = expected == actual
+    run["mismatched_chunks"] = sum(left != right for left, right in zip(expected, actual)) + abs(len(expected) - len(actual))
+    run["speedup"] = round(run["langchain_seconds"] / run["chunker_seconds"], 2) if run["chunker_seconds"] else None
+    run["tokens"] = sum(chunk.metadata["token_count"] for chunk in outputs["chunker"])
+    return run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=DEFAULT_PAGES, help="Page counts to benchmark")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per splitter; the fastest is reported")
+    parser.add_argument("--output", default="bench_chunker.json")
+    parser.add_argument("--baseline", help="Previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before failing")
+    args = parser.parse_args(argv)
+
+    results = {
+        "benchmark": "chunker",
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {"chunk_size": settings.CHUNK_SIZE, "chunk_overlap": settings.CHUNK_OVERLAP},
+        "runs": {},
+    }
+    mismatched = False
+    for pages in args.pages:
+        run = run_case(pages, args.repeats)
+        results["runs"][f"{pages}_pages"] = run
+        mismatched = mismatched or not run["boundaries_match"]
+        print(
+            f"{pages:>5} pages ({run['characters']} chars): "
+            f"langchain {run['langchain_seconds']}s, chunker {run['chunker_seconds']}s "
+            f"({run['speedup']}x), boundaries match: {run['boundaries_match']}"
+        )
+
+    output = args.output
+    if args.baseline and os.path.abspath(output) == os.path.abspath(args.baseline):
+        output = f"{output}.new"  # Never overwrite the baseline being compared against
+    write_results(output, results)
+    if mismatched:
+        print("RecursiveChunker boundaries differ from RecursiveCharacterTextSplitter.")
+        return 1
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, COMPARED_METRICS, args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from services.memory import current_rss_bytes
+
+# Chroma phones home on startup unless told otherwise; benchmarks must run offline
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+VOCABULARY = (
+    "application page template workflow customer restaurant order delivery dashboard form field "
+    "button component data model user role admin permission login signup profile payment card "
+    "location filter search favourite notification screen layout theme publish deploy preview "
+    "integration api webhook database table column record validation rule trigger automation "
+    "B2B B2C B2B2C onboarding welcome checkout cart menu category subcategory business platform"
+).split()
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Deterministic, model-free embeddings: each text is hashed into a seed for
+    a unit vector. Lets the pipeline be timed without downloading a model.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def _vector(self, text: str):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def synthetic_text(rng: random.Random, words: int):
+    lines = []
+    line = []
+    for index in range(words):
+        line.append(rng.choice(VOCABULARY))
+        if len(line) >= 12 or index == words - 1:
+            sentence = " ".join(line)
+            lines.append(sentence[0].upper() + sentence[1:] + ".")
+            line = []
+    return lines
+
+
+def _escape_pdf_text(text: str):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_synthetic_pdf(path: str, pages: int, words_per_page: int = 350, seed: int = 0):
+    """
+    Writes a text-only PDF with `pages` pages of pseudo-random platform
+    vocabulary, using only the standard library (no network, no fonts).
+    """
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for _ in range(pages):
+        lines = synthetic_text(rng, words_per_page)
+        text_ops = " T* ".join(f"({_escape_pdf_text(line)}) Tj" for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {text_ops} ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_number = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_number
+        )
+        page_refs.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(page_refs) + b"] /Count %d >>" % pages
+
+    with open(path, "wb") as pdf_file:
+        pdf_file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(pdf_file.tell())
+            pdf_file.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref_offset = pdf_file.tell()
+        pdf_file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            pdf_file.write(b"%010d 00000 n \n" % offset)
+        pdf_file.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+        )
+    return path
+
+
+class RssSampler:
+    """
+    Context manager that samples the process RSS on a background thread and
+    keeps the peak, so each stage reports its own high-water mark.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak_bytes = current_rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+
+
+class Stage:
+    """Times a block and records its peak RSS."""
+
+    def __init__(self):
+        self.seconds = None
+        self.peak_rss_bytes = None
+        self._sampler = RssSampler()
+
+    def __enter__(self):
+        self._sampler.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._started
+        self._sampler.__exit__(*exc_info)
+        self.peak_rss_bytes = self._sampler.peak_bytes
+
+
+def rate(count, seconds):
+    return round(count / seconds, 2) if seconds else None
+
+
+def write_results(path: str, results: dict):
+    with open(path, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"Results written to {path}")
+
+
+def compare_to_baseline(results: dict, baseline_path: str, metrics, tolerance: float):
+    """
+    Compares throughput metrics (higher is better) against a stored baseline.
+
+    Args:
+        results (dict): {"runs": {case: {metric: value}}} from this run.
+        baseline_path (str): JSON file in the same format.
+        metrics (list): Metric names to compare.
+        tolerance (float): Allowed relative slowdown, e.g. 0.15 for 15%.
+
+    Returns:
+        list: Human-readable regression descriptions (empty if none).
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+
+    regressions = []
+    for case, run in results["runs"].items():
+        reference = baseline.get("runs", {}).get(case)
+        if reference is None:
+            continue
+        for metric in metrics:
+            current, previous = run.get(metric), reference.get(metric)
+            if not current or not previous:
+                continue
+            change = (current - previous) / previous
+            print(f"{case:>12} {metric:<24} {previous:>12} -> {current:>12} ({change:+.1%})")
+            if change < -tolerance:
+                regressions.append(f"{case} {metric} dropped {change:.1%}")
+    return regressions
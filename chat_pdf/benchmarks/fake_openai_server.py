@@ -0,0 +1,221 @@
+"""
+Fake OpenAI-compatible chat completions server.
+
+Answers POST /v1/chat/completions (plain and streamed) with generated text
+after a configurable delay, and can fail a share of requests (or the first
+few) with 500 or 429 so retry handling can be exercised. It keeps HTTP/1.1 connections
+alive and counts them, which shows whether clients reuse connections.
+GET /stats returns the counters, including requests per model. Standard
+library only, so it runs offline. It also stands in for Ollama, whose
+OpenAI-compatible API lives under the same /v1 paths, and --model-latency
+gives each model its own delay so template routing can be observed.
+
+Run from the chat_pdf directory and point the service at it:
+
+    python -m benchmarks.fake_openai_server --port 8089 --latency 0.3 --token-delay 0.02
+    LLM_BASE_URL=http://localhost:8089/v1 OPENAI_API_KEY=fake python chat_pdf.py
+
+    python -m benchmarks.fake_openai_server --port 8089 --model-latency gpt-4o-mini=0.6 phi3=0.1
+    LLM_BASE_URL=http://localhost:8089/v1 OLLAMA_BASE_URL=http://localhost:8089/v1 LLM_SMALL_MODEL_NAME=phi3 \
+        OPENAI_API_KEY=fake python chat_pdf.py
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        latency: float = 0.2,
+        token_delay: float = 0.01,
+        tokens: int = 20,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        model_latency: dict = None,
+        fail_first: int = 0,
+        seed: int = 0,
+    ):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.model_latency = model_latency or {}
+        self.fail_first = fail_first
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"connections": 0, "requests": 0, "errors": 0, "rate_limited": 0, "in_flight": 0, "peak_in_flight": 0, "models": {}}
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+            if name == "in_flight":
+                self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+
+    def handle_error(self, request, client_address):
+        # Clients closing kept-alive connections is expected, not worth a traceback
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def draw(self):
+        with self._lock:
+            return self._random.random()
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n" % len(data) + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.server._lock:
+                self._send_json(200, json.loads(json.dumps(self.server.stats)))
+            return
+        self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        server = self.server
+        server.count("requests")
+        model = body.get("model", "fake")
+        with server._lock:
+            server.stats["models"][model] = server.stats["models"].get(model, 0) + 1
+
+        draw = server.draw()
+        with server._lock:
+            injected = server.stats["requests"] <= server.fail_first
+        if injected or draw < server.error_rate:
+            server.count("errors")
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+        if draw < server.error_rate + server.rate_limit_rate:
+            server.count("rate_limited")
+            self._send_json(429, {"error": {"message": "Injected rate limit", "type": "rate_limit"}}, {"Retry-After": "0"})
+            return
+
+        server.count("in_flight")
+        try:
+            time.sleep(server.model_latency.get(model, server.latency))
+            question = body["messages"][-1]["content"] if body.get("messages") else ""
+            pieces = [f"{'Answer' if index == 0 else ' token'}{index}" for index in range(server.tokens)]
+            completion = {"id": "chatcmpl-fake", "created": int(time.time()), "model": model}
+            if body.get("stream"):
+                self._stream(completion, pieces)
+            else:
+                time.sleep(server.token_delay * len(pieces))
+                usage = {"prompt_tokens": len(question.split()), "completion_tokens": len(pieces)}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                self._send_json(200, dict(
+                    completion,
+                    object="chat.completion",
+                    choices=[{"index": 0, "message": {"role": "assistant", "content": "".join(pieces)}, "finish_reason": "stop"}],
+                    usage=usage,
+                ))
+        finally:
+            server.count("in_flight", -1)
+
+    def _stream(self, completion: dict, pieces):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        deltas = [{"role": "assistant", "content": ""}] + [{"content": piece} for piece in pieces]
+        for index, delta in enumerate(deltas):
+            if index:
+                time.sleep(self.server.token_delay)
+            chunk = dict(completion, object="chat.completion.chunk", choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        final = dict(completion, object="chat.completion.chunk", choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        self._write_chunk(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, **options):
+    """Starts the fake server on a background thread and returns it (port 0 picks a free port)."""
+    server = FakeOpenAIServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_model_latency(values):
+    latencies = {}
+    for value in values or []:
+        model, _, seconds = value.partition("=")
+        latencies[model] = float(seconds)
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between tokens")
+    parser.add_argument("--tokens", type=int, default=20, help="Tokens per answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failed with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests failed with 429")
+    parser.add_argument("--model-latency", nargs="*", metavar="MODEL=SECONDS", help="Latency override per model")
+    parser.add_argument("--fail-first", type=int, default=0, help="Requests failed with 500 before any succeeds")
+    args = parser.parse_args(argv)
+
+    server = FakeOpenAIServer(
+        (args.host, args.port),
+        latency=args.latency,
+        token_delay=args.token_delay,
+        tokens=args.tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        model_latency=parse_model_latency(args.model_latency),
+        fail_first=args.fail_first,
+    )
+    print(f"Fake OpenAI-compatible server on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Ingestion throughput benchmark.
+
+Generates synthetic PDFs and times `ChatPDF.ingest` on each, the same code
+path as POST /ingest, into a fresh collection under a scratch directory.
+Records pages/sec, chunks/sec, the seconds spent in each ingestion stage and
+peak RSS. Runs fully offline with the deterministic stub embeddings, or with
+the configured local model (`--embedding local`, which must already be in
+the model cache); either is installed as the model registry's embedding.
+
+Run from the chat_pdf directory:
+
+    python -m benchmarks.ingest_benchmark --sizes 10 100 500 2000 --output bench_ingest.json
+    python -m benchmarks.ingest_benchmark --baseline bench_ingest.json
+"""
+
+import argparse
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.common import Stage, StubEmbeddings, compare_to_baseline, rate, write_results, write_synthetic_pdf
+from config import settings
+from services import ingest_jobs
+from services.ingest_jobs import IngestJob
+from services.model_registry import registry
+from services.pdf_extract import start_pool
+
+DEFAULT_SIZES = [10, 100, 500, 2000]
+COMPARED_METRICS = ["pages_per_sec", "chunks_per_sec"]
+
+
+def run_case(chat, collections, pages: int, work_directory: str):
+    pdf_path = write_synthetic_pdf(f"{work_directory}/synthetic_{pages}.pdf", pages, seed=pages)
+    collection_name = f"bench_{pages}"
+    # Opening a collection (and Chroma's client, the first time) is paid once per process, not per ingest
+    collections.create(collection_name)
+    job = IngestJob("benchmark", pdf_path)
+    with Stage() as ingest:
+        result = chat.ingest(
+            pdf_path, "benchmark", job=job, document_name=f"synthetic_{pages}.pdf", collection_name=collection_name
+        )
+    job.set_stage(ingest_jobs.COMPLETED)
+
+    chunks = result["chunks"]["added"]
+    return {
+        "pages": pages,
+        "chunks": chunks,
+        "total_seconds": round(ingest.seconds, 3),
+        "pages_per_sec": rate(pages, ingest.seconds),
+        "chunks_per_sec": rate(chunks, ingest.seconds),
+        "stage_seconds": dict(job.stage_seconds),
+        "peak_rss_bytes": ingest.peak_rss_bytes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Page counts to benchmark")
+    parser.add_argument("--embedding", choices=["stub", "local"], default="stub")
+    parser.add_argument("--workers", type=int, default=settings.PDF_EXTRACT_WORKERS, help="PDF extraction processes")
+    parser.add_argument("--output", default="bench_ingest.json")
+    parser.add_argument("--baseline", help="Previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before failing")
+    args = parser.parse_args(argv)
+
+    # Fork the extraction processes before any other thread starts, as the service does at boot
+    settings.PDF_EXTRACT_WORKERS = args.workers
+    start_pool(args.workers)
+    # Bypass the persistent embedding cache so every run measures the encoder
+    embedding = StubEmbeddings() if args.embedding == "stub" else getattr(registry.embedding(), "inner", registry.embedding())
+    registry._components["embedding"] = embedding
+    # ChatPDF builds its LLM client up front; the benchmark never calls it
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    work_directory = tempfile.mkdtemp(prefix="bench-ingest-")
+    import chat_pdf
+    from services.collection_manager import collections
+
+    collections.root_directory = work_directory
+    chat = chat_pdf.ChatPDF()
+    results = {
+        "benchmark": "ingest",
+        "created_at": time.time(),
+        "embedding": args.embedding,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {
+            "chunk_size": settings.CHUNK_SIZE,
+            "chunk_overlap": settings.CHUNK_OVERLAP,
+            "embed_batch_size": settings.INGEST_EMBED_BATCH_SIZE,
+            "window_chunks": settings.INGEST_WINDOW_CHUNKS,
+            "pdf_workers": args.workers,
+        },
+        "runs": {},
+    }
+    try:
+        for pages in args.sizes:
+            run = run_case(chat, collections, pages, work_directory)
+            results["runs"][f"{pages}_pages"] = run
+            print(
+                f"{pages:>5} pages: {run['chunks']} chunks in {run['total_seconds']}s "
+                f"({run['pages_per_sec']} pages/s, {run['chunks_per_sec']} chunks/s, "
+                f"peak RSS {run['peak_rss_bytes'] // (1024 * 1024)}MB)"
+            )
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    output = args.output
+    if args.baseline and os.path.abspath(output) == os.path.abspath(args.baseline):
+        output = f"{output}.new"  # Never overwrite the baseline being compared against
+    write_results(output, results)
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, COMPARED_METRICS, args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+LLM client benchmark.
+
+Starts the fake OpenAI-compatible server in-process, with a share of
+injected 500s and 429s, and drives the pooled LLM client the service uses
+(ChatOpenAI on a shared keep-alive pool behind PooledLLM) from many threads,
+half of the calls streamed. Reports throughput, latency and time to first
+token percentiles, retries and queue depth, and fails when the client
+breaks its contract:
+- more calls in flight than LLM_MAX_CONCURRENCY;
+- more connections opened than the pool size;
+- more retries than the budget allows;
+- a call that fails for a reason other than an exhausted retry budget or deadline.
+
+Run from the chat_pdf directory:
+
+    python -m benchmarks.llm_client_benchmark --requests 200 --threads 32 --output bench_llm_client.json
+    python -m benchmarks.llm_client_benchmark --baseline bench_llm_client.json
+"""
+
+import argparse
+import os
+import platform
+import sys
+import threading
+import time
+
+import numpy as np
+import openai
+from langchain_openai import ChatOpenAI
+
+from benchmarks.common import compare_to_baseline, rate, write_results
+from benchmarks.fake_openai_server import start_server
+from services.llm_client import LLMDeadlineExceeded, PooledLLM, RetryBudget, create_http_client
+
+COMPARED_METRICS = ["calls_per_sec"]
+
+
+def build_client(base_url: str, args):
+    llm = ChatOpenAI(
+        model="gpt-4o-mini",
+        openai_api_key="fake",
+        base_url=base_url,
+        max_retries=0,
+        http_client=create_http_client(args.concurrency, args.deadline),
+    )
+    return PooledLLM(
+        llm,
+        max_concurrency=args.concurrency,
+        deadline_seconds=args.deadline,
+        max_retries=args.retries,
+        retry_budget=RetryBudget(ratio=args.budget_ratio),
+        backoff_base_seconds=0.01,
+        backoff_max_seconds=0.1,
+    )
+
+
+def run_calls(client: PooledLLM, requests: int, threads: int):
+    latencies, first_tokens, outcomes = [], [], {}
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            started = time.perf_counter()
+            first_token = None
+            try:
+                if index % 2:
+                    for _ in client.stream(f"Question {index}?"):
+                        first_token = first_token or time.perf_counter()
+                else:
+                    client.invoke(f"Question {index}?")
+                outcome = "succeeded"
+            except LLMDeadlineExceeded:
+                outcome = "deadline_exceeded"
+            except (openai.InternalServerError, openai.RateLimitError):
+                outcome = "retries_exhausted"
+            except Exception as e:
+                outcome = f"unexpected: {type(e).__name__}: {e}"
+            finished = time.perf_counter()
+            with lock:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                latencies.append(finished - started)
+                if first_token is not None:
+                    first_tokens.append(first_token - started)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started, latencies, first_tokens, outcomes
+
+
+def percentile_ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 2) if values else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Calls to make")
+    parser.add_argument("--threads", type=int, default=32, help="Concurrent callers (Flask request threads)")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM_MAX_CONCURRENCY")
+    parser.add_argument("--deadline", type=float, default=10.0, help="LLM_DEADLINE_SECONDS")
+    parser.add_argument("--retries", type=int, default=2, help="LLM_MAX_RETRIES")
+    parser.add_argument("--budget-ratio", type=float, default=0.2, help="LLM_RETRY_BUDGET_RATIO")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake server latency before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Fake server delay between tokens")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Share of requests failed with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.05, help="Share of requests failed with 429")
+    parser.add_argument("--output", default="bench_llm_client.json")
+    parser.add_argument("--baseline", help="Previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before failing")
+    args = parser.parse_args(argv)
+
+    server = start_server(
+        latency=args.latency,
+        token_delay=args.token_delay,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    )
+    client = build_client(server.url, args)
+    seconds, latencies, first_tokens, outcomes = run_calls(client, args.requests, args.threads)
+    server.shutdown()
+
+    stats = client.stats()
+    run = {
+        "requests": args.requests,
+        "threads": args.threads,
+        "seconds": round(seconds, 3),
+        "calls_per_sec": rate(args.requests, seconds),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "ttft_p50_ms": percentile_ms(first_tokens, 50),
+        "ttft_p95_ms": percentile_ms(first_tokens, 95),
+        "outcomes": outcomes,
+        "client": stats,
+        "server": server.stats,
+    }
+    results = {
+        "benchmark": "llm_client",
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "tolerance")},
+        "runs": {"default": run},
+    }
+
+    violations = []
+    if stats["peak_in_flight"] > args.concurrency or server.stats["peak_in_flight"] > args.concurrency:
+        violations.append(f"{max(stats['peak_in_flight'], server.stats['peak_in_flight'])} calls in flight, limit {args.concurrency}")
+    if server.stats["connections"] > args.concurrency:
+        violations.append(f"{server.stats['connections']} connections opened for a pool of {args.concurrency}")
+    allowed_retries = RetryBudget().max_tokens + args.budget_ratio * args.requests + seconds * RetryBudget().min_per_second
+    if stats["retries"] > allowed_retries:
+        violations.append(f"{stats['retries']} retries, budget allows about {allowed_retries:.0f}")
+    unexpected = {outcome: count for outcome, count in outcomes.items() if outcome.startswith("unexpected")}
+    if unexpected:
+        violations.append(f"unexpected failures: {unexpected}")
+
+    print(
+        f"{args.requests} calls from {args.threads} threads in {run['seconds']}s ({run['calls_per_sec']}/s): "
+        f"p50 {run['p50_ms']}ms, p95 {run['p95_ms']}ms, TTFT p50 {run['ttft_p50_ms']}ms; "
+        f"peak in flight {stats['peak_in_flight']}/{args.concurrency}, peak queue {stats['peak_queue_depth']}, "
+        f"connections {server.stats['connections']}, retries {stats['retries']} "
+        f"(denied {stats['retries_denied']}), outcomes {outcomes}"
+    )
+
+    output = args.output
+    if args.baseline and os.path.abspath(output) == os.path.abspath(args.baseline):
+        output = f"{output}.new"  # Never overwrite the baseline being compared against
+    write_results(output, results)
+    if violations:
+        print("Client contract violated:\n  " + "\n  ".join(violations))
+        return 1
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, COMPARED_METRICS, args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+LLM routing benchmark.
+
+Starts the fake OpenAI-compatible server in-process as both the OpenAI API
+and a local Ollama, with a slower large model and a faster small one, and
+answers the same questions with every prompt template through the RAG
+pipelines the service builds. Runs once with every template on the large
+model and once with LLM_SMALL_MODEL_NAME set, then reports per-template
+latency and the model that answered. Fails when a request reaches a model
+other than the one `ModelRegistry.llm_route` picked for its template.
+
+Run from the chat_pdf directory:
+
+    python -m benchmarks.llm_routing_benchmark --queries 20 --output bench_llm_routing.json
+    python -m benchmarks.llm_routing_benchmark --baseline bench_llm_routing.json
+"""
+
+import argparse
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from benchmarks.common import compare_to_baseline, rate, write_results
+from benchmarks.fake_openai_server import start_server
+from config import settings
+from services.llm_client import OLLAMA, OPENAI
+from services.model_registry import DEFAULT_LLM, SMALL_LLM, ModelRegistry
+from services.prompts import PROMPT_TEMPLATES
+
+COMPARED_METRICS = ["answers_per_sec"]
+
+
+class FixedRetriever:
+    """Returns the same chunks for every query, so only generation is measured."""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def invoke(self, query):
+        return self.documents
+
+
+def run_templates(registry: ModelRegistry, retriever, server, models: dict, queries: int):
+    """
+    Args:
+        models (dict): Model name expected on the server for each route.
+
+    Returns:
+        tuple: ({template: {"route", "model", "p50_ms", "p95_ms"}}, seconds, mismatched requests)
+    """
+    results = {}
+    mismatched = 0
+    started = time.perf_counter()
+    for template in PROMPT_TEMPLATES:
+        pipeline = registry.rag_pipeline(template)
+        route = registry.llm_route(template)
+        expected = models[route]
+        before = dict(server.stats["models"])
+        latencies = []
+        for index in range(queries):
+            call_started = time.perf_counter()
+            pipeline.run(retriever, f"Which category fits an online food delivery business, variant {index}?")
+            latencies.append(time.perf_counter() - call_started)
+        served = {model: count - before.get(model, 0) for model, count in server.stats["models"].items()}
+        mismatched += sum(count for model, count in served.items() if model != expected)
+        latencies = np.asarray(latencies) * 1000
+        results[template] = {
+            "route": route,
+            "model": expected,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        }
+    return results, time.perf_counter() - started, mismatched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=20, help="Questions answered per template and run")
+    parser.add_argument("--large-model", default="gpt-4o-mini", help="LLM_MODEL_NAME (openai backend)")
+    parser.add_argument("--small-model", default="phi3", help="LLM_SMALL_MODEL_NAME (ollama backend)")
+    parser.add_argument("--large-latency", type=float, default=0.3, help="Fake latency of the large model")
+    parser.add_argument("--small-latency", type=float, default=0.05, help="Fake latency of the small model")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Fake server delay between tokens")
+    parser.add_argument("--output", default="bench_llm_routing.json")
+    parser.add_argument("--baseline", help="Previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before failing")
+    args = parser.parse_args(argv)
+
+    server = start_server(
+        token_delay=args.token_delay,
+        model_latency={args.large_model: args.large_latency, args.small_model: args.small_latency},
+    )
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    settings.LLM_BACKEND, settings.LLM_MODEL_NAME, settings.LLM_BASE_URL = OPENAI, args.large_model, server.url
+    settings.LLM_SMALL_BACKEND, settings.OLLAMA_BASE_URL = OLLAMA, server.url
+    retriever = FixedRetriever([
+        Document(page_content="Online food delivery connecting restaurants with customers. Category: Food, subcategory: Delivery.")
+    ])
+
+    results = {
+        "benchmark": "llm_routing",
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "tolerance")},
+        "runs": {},
+    }
+    mismatched = 0
+    models = {DEFAULT_LLM: args.large_model, SMALL_LLM: args.small_model}
+    for run_name, small_model in (("unrouted", None), ("routed", args.small_model)):
+        settings.LLM_SMALL_MODEL_NAME = small_model
+        templates, seconds, run_mismatched = run_templates(ModelRegistry(), retriever, server, models, args.queries)
+        mismatched += run_mismatched
+        answers = args.queries * len(templates)
+        results["runs"][run_name] = {
+            "templates": templates,
+            "seconds": round(seconds, 3),
+            "answers_per_sec": rate(answers, seconds),
+            "mismatched_requests": run_mismatched,
+        }
+        print(
+            f"{run_name:>8}: {rate(answers, seconds)} answers/s; "
+            + ", ".join(f"{template} -> {run['model']} p50 {run['p50_ms']}ms" for template, run in templates.items())
+        )
+    server.shutdown()
+
+    output = args.output
+    if args.baseline and os.path.abspath(output) == os.path.abspath(args.baseline):
+        output = f"{output}.new"  # Never overwrite the baseline being compared against
+    write_results(output, results)
+    if mismatched:
+        print(f"{mismatched} requests reached a model other than their template's route.")
+        return 1
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, COMPARED_METRICS, args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
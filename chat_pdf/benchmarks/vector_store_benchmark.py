@@ -0,0 +1,161 @@
+"""
+Vector store benchmark.
+
+Loads the same random unit vectors into Chroma and into the exact store
+(float32 and float16) at several collection sizes, then times top-k queries
+through `similarity_search_with_ids`, the path /ask and hybrid retrieval
+use, so document and metadata reads are included. Reports load time,
+query latency percentiles, queries/sec and Chroma's recall against the
+exact results, and prints which store is faster at each size.
+
+Run from the chat_pdf directory:
+
+    python -m benchmarks.vector_store_benchmark --sizes 1000 5000 20000 --output bench_vector_store.json
+    python -m benchmarks.vector_store_benchmark --baseline bench_vector_store.json
+"""
+
+import argparse
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from langchain.vectorstores import Chroma
+from langchain_core.documents import Document
+
+from benchmarks.common import StubEmbeddings, Stage, compare_to_baseline, rate, synthetic_text, write_results
+from services.exact_store import ExactVectorStore
+from services.vector_store import release_store, similarity_search_with_ids, upsert_embedded_documents
+
+DEFAULT_SIZES = [1000, 5000, 20000]
+STORES = ["chroma", "exact_float32", "exact_float16"]
+COMPARED_METRICS = [f"{store}_queries_per_sec" for store in STORES]
+
+
+def synthetic_collection(size: int, dimension: int, seed: int):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((size, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    text_rng = random.Random(seed)
+    documents = [
+        Document(
+            page_content=" ".join(synthetic_text(text_rng, 120)),
+            metadata={"source": "synthetic.pdf", "document": f"doc-{index % 20}", "page": index // 4},
+        )
+        for index in range(size)
+    ]
+    return [f"chunk-{index}" for index in range(size)], vectors, documents
+
+
+def open_store(store: str, directory: str):
+    if store == "chroma":
+        return Chroma(persist_directory=directory, embedding_function=StubEmbeddings())
+    return ExactVectorStore(directory, StubEmbeddings(), dtype=store.split("_")[1])
+
+
+def run_store(store: str, ids, vectors, documents, queries, k: int):
+    directory = tempfile.mkdtemp(prefix=f"bench_{store}_")
+    try:
+        db = open_store(store, directory)
+        with Stage() as load:
+            upsert_embedded_documents(db, documents, vectors.tolist(), ids=ids)
+
+        # One untimed query pays for loading the index
+        similarity_search_with_ids(db, queries[0].tolist(), k)
+        latencies = []
+        results = []
+        for query in queries:
+            started = time.perf_counter()
+            hits = similarity_search_with_ids(db, query.tolist(), k)
+            latencies.append(time.perf_counter() - started)
+            results.append([record_id for record_id, _ in hits])
+        release_store(db)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    latencies = np.asarray(latencies) * 1000
+    return results, {
+        f"{store}_load_seconds": round(load.seconds, 3),
+        f"{store}_load_peak_rss_bytes": load.peak_rss_bytes,
+        f"{store}_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        f"{store}_p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        f"{store}_queries_per_sec": rate(len(queries), latencies.sum() / 1000),
+    }
+
+
+def recall(results, reference):
+    found = sum(len(set(got) & set(expected)) for got, expected in zip(results, reference))
+    total = sum(len(expected) for expected in reference)
+    return round(found / total, 4) if total else None
+
+
+def run_case(size: int, dimension: int, query_count: int, k: int):
+    ids, vectors, documents = synthetic_collection(size, dimension, seed=size)
+    queries = synthetic_collection(query_count, dimension, seed=size + 1)[1]
+
+    run = {"size": size, "dimension": dimension, "queries": query_count, "k": k}
+    outputs = {}
+    for store in STORES:
+        outputs[store], metrics = run_store(store, ids, vectors, documents, queries, k)
+        run.update(metrics)
+
+    run["chroma_recall"] = recall(outputs["chroma"], outputs["exact_float32"])
+    run["exact_float16_recall"] = recall(outputs["exact_float16"], outputs["exact_float32"])
+    run["fastest"] = min(STORES, key=lambda store: run[f"{store}_p50_ms"])
+    return run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Collection sizes (chunks)")
+    parser.add_argument("--dimension", type=int, default=384, help="Vector dimension (all-MiniLM-L6-v2 is 384)")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per store and size")
+    parser.add_argument("--k", type=int, default=4, help="Results per query")
+    parser.add_argument("--output", default="bench_vector_store.json")
+    parser.add_argument("--baseline", help="Previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before failing")
+    args = parser.parse_args(argv)
+
+    results = {
+        "benchmark": "vector_store",
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "runs": {},
+    }
+    for size in args.sizes:
+        run = run_case(size, args.dimension, args.queries, args.k)
+        results["runs"][f"{size}_chunks"] = run
+        print(
+            f"{size:>7} chunks: "
+            + ", ".join(f"{store} p50 {run[f'{store}_p50_ms']}ms" for store in STORES)
+            + f"; chroma recall {run['chroma_recall']}, fastest: {run['fastest']}"
+        )
+
+    exact_wins = [run["size"] for run in results["runs"].values() if run["fastest"].startswith("exact")]
+    chroma_wins = [run["size"] for run in results["runs"].values() if run["fastest"] == "chroma"]
+    if exact_wins and chroma_wins:
+        results["crossover"] = {"exact_fastest_up_to": max(exact_wins), "chroma_fastest_from": min(chroma_wins)}
+        print(f"Crossover between {max(exact_wins)} and {min(chroma_wins)} chunks.")
+    else:
+        print(f"No crossover in the sizes tried: {'exact' if exact_wins else 'chroma'} was fastest throughout.")
+
+    output = args.output
+    if args.baseline and os.path.abspath(output) == os.path.abspath(args.baseline):
+        output = f"{output}.new"  # Never overwrite the baseline being compared against
+    write_results(output, results)
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, COMPARED_METRICS, args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,154 +1,737 @@
+import json
 import os
+import tempfile
+import threading
+import time
 import uuid
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify
-from langchain.chains import RetrievalQA
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain.vectorstores import Chroma
-from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
+from flask import Flask, Response, request, jsonify
 
 # Import routes blueprint
 from routes import register_blueprints
+from config import settings
+from services import ingest_jobs
+from services.answer_cache import answer_cache
+from services.collection_manager import InvalidCollectionName, bootstrap_snapshots, collections
+from services.ingest_jobs import IngestBatch, IngestJob, QueueFull, ingest_queue
+from services.model_registry import registry
+from services.pdf_extract import iter_pages, start_pool
+from services.quantized_index import MODES as QUANTIZED_MODES, QuantizedRetriever
+from services.hybrid_retriever import HYBRID, RETRIEVAL_MODES, HybridRetriever, InvalidRetrievalMode
+from services.incremental import ChunkIdAssigner, DocumentSync
+from services.lexical_index import LexicalIndex
+from services.llm_client import LLMDeadlineExceeded
+from services.single_flight import SingleFlight
+from services.snapshot import SnapshotRetriever
+from services.vector_store import (
+    delete_ids,
+    get_document_metadatas,
+    get_legacy_metadatas,
+    similarity_search_with_ids,
+    update_metadatas,
+    upsert_embedded_documents,
+)
+from services.prompts import DEFAULT_TEMPLATE_NAME
+from services.rag_pipeline import sources
+from services.readiness import readiness
 
 # Load environment variables
 load_dotenv(".env.dev")
 
 app = Flask(__name__)
 
-# Register all blueprints
-register_blueprints(app)
+NO_RESULTS_MESSAGE = "No relevant documents/result found."
 
-# Global variables for admin-ingested RAG data
-global_rag_data = None
-persist_directory = "/app/chroma_db/global"
+# Concurrent identical questions (a cohort on the same questionnaire step) share one
+# retrieval and LLM call
+ask_flights = SingleFlight()
 
-overwrite_embeddings = False  # Set to False to use existing embeddings
+# Register all blueprints
+register_blueprints(app)
 
-# Access the OpenAI API key
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-ORGANIZATION_ID = os.getenv("ORGANIZATION_ID")
+if answer_cache is not None:
+    # Re-ingesting, resetting or importing a collection drops its cached answers
+    collections.on_change(answer_cache.invalidate)
 
 
 class ChatPDF:
     def __init__(self):
-        # Initialize the OpenAI Chat model
-        self.model = ChatOpenAI(
-            model="gpt-4o-mini",
-            openai_api_key=OPENAI_API_KEY,
-            organization=ORGANIZATION_ID,
-            temperature=0.1,
-            max_tokens=100,
-        )
-        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=100)
-        self.embedding = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-        self.prompt_template = PromptTemplate.from_template(
-            """
-            <s>[INST] You are an expert assistant and agent for a Low-Code/No-Code (LCNC) platform. 
-            Use the context provided to guide users in developing applications. 
-            Keep your response concise and max two sentences. If the context is insufficient, state that clearly. 
-            [/INST] Question: {question} Context: {context} Answer: [/INST]
-            """
+        # Models, splitter and prompts are loaded once per process and shared across requests
+        self.model = registry.llm()
+        self.text_splitter = registry.text_splitter()
+        self.embedding = registry.embedding()
+        self.embedding_engine = registry.embedding_engine()
+        self.prompt_template = registry.prompt_template(DEFAULT_TEMPLATE_NAME)
+
+    def ingest(
+        self,
+        pdf_file_path: str,
+        session_id: str,
+        overwrite_embeddings: bool = False,
+        job: IngestJob = None,
+        document_name: str = None,
+        collection_name: str = settings.DEFAULT_COLLECTION,
+        rebuild_index: bool = True,
+    ):
+        """
+        Streams a PDF into the named Chroma collection.
+
+        Pages are read one at a time and split as they arrive. Chunks are
+        embedded and written in windows of INGEST_WINDOW_CHUNKS, so peak memory
+        depends on the window size rather than the document size. Chunks are
+        identified by a hash of their normalised text, so only new or changed
+        chunks are embedded. Chunks that vanished from the document are
+        deleted at the end, and unchanged chunks keep their stored vectors.
+        With `overwrite_embeddings` the whole collection is dropped and rebuilt.
+        The collection is created on first ingest.
+
+        Progress is reported on `job` (a throwaway job is used when called
+        directly), and `JobCancelled` is raised between pages and embedding
+        batches once the job has been cancelled. Batch ingestion passes
+        `rebuild_index=False` and rebuilds the quantized index once at the end.
+
+        Returns:
+            dict: The payload reported as the job result.
+        """
+        job = job or IngestJob(session_id, pdf_file_path)
+        document_name = document_name or os.path.basename(pdf_file_path)
+
+        # Pinned so the handles written to are not evicted by other collections opening meanwhile.
+        # Documents sync side by side; a rebuild from scratch waits for them and keeps them out
+        with collections.pinned(collection_name), collections.writing(collection_name, exclusive=overwrite_embeddings):
+            if overwrite_embeddings:
+                print(f"Overwriting all embeddings in collection {collection_name}.")
+                db = collections.reset(collection_name)
+            else:
+                parity = collections.parity(collection_name)
+                if not parity["compatible"]:
+                    raise ValueError(
+                        f"Collection {collection_name} was indexed with a different embedding model "
+                        f"({parity['reason']}). Re-ingest with overwrite_embeddings=true."
+                    )
+                db = collections.get(collection_name)
+
+            lexical = collections.lexical_index(collection_name)
+            id_assigner = ChunkIdAssigner(document_name)
+            existing = get_document_metadatas(db, document_name)
+            # Chunks stored before this document had chunk ids are replaced instead of duplicated
+            existing.update(get_legacy_metadatas(db, document_name))
+            sync = DocumentSync(existing)
+
+            job.set_stage(ingest_jobs.STREAMING)
+            window = []
+            for page in iter_pages(pdf_file_path):
+                # The upload lives in a temp file; keep the stable document name instead
+                page.metadata["source"] = document_name
+                window.extend(self.text_splitter.split_documents([page]))
+                self._on_pages_parsed(job, 1)
+                if len(window) >= settings.INGEST_WINDOW_CHUNKS:
+                    self._sync_window(db, lexical, window, id_assigner, sync, job)
+                    window = []
+            if window:
+                self._sync_window(db, lexical, window, id_assigner, sync, job)
+
+            job.set_stage(ingest_jobs.FINALIZING)
+            removed = sync.removed()
+            if removed:
+                delete_ids(db, removed)
+                lexical.delete(removed)
+            if lexical.dirty:
+                lexical.save()
+            collections.stamp(collection_name, overwrite=overwrite_embeddings)
+            if sync.added or sync.removed_count:
+                # Answers cached against the previous contents are no longer served
+                collections.bump_version(collection_name)
+            if rebuild_index and settings.VECTOR_INDEX_MODE in QUANTIZED_MODES and (sync.added or sync.removed_count):
+                collections.build_quantized_index(collection_name, settings.VECTOR_INDEX_MODE)
+            collections.refresh_size(collection_name)
+            print(f"FAQ RAG data synced in collection {collection_name}: {sync.summary()}")
+
+        return {
+            "session_id": session_id,
+            "collection": collection_name,
+            "message": "PDF ingested successfully and FAQ data created.",
+            "document": document_name,
+            "chunks": sync.summary(),
+            "embedding": self.embedding_engine.stats(),
+        }
+
+    def finish_batch(self, batch: IngestBatch, collection_name: str):
+        """
+        Runs once after every file of a batch has been ingested: rebuilds the
+        quantized index a single time instead of once per file.
+        """
+        changed = any(
+            job.result and (job.result["chunks"]["added"] or job.result["chunks"]["removed"]) for job in batch.jobs
         )
+        if changed and settings.VECTOR_INDEX_MODE in QUANTIZED_MODES:
+            collections.build_quantized_index(collection_name, settings.VECTOR_INDEX_MODE)
+            collections.refresh_size(collection_name)
+        print(f"Ingestion batch {batch.id} finished: {batch.to_dict()['completed']}/{len(batch.jobs)} files completed.")
 
-    def ingest(self, pdf_file_path: str, session_id: str, overwrite_embeddings: bool = False):
-        try:
-            if os.path.exists(persist_directory) and os.listdir(persist_directory) and not overwrite_embeddings:
-                print(f"Embedding already exists in {persist_directory}. Loading existing data...")
-                db = Chroma(persist_directory=persist_directory, embedding_function=self.embedding)
+    def _sync_window(
+        self, db, lexical: LexicalIndex, chunks, id_assigner: ChunkIdAssigner, sync: DocumentSync, job: IngestJob
+    ):
+        ids = id_assigner.assign(chunks)
+        add, update = sync.plan(ids, chunks)
+
+        if add:
+            job.chunks_total += len(add)
+            embeddings = self.embedding_engine.embed(
+                [chunks[index].page_content for index in add],
+                on_progress=lambda count: self._on_chunks_embedded(job, count),
+            )
+            upsert_embedded_documents(db, [chunks[index] for index in add], embeddings, ids=[ids[index] for index in add])
+            lexical.add([ids[index] for index in add], [chunks[index].page_content for index in add])
+        if update:
+            update_metadatas(db, [ids[index] for index in update], [chunks[index].metadata for index in update])
+
+    @staticmethod
+    def _on_pages_parsed(job: IngestJob, pages: int):
+        job.pages_parsed += pages
+        job.check_cancelled()
+
+    @staticmethod
+    def _on_chunks_embedded(job: IngestJob, chunks: int):
+        job.chunks_embedded += chunks
+        job.check_cancelled()
+
+    def retriever(self, db, collection_name: str, retrieval_mode: str = None):
+        """
+        Returns the retriever for a collection: an imported snapshot while it
+        is still being loaded into Chroma, the quantized sidecar index when
+        VECTOR_INDEX_MODE asks for one and it has been built, otherwise
+        Chroma's own similarity search. In "hybrid" mode that vector search is
+        fused with BM25 over the collection's lexical index.
+        """
+        retrieval_mode = retrieval_mode or settings.RETRIEVAL_MODE
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise InvalidRetrievalMode(f"Unknown retrieval mode '{retrieval_mode}'. Use one of {', '.join(RETRIEVAL_MODES)}.")
+
+        snapshot = collections.snapshot_store(collection_name)
+        if snapshot is not None:
+            # Chroma and the lexical index fill up while the snapshot hydrates
+            return SnapshotRetriever(store=snapshot, embedding=self.embedding, k=settings.RETRIEVAL_K)
+
+        vector_retriever = None
+        if settings.VECTOR_INDEX_MODE in QUANTIZED_MODES:
+            index = collections.quantized_index(collection_name)
+            if index is not None:
+                vector_retriever = QuantizedRetriever(
+                    index=index,
+                    db=db,
+                    embedding=self.embedding,
+                    k=settings.RETRIEVAL_K,
+                    rerank_factor=settings.QUANTIZED_RERANK_FACTOR,
+                )
+
+        if retrieval_mode == HYBRID:
+            if vector_retriever is not None:
+                vector_search = vector_retriever.search
             else:
-                docs = PyPDFLoader(file_path=pdf_file_path).load()
-                chunks = self.text_splitter.split_documents(docs)
-                print(f"New embedding chunks created: {len(chunks)}")
+                vector_search = lambda query, k: similarity_search_with_ids(db, self.embedding.embed_query(query), k)
+            return HybridRetriever(
+                vector_search=vector_search,
+                lexical=collections.lexical_index(collection_name),
+                db=db,
+                k=settings.RETRIEVAL_K,
+                candidates=settings.HYBRID_CANDIDATES,
+                rrf_k=settings.RRF_K,
+            )
+        return vector_retriever or db.as_retriever(search_kwargs={"k": settings.RETRIEVAL_K})
 
-                os.makedirs(persist_directory, exist_ok=True)
-                db = Chroma.from_documents(chunks, self.embedding, persist_directory=persist_directory)
-                print(f"FAQ RAG data created and persisted in {persist_directory}.")
+    def _answer_cache_key(self, collection_name: str, prompt_template_name: str, retrieval_mode: str, query: str):
+        """
+        Returns the (namespace, query embedding) an answer is cached under, or
+        None when the answer cache is disabled. Unknown template names answer
+        with the default template, so they share its namespace.
+        """
+        if answer_cache is None:
+            return None
+        if prompt_template_name not in registry.rag_pipelines():
+            prompt_template_name = DEFAULT_TEMPLATE_NAME
+        namespace = answer_cache.namespace(
+            collection_name,
+            collections.version(collection_name),
+            prompt_template_name,
+            retrieval_mode or settings.RETRIEVAL_MODE,
+        )
+        return namespace, self.embedding.embed_query(query)
 
-            global global_rag_data
-            global_rag_data = db  # Update the global RAG data
+    @staticmethod
+    def _cached_answer(cache_key):
+        # The cache only saves work: if its backend is unreachable the question is answered normally
+        if cache_key is None:
+            return None
+        try:
+            return answer_cache.lookup(*cache_key)
+        except Exception as e:
+            print(f"Answer cache lookup failed: {str(e)}")
+            return None
 
-            return jsonify({"session_id": session_id, "message": "PDF ingested successfully and FAQ data created."})
+    @staticmethod
+    def _store_answer(cache_key, payload: dict):
+        if cache_key is None:
+            return
+        try:
+            answer_cache.store(*cache_key, payload)
         except Exception as e:
-            print(f"Error processing PDF: {str(e)}")
-            return jsonify({"error": f"Error processing PDF: {str(e)}"}), 500
+            print(f"Answer cache store failed: {str(e)}")
+
+    def _query_retriever(self, collection_name: str, retrieval_mode: str = None):
+        """
+        Returns:
+            tuple: (retriever, None) when the collection can answer queries,
+                otherwise (None, (JSON error response, status code)).
+        """
+        if not collections.exists(collection_name):
+            return None, (jsonify({"error": "FAQ data is not available. Please contact the admin to upload the FAQ document."}), 404)
+        parity = collections.parity(collection_name)
+        if not parity["compatible"]:
+            return None, (jsonify({"error": f"FAQ data must be re-indexed for the current embedding model: {parity['reason']}"}), 409)
+        db = collections.get(collection_name)
+        return self.retriever(db, collection_name, retrieval_mode), None
+
+    def _flight_key(self, mode: str, collection_name: str, prompt_template_name: str, retrieval_mode: str, query: str):
+        """
+        Returns the key under which concurrent /ask requests share one answer:
+        requests that would run the same retrieval and prompt. `mode` ("json"
+        or "stream") keeps /ask and /ask/stream apart, since one shares a
+        result and the other a stream of events.
+        """
+        if prompt_template_name not in registry.rag_pipelines():
+            prompt_template_name = DEFAULT_TEMPLATE_NAME
+        return (
+            mode,
+            collection_name,
+            collections.version(collection_name),
+            prompt_template_name,
+            retrieval_mode or settings.RETRIEVAL_MODE,
+            " ".join(query.split()),
+        )
 
-    def ask(self, session_id: str, query: str, prompt_template_name: str = "default_template"):
+    def _lookup_answer(self, collection_name: str, prompt_template_name: str, retrieval_mode: str, query: str):
+        """
+        Returns:
+            tuple: (cache key, cached (payload, similarity) or None, lookup time in ms)
+        """
+        started = time.perf_counter()
+        cache_key = self._answer_cache_key(collection_name, prompt_template_name, retrieval_mode, query)
+        cached = self._cached_answer(cache_key)
+        return cache_key, cached, round((time.perf_counter() - started) * 1000, 2)
+
+    def ask(
+        self,
+        session_id: str,
+        query: str,
+        prompt_template_name: str = DEFAULT_TEMPLATE_NAME,
+        collection_name: str = settings.DEFAULT_COLLECTION,
+        retrieval_mode: str = None,
+    ):
         try:
-            db = global_rag_data
-            if db is None:
-                return jsonify({"error": "FAQ data is not available. Please contact the admin to upload the FAQ document."}), 404
-
-            matching_docs = db.similarity_search(query)
-            print(f"Matched documents: {len(matching_docs)}")
-
-            if not matching_docs:
-                return jsonify({"response": "No relevant documents/result found."})
-
-            # Define prompt templates
-            prompt_templates = {
-                "primary_field_template": PromptTemplate.from_template(
-                    "Given the user's business description, return only the business category and subcategory. Question: {question} Context: {context} Answer:"
-                ),
-                "target_customer_template": PromptTemplate.from_template(
-                    "Given the user's target customers, return only the application flow within two sentences. Question: {question} Context: {context} Answer:"
-                ),
-                "app_template_choice": PromptTemplate.from_template(
-                    "Given the selected template, thank the user for choosing it for their business type. Question: {question} Context: {context} Answer:"
-                ),
-                "default_template": self.prompt_template,
-            }
-
-            selected_prompt_template = prompt_templates.get(prompt_template_name, self.prompt_template)
-
-            chain = RetrievalQA.from_chain_type(
-                llm=self.model,
-                retriever=db.as_retriever(),
-                chain_type="stuff",
-                chain_type_kwargs={"prompt": selected_prompt_template},
-                return_source_documents=True,
-                verbose=True,
-            )
-            result = chain.invoke({"input_documents": matching_docs, "query": query})
-            response_text = result.get("result", "No answer found.")
+            with collections.pinned(collection_name):
+                retriever, error = self._query_retriever(collection_name, retrieval_mode)
+                if error is not None:
+                    return error
+
+                cache_key, cached, cache_ms = self._lookup_answer(collection_name, prompt_template_name, retrieval_mode, query)
+                if cached is not None:
+                    payload, similarity = cached
+                    return jsonify({
+                        "response": payload["response"],
+                        "cached": True,
+                        "similarity": round(similarity, 4),
+                        "timings": {"cache_ms": cache_ms, "total_ms": cache_ms},
+                    })
+
+                def answer():
+                    result = registry.rag_pipeline(prompt_template_name).run(retriever, query)
+                    if result["answer"] is not None:
+                        self._store_answer(cache_key, {"response": result["answer"], "sources": sources(result["documents"])})
+                    return result
+
+                flight_key = self._flight_key("json", collection_name, prompt_template_name, retrieval_mode, query)
+                result, coalesced = ask_flights.do(flight_key, answer)
+            timings = dict(result["timings"], cache_ms=cache_ms)
+            response = result["answer"] if result["answer"] is not None else NO_RESULTS_MESSAGE
+            return jsonify({"response": response, "cached": False, "coalesced": coalesced, "timings": timings})
+        except (InvalidCollectionName, InvalidRetrievalMode) as e:
+            return jsonify({"error": str(e)}), 400
+        except LLMDeadlineExceeded as e:
+            print(f"LLM unavailable: {str(e)}")
+            return jsonify({"error": f"The assistant is busy, please try again: {str(e)}"}), 503
+        except Exception as e:
+            print(f"Error during query processing: {str(e)}")
+            return jsonify({"error": f"Error during query processing: {str(e)}"}), 500
 
-            return jsonify({"response": response_text})
+    def ask_stream(
+        self,
+        session_id: str,
+        query: str,
+        prompt_template_name: str = DEFAULT_TEMPLATE_NAME,
+        collection_name: str = settings.DEFAULT_COLLECTION,
+        retrieval_mode: str = None,
+    ):
+        """
+        Answers like `ask`, as server-sent events: a "token" event for each
+        piece of the answer as the LLM generates it, then one "done" event
+        with the full response, its sources and timings (`ttft_ms` separate
+        from `total_ms`). A failure once streaming has started is sent as an
+        "error" event; failures before that get the same status codes as /ask.
+        Identical questions streamed concurrently share one LLM stream.
+        """
+        # The collection stays pinned until the response is closed, streamed or not
+        collections.pin(collection_name)
+        try:
+            retriever, error = self._query_retriever(collection_name, retrieval_mode)
+            if error is not None:
+                collections.unpin(collection_name)
+                return error
+            pipeline = registry.rag_pipeline(prompt_template_name)
+            cache_key, cached, cache_ms = self._lookup_answer(collection_name, prompt_template_name, retrieval_mode, query)
+            flight_key = self._flight_key("stream", collection_name, prompt_template_name, retrieval_mode, query)
+        except (InvalidCollectionName, InvalidRetrievalMode) as e:
+            collections.unpin(collection_name)
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
+            collections.unpin(collection_name)
             print(f"Error during query processing: {str(e)}")
             return jsonify({"error": f"Error during query processing: {str(e)}"}), 500
 
+        def events():
+            if cached is not None:
+                payload, similarity = cached
+                yield sse_event("token", {"text": payload["response"]})
+                yield sse_event("done", {
+                    "response": payload["response"],
+                    "cached": True,
+                    "similarity": round(similarity, 4),
+                    "sources": payload.get("sources", []),
+                    "timings": {"cache_ms": cache_ms, "ttft_ms": cache_ms, "total_ms": cache_ms},
+                })
+                return
+            def answer():
+                for kind, data in pipeline.stream(retriever, query):
+                    if kind == "done" and data["answer"] is not None:
+                        self._store_answer(cache_key, {"response": data["answer"], "sources": sources(data["documents"])})
+                    yield kind, data
+
+            try:
+                # Requests joining an identical stream already in flight replay its tokens
+                for (kind, data), coalesced in ask_flights.stream(flight_key, answer):
+                    if kind == "token":
+                        yield sse_event("token", {"text": data})
+                        continue
+                    timings = dict(data["timings"], cache_ms=cache_ms)
+                    if data["answer"] is None:
+                        yield sse_event("token", {"text": NO_RESULTS_MESSAGE})
+                        yield sse_event("done", {
+                            "response": NO_RESULTS_MESSAGE,
+                            "cached": False,
+                            "coalesced": coalesced,
+                            "sources": [],
+                            "timings": timings,
+                        })
+                        return
+                    yield sse_event("done", {
+                        "response": data["answer"],
+                        "cached": False,
+                        "coalesced": coalesced,
+                        "sources": sources(data["documents"]),
+                        "timings": timings,
+                    })
+            except Exception as e:
+                print(f"Error during streamed query processing: {str(e)}")
+                yield sse_event("error", {"error": f"Error during query processing: {str(e)}"})
+
+        # X-Accel-Buffering stops a fronting nginx from holding tokens back
+        response = Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        response.call_on_close(lambda: collections.unpin(collection_name))
+        return response
+
+
+def sse_event(event: str, data: dict):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 
 @app.route("/ingest", methods=["POST"])
 def admin_ingest():
+    temp_file_path = None
+    job = None
     try:
         pdf_file = request.files["file"]
         session_id = request.form.get("session_id", str(uuid.uuid4()))
-        temp_file_path = f"/tmp/{pdf_file.filename}"
-        pdf_file.save(temp_file_path)
+        # Drop and rebuild the whole collection instead of syncing changed chunks
+        overwrite_embeddings = request.form.get("overwrite_embeddings", "false").lower() == "true"
+        document_name = pdf_file.filename
+        collection_name = request.form.get("collection", settings.DEFAULT_COLLECTION)
+        collections.path(collection_name)  # Validate the name before accepting the upload
+        # Stream the upload into a unique temp file; client filenames are neither unique nor trusted
+        with tempfile.NamedTemporaryFile(prefix="ingest-", suffix=".pdf", delete=False) as temp_file:
+            temp_file_path = temp_file.name
+            pdf_file.save(temp_file)
 
-        chat_pdf = ChatPDF()
-        return chat_pdf.ingest(temp_file_path, session_id, overwrite_embeddings)
+        job = ingest_queue.submit(
+            session_id,
+            temp_file_path,
+            lambda job: ChatPDF().ingest(
+                temp_file_path,
+                session_id,
+                overwrite_embeddings,
+                job=job,
+                document_name=document_name,
+                collection_name=collection_name,
+            ),
+        )
+        return jsonify({"session_id": session_id, "job_id": job.id, "status_url": f"/ingest/{job.id}"}), 202
+    except InvalidCollectionName as e:
+        return jsonify({"error": str(e)}), 400
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         print(f"Error during PDF ingestion: {str(e)}")
         return jsonify({"error": f"Error during PDF ingestion: {str(e)}"}), 500
+    finally:
+        # Once queued, the job removes the upload when it finishes
+        if job is None and temp_file_path is not None:
+            os.remove(temp_file_path)
+
+
+def stream_batch_progress(batch: IngestBatch):
+    """
+    Yields the progress of a batch as JSON lines: one "batch" event listing
+    the jobs, a "progress" event whenever a file's stage or counters change,
+    and a final "completed" event with the per-file results.
+    """
+    yield json.dumps({"event": "batch", "batch_id": batch.id, "session_id": batch.session_id,
+                      "jobs": [{"job_id": job.id, "document": job.document_name} for job in batch.jobs]}) + "\n"
+    reported = {}
+    while True:
+        finished = batch.wait(settings.INGEST_PROGRESS_INTERVAL_SECONDS)
+        for job in batch.jobs:
+            status = job.to_dict()
+            state = (status["stage"], tuple(status["progress"].values()))
+            if reported.get(job.id) != state:
+                reported[job.id] = state
+                yield json.dumps({"event": "progress", **status}) + "\n"
+        if finished:
+            break
+    yield json.dumps({"event": "completed", **batch.to_dict()}) + "\n"
+
+
+@app.route("/ingest/batch", methods=["POST"])
+def admin_ingest_batch():
+    """
+    Ingests every PDF of a multipart upload (repeated "files" field) into one
+    collection. The files are processed concurrently by the ingestion workers
+    and progress is streamed back as newline-delimited JSON; each job can
+    also be polled or cancelled through /ingest/<job_id>.
+    """
+    temp_file_paths = []
+    try:
+        pdf_files = request.files.getlist("files")
+        if not pdf_files:
+            return jsonify({"error": "No files uploaded. Send the PDFs in the 'files' field."}), 400
+        document_names = [pdf_file.filename for pdf_file in pdf_files]
+        if len(set(document_names)) != len(document_names):
+            return jsonify({"error": "Each file in a batch must have a distinct name."}), 400
+
+        session_id = request.form.get("session_id", str(uuid.uuid4()))
+        overwrite_embeddings = request.form.get("overwrite_embeddings", "false").lower() == "true"
+        collection_name = request.form.get("collection", settings.DEFAULT_COLLECTION)
+        collections.path(collection_name)
+
+        for pdf_file in pdf_files:
+            with tempfile.NamedTemporaryFile(prefix="ingest-", suffix=".pdf", delete=False) as temp_file:
+                pdf_file.save(temp_file)
+                temp_file_paths.append(temp_file.name)
+
+        chat_pdf = ChatPDF()
+
+        def reset_collection(batch):
+            # Runs on a worker once the queue has accepted every file, before any of them syncs
+            print(f"Overwriting all embeddings in collection {collection_name}.")
+            with collections.writing(collection_name, exclusive=True):
+                collections.reset(collection_name)
+                collections.stamp(collection_name, overwrite=True)
+
+        def ingest_target(temp_file_path, document_name):
+            return lambda job: chat_pdf.ingest(
+                temp_file_path,
+                session_id,
+                job=job,
+                document_name=document_name,
+                collection_name=collection_name,
+                rebuild_index=False,
+            )
+
+        batch = ingest_queue.submit_batch(
+            session_id,
+            [
+                (document_name, temp_file_path, ingest_target(temp_file_path, document_name))
+                for document_name, temp_file_path in zip(document_names, temp_file_paths)
+            ],
+            on_finished=lambda batch: chat_pdf.finish_batch(batch, collection_name),
+            # Reset once up front; the files then sync into the fresh collection side by side
+            on_started=reset_collection if overwrite_embeddings else None,
+        )
+        return Response(stream_batch_progress(batch), mimetype="application/x-ndjson")
+    except InvalidCollectionName as e:
+        return jsonify({"error": str(e)}), 400
+    except QueueFull as e:
+        for temp_file_path in temp_file_paths:
+            os.remove(temp_file_path)
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        for temp_file_path in temp_file_paths:
+            os.remove(temp_file_path)
+        print(f"Error during batch PDF ingestion: {str(e)}")
+        return jsonify({"error": f"Error during batch PDF ingestion: {str(e)}"}), 500
+
+
+@app.route("/ingest/<job_id>", methods=["GET"])
+def ingest_status(job_id):
+    job = ingest_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Ingestion job not found."}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route("/ingest/<job_id>/cancel", methods=["POST"])
+def cancel_ingest(job_id):
+    job = ingest_queue.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Ingestion job not found."}), 404
+    return jsonify(job.to_dict())
+
+
+def ask_arguments(data: dict):
+    return (
+        data.get("session_id", str(uuid.uuid4())),
+        data.get("query"),
+        data.get("prompt_template_name", DEFAULT_TEMPLATE_NAME),
+        data.get("collection", settings.DEFAULT_COLLECTION),
+        data.get("retrieval_mode", settings.RETRIEVAL_MODE),
+    )
 
 
 @app.route("/ask", methods=["POST"])
 def user_query():
     try:
-        data = request.json
-        session_id = data.get("session_id", str(uuid.uuid4()))
-        query = data.get("query")
-        prompt_template_name = data.get("prompt_template_name", "default_template")
+        chat_pdf = ChatPDF()
+        return chat_pdf.ask(*ask_arguments(request.json))
+    except InvalidCollectionName as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error during query handling: {str(e)}")
+        return jsonify({"error": f"Error during query handling: {str(e)}"}), 500
 
+
+@app.route("/ask/stream", methods=["POST"])
+def user_query_stream():
+    try:
         chat_pdf = ChatPDF()
-        return chat_pdf.ask(session_id, query, prompt_template_name)
+        return chat_pdf.ask_stream(*ask_arguments(request.json))
+    except InvalidCollectionName as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error during query handling: {str(e)}")
         return jsonify({"error": f"Error during query handling: {str(e)}"}), 500
 
 
+@app.route("/ask/coalescing", methods=["GET"])
+def ask_coalescing_stats():
+    return jsonify(ask_flights.stats())
+
+
+@app.route("/ask/cache", methods=["GET"])
+def answer_cache_stats():
+    if answer_cache is None:
+        return jsonify({"backend": "none"})
+    try:
+        return jsonify(answer_cache.stats())
+    except Exception as e:
+        print(f"Error reading answer cache stats: {str(e)}")
+        return jsonify({"error": f"Error reading answer cache stats: {str(e)}"}), 503
+
+
+@app.route("/embeddings/cache", methods=["GET"])
+def embedding_cache_stats():
+    return jsonify(registry.embedding_cache_stats())
+
+
+@app.route("/models/llm", methods=["GET"])
+def llm_stats():
+    return jsonify(registry.llm_stats())
+
+
+@app.route("/models/memory", methods=["GET"])
+def model_memory():
+    return jsonify(registry.memory_report())
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    # Liveness only: the process is up and serving requests, even while it warms up
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    return jsonify(readiness.to_dict()), 200 if readiness.is_ready else 503
+
+
+WARM_UP_QUERY = "How do I create a new page?"
+
+
+def warm_start():
+    """
+    Boot sequence run before the service reports ready: loads the models
+    (including one embedding call), imports or resumes snapshots, then opens
+    every collection in WARM_COLLECTIONS and runs a retrieval against it.
+    The first query is what makes Chroma load its HNSW index into memory, so
+    after this the first real /ask is as fast as any other.
+
+    Failing to load the models leaves the service not ready. A collection
+    that cannot be warmed is reported on /readyz but does not block
+    readiness, as the other collections can still be served.
+    """
+    try:
+        with readiness.step("models"):
+            registry.warm_up()
+        with readiness.step("snapshots"):
+            # Serve snapshots from a shared volume on fresh replicas and finish interrupted snapshot loads
+            bootstrap_snapshots(import_missing=settings.SNAPSHOT_BOOTSTRAP)
+        with readiness.step("parity"):
+            # Flag collections indexed with an embedding backend incompatible with the active one
+            for name in collections.names():
+                collections.parity(name)
+    except Exception as e:
+        readiness.mark_failed(str(e))
+        return
+
+    chat_pdf = ChatPDF()
+    for name in settings.WARM_COLLECTIONS:
+        step = f"collection:{name}"
+        try:
+            if not collections.exists(name):
+                readiness.skip(step, "collection does not exist")
+                continue
+            if not collections.parity(name)["compatible"]:
+                readiness.skip(step, "collection must be re-indexed")
+                continue
+            with readiness.step(step):
+                chat_pdf.retriever(collections.get(name), name).invoke(WARM_UP_QUERY)
+        except Exception as e:
+            print(f"Could not warm collection {name}: {str(e)}")
+    readiness.mark_ready()
+
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    debug = True
+    # The debug reloader runs this module twice; only the child that serves requests warms up
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        # Fork the PDF extraction processes while this process is still single-threaded
+        start_pool()
+        threading.Thread(target=warm_start, name="warm-start", daemon=True).start()
+    app.run(host="0.0.0.0", port=5000, debug=debug)
@@ -1,10 +1,17 @@
+import time
+
 from flask import Blueprint, jsonify, request
 from database import get_db
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from config import settings
 from schemas.project import ProjectResponse
 from models.project import Project
 from models.business_category import BusinessCategory
+from services.category_classifier import CategoryClassifier
+from services.model_registry import registry
+from services.prompts import CATEGORY_FALLBACK_TEMPLATE
 
 # Define the blueprint for project-related routes
 agent_action_bp = Blueprint("agent_action", __name__)
@@ -13,11 +20,18 @@ agent_action_bp = Blueprint("agent_action", __name__)
 db_gen = get_db()
 db: Session = next(db_gen)
 
+# Shared by every request; re-embeds the categories when the table changes
+category_classifier = CategoryClassifier(
+    registry.embedding,
+    min_score=settings.CATEGORY_MIN_SCORE,
+    min_margin=settings.CATEGORY_MIN_MARGIN,
+)
+
 
 def find_category_id_by_name(response):
     # Check if 'Subcategory:' is in the response and extract the subcategory
     if "Subcategory:" in response:
-        subcategory_part = response.split("Subcategory:")[-1].strip()
+        subcategory_part = response.split("Subcategory:")[-1].strip().rstrip(".")
 
         # Query the database to find the business category by name
         business_category = (
@@ -33,6 +47,71 @@ def find_category_id_by_name(response):
     return None
 
 
+def load_categories():
+    # Plain column rows, so the session's identity map cannot serve stale names
+    return (
+        db.query(BusinessCategory.id, BusinessCategory.parent_id, BusinessCategory.name)
+        .filter(BusinessCategory.deleted_at.is_(None))
+        .all()
+    )
+
+
+def current_category_classifier():
+    """
+    Returns the shared classifier, after re-embedding the categories if any
+    was added, renamed, moved or deleted since the last call.
+    """
+    fingerprint = db.query(
+        func.count(BusinessCategory.id),
+        func.max(BusinessCategory.id),
+        func.max(BusinessCategory.updated_at),
+    ).one()
+    category_classifier.refresh(tuple(fingerprint), load_categories)
+    return category_classifier
+
+
+def classify_with_llm(description, candidates):
+    """
+    Asks the LLM to pick among the classifier's best candidates and parses
+    its reply like a primary_field_template answer.
+
+    Returns:
+        int: The chosen category ID, or None if the reply names no known category.
+    """
+    prompt = CATEGORY_FALLBACK_TEMPLATE.format(
+        description=description,
+        categories="; ".join(candidate["path"] for candidate in candidates),
+    )
+    llm = registry.llm(registry.llm_route("primary_field_template"))
+    return find_category_id_by_name(llm.invoke(prompt).content)
+
+
+def classify_business_category(description):
+    """
+    Classifies a business description against the stored categories.
+
+    Returns:
+        tuple: (business category ID or None, classification dict with the
+                scores, the "method" that decided ("embedding" or "llm") and
+                "llm_ms" when the LLM was asked)
+    """
+    classification = current_category_classifier().classify(description, k=settings.CATEGORY_FALLBACK_CANDIDATES)
+    classification["method"] = "embedding"
+    match = classification["subcategory"] or classification["category"]
+    if classification["confident"] or not settings.CATEGORY_LLM_FALLBACK or match is None:
+        return (match["id"] if match else None), classification
+
+    classification["method"] = "llm"
+    started = time.perf_counter()
+    try:
+        return classify_with_llm(description, classification["candidates"]), classification
+    except Exception as e:
+        print(f"Category LLM fallback failed: {str(e)}")
+        return None, classification
+    finally:
+        classification["llm_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+
 # Update an existing project route
 @agent_action_bp.route("/business_category/<int:id>", methods=["POST"])
 def business_category(id):
@@ -44,7 +123,14 @@ def business_category(id):
 
         # Validate the incoming JSON payload
         payload = request.get_json()
-        business_category_id = find_category_id_by_name(payload.get("response"))
+
+        # Classify the user's own description; an LLM answer ("... Subcategory: <name>") is
+        # still accepted from clients that send one instead
+        classification = None
+        if payload.get("description"):
+            business_category_id, classification = classify_business_category(payload["description"])
+        else:
+            business_category_id = find_category_id_by_name(payload.get("response") or "")
 
         # Update project fields
         project.business_category_id = business_category_id
@@ -57,6 +143,7 @@ def business_category(id):
                 {
                     "message": "Project business category updated successfully",
                     "project": ProjectResponse.model_validate(project).dict(),
+                    "classification": classification,
                 }
             ),
             200,
@@ -75,6 +162,11 @@ def business_category(id):
         return {"error": f"Error: {str(e)}"}, 500
 
 
+@agent_action_bp.route("/business_category/classifier", methods=["GET"])
+def business_category_classifier():
+    return jsonify(category_classifier.stats())
+
+
 # Update an existing project route
 @agent_action_bp.route("/target_customer/<int:id>", methods=["POST"])
 def target_customer(id):
@@ -0,0 +1,182 @@
+import os
+import tempfile
+
+from flask import Blueprint, jsonify, request, send_file
+from config import settings
+from services.collection_manager import InvalidCollectionName, collections, queue_snapshot_hydration
+from services.ingest_jobs import QueueFull
+from services.snapshot import ARCHIVE_SUFFIX, SnapshotError
+
+# Define the blueprint for document collection routes
+collections_bp = Blueprint("collections", __name__)
+
+
+# List the collections stored on disk and the ones currently resident
+@collections_bp.route("", methods=["GET"])
+def list_collections():
+    stats = collections.stats()
+    return jsonify(
+        {
+            "collections": [
+                {
+                    "name": name,
+                    "resident": name in stats["resident"],
+                    "reindex_required": not collections.parity(name)["compatible"],
+                }
+                for name in collections.names()
+            ],
+            "cache": stats,
+        }
+    )
+
+
+# Create an empty collection that documents can then be ingested into
+@collections_bp.route("", methods=["POST"])
+def create_collection():
+    try:
+        payload = request.get_json() or {}
+        name = payload.get("name")
+        if collections.exists(name):
+            return jsonify({"error": f"Collection '{name}' already exists."}), 409
+
+        collections.create(name)
+        return jsonify({"message": "Collection created successfully", "name": name}), 201
+    except InvalidCollectionName as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({"error": f"Error: {str(e)}"}), 500
+
+
+# Delete a collection and everything ingested into it
+@collections_bp.route("/<name>", methods=["DELETE"])
+def delete_collection(name):
+    try:
+        if not collections.exists(name):
+            return jsonify({"error": "Collection not found."}), 404
+
+        collections.delete(name)
+        return jsonify({"message": "Collection deleted successfully", "name": name}), 200
+    except InvalidCollectionName as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({"error": f"Error: {str(e)}"}), 500
+
+
+# Build (or rebuild) the quantized sidecar index of a collection
+@collections_bp.route("/<name>/quantized", methods=["POST"])
+def build_quantized_index(name):
+    try:
+        if not collections.exists(name):
+            return jsonify({"error": "Collection not found."}), 404
+
+        payload = request.get_json(silent=True) or {}
+        index = collections.build_quantized_index(name, payload.get("mode", settings.VECTOR_INDEX_MODE))
+        return jsonify({"message": "Quantized index built successfully", "index": index.memory_report()}), 200
+    except (InvalidCollectionName, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({"error": f"Error: {str(e)}"}), 500
+
+
+# Report memory saved and recall@k of the quantized index against exact float search
+@collections_bp.route("/<name>/quantized", methods=["GET"])
+def evaluate_quantized_index(name):
+    try:
+        index = collections.quantized_index(name)
+        if index is None:
+            return jsonify({"error": "Quantized index not found."}), 404
+
+        report = index.evaluate(
+            k=request.args.get("k", 4, type=int),
+            rerank_factor=request.args.get("rerank_factor", settings.QUANTIZED_RERANK_FACTOR, type=int),
+            samples=request.args.get("samples", 100, type=int),
+        )
+        return jsonify(report), 200
+    except InvalidCollectionName as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({"error": f"Error: {str(e)}"}), 500
+
+
+def snapshot_archive_path(name):
+    return os.path.join(settings.SNAPSHOT_DIRECTORY, f"{name}{ARCHIVE_SUFFIX}")
+
+
+# Export a collection as a portable snapshot into SNAPSHOT_DIRECTORY
+@collections_bp.route("/<name>/snapshot", methods=["POST"])
+def export_snapshot(name):
+    try:
+        if not collections.exists(name):
+            return jsonify({"error": "Collection not found."}), 404
+
+        os.makedirs(settings.SNAPSHOT_DIRECTORY, exist_ok=True)
+        archive_path = snapshot_archive_path(name)
+        manifest = collections.export_snapshot(name, archive_path)
+        manifest.pop("embedding_signature", None)
+        return jsonify({"message": "Snapshot exported successfully", "path": archive_path, "manifest": manifest}), 201
+    except InvalidCollectionName as e:
+        return jsonify({"error": str(e)}), 400
+    except SnapshotError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({"error": f"Error: {str(e)}"}), 500
+
+
+# Download the last exported snapshot of a collection
+@collections_bp.route("/<name>/snapshot", methods=["GET"])
+def download_snapshot(name):
+    try:
+        collections.path(name)  # Validate the name before building a file path from it
+        archive_path = snapshot_archive_path(name)
+        if not os.path.exists(archive_path):
+            return jsonify({"error": "Snapshot not found. Export one first."}), 404
+        return send_file(archive_path, mimetype="application/x-tar", as_attachment=True)
+    except InvalidCollectionName as e:
+        return jsonify({"error": str(e)}), 400
+
+
+# Import a snapshot (uploaded as "file", or the one in SNAPSHOT_DIRECTORY) and serve it right away
+@collections_bp.route("/<name>/snapshot/import", methods=["POST"])
+def import_snapshot(name):
+    temp_file_path = None
+    try:
+        collections.path(name)
+        upload = request.files.get("file")
+        if upload is not None:
+            with tempfile.NamedTemporaryFile(prefix="snapshot-", suffix=ARCHIVE_SUFFIX, delete=False) as temp_file:
+                upload.save(temp_file)
+                temp_file_path = temp_file.name
+            archive_path = temp_file_path
+        else:
+            archive_path = snapshot_archive_path(name)
+            if not os.path.exists(archive_path):
+                return jsonify({"error": "Snapshot not found. Upload it as 'file'."}), 404
+
+        manifest = collections.import_snapshot(name, archive_path)
+        job = queue_snapshot_hydration(name, request.form.get("session_id"))
+        return jsonify(
+            {
+                "message": "Snapshot imported; the collection is being loaded in the background",
+                "records": manifest["count"],
+                "job_id": job.id,
+                "status_url": f"/ingest/{job.id}",
+            }
+        ), 202
+    except InvalidCollectionName as e:
+        return jsonify({"error": str(e)}), 400
+    except SnapshotError as e:
+        return jsonify({"error": str(e)}), 400
+    except QueueFull as e:
+        # The snapshot keeps serving; hydration resumes at the next bootstrap
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({"error": f"Error: {str(e)}"}), 500
+    finally:
+        if temp_file_path is not None:
+            os.remove(temp_file_path)
@@ -0,0 +1,278 @@
+import base64
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from config import settings
+
+MEMORY = "memory"
+REDIS = "redis"
+DISABLED = "none"
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class InMemoryAnswerBackend:
+    """
+    Process-local entries, shared by every namespace, bounded by `max_entries`
+    (least recently used first) and expiring after `ttl_seconds`.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._namespaces = {}
+        self._matrices = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _drop(self, entry_id):
+        namespace = self._entries.pop(entry_id)[0]
+        self._namespaces[namespace].discard(entry_id)
+        if not self._namespaces[namespace]:
+            del self._namespaces[namespace]
+        self._matrices.pop(namespace, None)
+
+    def nearest(self, namespace: str, vector):
+        with self._lock:
+            entry_ids = self._namespaces.get(namespace)
+            if not entry_ids:
+                return None
+            now = time.time()
+            for entry_id in [entry_id for entry_id in entry_ids if self._entries[entry_id][3] <= now]:
+                self._drop(entry_id)
+            if namespace not in self._namespaces:
+                return None
+
+            matrix = self._matrices.get(namespace)
+            if matrix is None:
+                ids = list(self._namespaces[namespace])
+                matrix = self._matrices[namespace] = (ids, np.stack([self._entries[entry_id][1] for entry_id in ids]))
+            ids, vectors = matrix
+            similarities = vectors @ vector
+            best = int(np.argmax(similarities))
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            return float(similarities[best]), self._entries[entry_id][2]
+
+    def store(self, namespace: str, vector, payload: dict, ttl_seconds: float):
+        with self._lock:
+            entry_id = uuid.uuid4().hex
+            self._entries[entry_id] = (namespace, vector, payload, time.time() + ttl_seconds)
+            self._namespaces.setdefault(namespace, set()).add(entry_id)
+            self._matrices.pop(namespace, None)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, prefix: str):
+        with self._lock:
+            removed = 0
+            for namespace in [namespace for namespace in self._namespaces if namespace.startswith(prefix)]:
+                for entry_id in list(self._namespaces[namespace]):
+                    self._drop(entry_id)
+                    removed += 1
+            return removed
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisAnswerBackend:
+    """
+    Entries shared by every replica through redis.
+
+    Each entry is a key with its own expiry holding the answer and the query
+    vector; a sorted set per namespace lists the entry ids by last use and is
+    trimmed to `max_entries` (least recently used first). Vectors never
+    change, so they are fetched once and memoised locally; a lookup only
+    reads the id set plus vectors of entries this process has not seen yet.
+    """
+
+    def __init__(self, url: str, max_entries: int = 10000, prefix: str = "answer_cache"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self._vectors = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _index_key(self, namespace: str):
+        return f"{self.prefix}:{namespace}:ids"
+
+    def _entry_key(self, namespace: str, entry_id: str):
+        return f"{self.prefix}:{namespace}:entry:{entry_id}"
+
+    def nearest(self, namespace: str, vector):
+        entry_ids = [entry_id.decode() for entry_id in self.client.zrange(self._index_key(namespace), 0, -1)]
+        if not entry_ids:
+            return None
+
+        with self._lock:
+            # Only ids still listed are kept, so the memo never outgrows the namespace
+            known = self._vectors.get(namespace, {})
+            memo = self._vectors[namespace] = {entry_id: known[entry_id] for entry_id in entry_ids if entry_id in known}
+            unseen = [entry_id for entry_id in entry_ids if entry_id not in memo]
+        if unseen:
+            records = self.client.mget([self._entry_key(namespace, entry_id) for entry_id in unseen])
+            expired = []
+            for entry_id, record in zip(unseen, records):
+                if record is None:
+                    expired.append(entry_id)
+                    continue
+                encoded = json.loads(record)["vector"]
+                memo[entry_id] = np.frombuffer(base64.b64decode(encoded), dtype=np.float32)
+            if expired:
+                self.client.zrem(self._index_key(namespace), *expired)
+
+        candidates = [(entry_id, memo[entry_id]) for entry_id in entry_ids if entry_id in memo]
+        if not candidates:
+            return None
+        similarities = np.stack([candidate for _, candidate in candidates]) @ vector
+        best = int(np.argmax(similarities))
+        entry_id = candidates[best][0]
+
+        record = self.client.get(self._entry_key(namespace, entry_id))
+        if record is None:
+            # Expired since the id set was read
+            self.client.zrem(self._index_key(namespace), entry_id)
+            memo.pop(entry_id, None)
+            return None
+        self.client.zadd(self._index_key(namespace), {entry_id: time.time()})
+        return float(similarities[best]), json.loads(record)["payload"]
+
+    def store(self, namespace: str, vector, payload: dict, ttl_seconds: float):
+        entry_id = uuid.uuid4().hex
+        record = json.dumps({"payload": payload, "vector": base64.b64encode(vector.tobytes()).decode()})
+        index_key = self._index_key(namespace)
+        pipeline = self.client.pipeline()
+        pipeline.set(self._entry_key(namespace, entry_id), record, ex=max(int(ttl_seconds), 1))
+        pipeline.zadd(index_key, {entry_id: time.time()})
+        pipeline.expire(index_key, max(int(ttl_seconds), 1))
+        pipeline.zcard(index_key)
+        overflow = pipeline.execute()[-1] - self.max_entries
+        if overflow > 0:
+            evicted = [entry_id.decode() for entry_id, _ in self.client.zpopmin(index_key, overflow)]
+            self.client.delete(*[self._entry_key(namespace, evicted_id) for evicted_id in evicted])
+            self.evictions += len(evicted)
+        with self._lock:
+            self._vectors.setdefault(namespace, {})[entry_id] = vector
+
+    def invalidate(self, prefix: str):
+        keys = list(self.client.scan_iter(match=f"{self.prefix}:{prefix}*", count=1000))
+        for start in range(0, len(keys), 1000):
+            self.client.delete(*keys[start:start + 1000])
+        with self._lock:
+            for namespace in [namespace for namespace in self._vectors if namespace.startswith(prefix)]:
+                del self._vectors[namespace]
+        return sum(1 for key in keys if b":entry:" in key)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(match=f"{self.prefix}:*:entry:*", count=1000))
+
+
+class SemanticAnswerCache:
+    """
+    Reuses /ask answers for questions that mean the same thing.
+
+    Entries live in a namespace per (collection, collection version, prompt
+    template, retrieval mode). A lookup embeds nothing itself: it takes the query embedding,
+    finds the most similar cached question in the namespace and returns its
+    answer when the cosine similarity reaches `threshold`. Bumping a
+    collection's version on every write makes stale answers unreachable at
+    once, and `invalidate()` then frees them.
+    """
+
+    def __init__(self, backend, threshold: float = 0.95, ttl_seconds: float = 3600):
+        self.backend = backend
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self._hit_similarity = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def namespace(collection_name: str, collection_version: str, template_name: str, retrieval_mode: str):
+        return f"{collection_name}:{collection_version}:{template_name}:{retrieval_mode}"
+
+    def lookup(self, namespace: str, query_vector):
+        """
+        Returns:
+            tuple: (payload, similarity) of the closest cached answer, or None.
+        """
+        found = self.backend.nearest(namespace, _unit(query_vector))
+        with self._lock:
+            if found is None or found[0] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._hit_similarity += found[0]
+        return found[1], found[0]
+
+    def store(self, namespace: str, query_vector, payload: dict):
+        self.backend.store(namespace, _unit(query_vector), payload, self.ttl_seconds)
+        with self._lock:
+            self.stores += 1
+
+    def invalidate(self, collection_name: str):
+        """Drops every cached answer of a collection, across versions, templates and retrieval modes."""
+        removed = self.backend.invalidate(f"{collection_name}:")
+        with self._lock:
+            self.invalidations += 1
+        if removed:
+            print(f"Answer cache: dropped {removed} answers for collection {collection_name}.")
+        return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": MEMORY if isinstance(self.backend, InMemoryAnswerBackend) else REDIS,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "avg_hit_similarity": round(self._hit_similarity / self.hits, 4) if self.hits else None,
+                "stores": self.stores,
+                "evictions": self.backend.evictions,
+                "invalidations": self.invalidations,
+                "entries": self.backend.size(),
+            }
+
+
+def create_answer_cache(backend: str, threshold: float, ttl_seconds: float, max_entries: int, redis_url: str = None):
+    """
+    Builds the answer cache for the configured backend: "memory", "redis"
+    (shared between replicas) or "none", which returns None.
+    """
+    if backend == DISABLED:
+        return None
+    if backend == MEMORY:
+        return SemanticAnswerCache(InMemoryAnswerBackend(max_entries), threshold, ttl_seconds)
+    if backend == REDIS:
+        return SemanticAnswerCache(RedisAnswerBackend(redis_url, max_entries), threshold, ttl_seconds)
+    raise ValueError(f"Unknown answer cache backend '{backend}'. Use '{MEMORY}', '{REDIS}' or '{DISABLED}'.")
+
+
+# Answer cache shared by every request of this process (None when disabled)
+answer_cache = create_answer_cache(
+    settings.ANSWER_CACHE_BACKEND,
+    settings.ANSWER_CACHE_THRESHOLD,
+    settings.ANSWER_CACHE_TTL_SECONDS,
+    settings.ANSWER_CACHE_MAX_ENTRIES,
+    redis_url=settings.REDIS_URL,
+)
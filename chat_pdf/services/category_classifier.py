@@ -0,0 +1,159 @@
+import threading
+import time
+
+import numpy as np
+
+# Joins a category to its ancestors in the text that is embedded for it
+PATH_SEPARATOR = " > "
+
+
+def category_paths(categories):
+    """
+    Walks the parent chain of every category.
+
+    Args:
+        categories (list): (id, parent_id, name) rows; a parent that is not
+            among them (deleted) makes its child a top-level category.
+
+    Returns:
+        dict: {id: [ids from the top-level category down to `id`]}
+    """
+    parents = {category_id: parent_id for category_id, parent_id, _ in categories}
+    paths = {}
+    for category_id in parents:
+        path = [category_id]
+        parent_id = parents[category_id]
+        # The seen check stops on a cycle instead of looping forever
+        while parent_id in parents and parent_id not in path:
+            path.insert(0, parent_id)
+            parent_id = parents[parent_id]
+        paths[category_id] = path
+    return paths
+
+
+class CategoryClassifier:
+    """
+    Picks the business category and subcategory that best match a free-text
+    business description, by cosine similarity between the description and
+    precomputed embeddings of every category's path ("E-commerce > Online
+    Food Delivery").
+
+    The best matching node decides the result: its top-level ancestor is
+    the category and the node itself the subcategory. When a top-level
+    category matches best, its best matching child becomes the subcategory.
+    A match is confident when it scores at least `min_score` and beats the
+    best node under any other top-level category by `min_margin`.
+
+    `refresh` re-embeds the categories only when their fingerprint changes.
+    Classification reads an immutable snapshot, so it is safe from any
+    request thread.
+    """
+
+    def __init__(self, embedding_factory, min_score: float = 0.4, min_margin: float = 0.03):
+        self.embedding_factory = embedding_factory
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._snapshot = None
+        self.refreshes = 0
+
+    def refresh(self, fingerprint, load_categories):
+        """
+        Re-embeds the categories returned by `load_categories()` (a list of
+        (id, parent_id, name) rows) unless `fingerprint` matches the one they
+        were last embedded at.
+
+        Returns:
+            bool: True if the categories were re-embedded.
+        """
+        if fingerprint == self._fingerprint:
+            return False
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if fingerprint == self._fingerprint:
+                return False
+            self.fit(load_categories())
+            self._fingerprint = fingerprint
+            return True
+
+    def fit(self, categories):
+        categories = list(categories)
+        names = {category_id: name for category_id, _, name in categories}
+        paths = category_paths(categories)
+        ids = [category_id for category_id, _, _ in categories]
+        texts = [PATH_SEPARATOR.join(names[node] for node in paths[category_id]) for category_id in ids]
+
+        vectors = np.zeros((0, 0), dtype=np.float32)
+        if texts:
+            vectors = np.asarray(self.embedding_factory().embed_documents(texts), dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        children = {}
+        for category_id in ids:
+            if len(paths[category_id]) > 1:
+                children.setdefault(paths[category_id][-2], []).append(category_id)
+        self._snapshot = {
+            "ids": ids,
+            "rows": {category_id: row for row, category_id in enumerate(ids)},
+            "names": names,
+            "paths": paths,
+            "texts": texts,
+            "children": children,
+            "vectors": vectors,
+        }
+        self.refreshes += 1
+
+    def _describe(self, snapshot, category_id, scores):
+        return {
+            "id": category_id,
+            "name": snapshot["names"][category_id],
+            "path": snapshot["texts"][snapshot["rows"][category_id]],
+            "score": round(float(scores[snapshot["rows"][category_id]]), 4),
+        }
+
+    def classify(self, text: str, k: int = 5):
+        """
+        Returns:
+            dict: {"category": {"id", "name", "path", "score"} or None,
+                   "subcategory": same or None, "confident": bool,
+                   "candidates": the `k` best matching categories, "classify_ms"}
+        """
+        started = time.perf_counter()
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot["ids"]:
+            return {"category": None, "subcategory": None, "confident": False, "candidates": [], "classify_ms": 0.0}
+
+        query = np.asarray(self.embedding_factory().embed_query(text), dtype=np.float32)
+        scores = snapshot["vectors"] @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        ranked = np.argsort(-scores)
+        best = snapshot["ids"][int(ranked[0])]
+
+        path = snapshot["paths"][best]
+        category_id, subcategory_id = path[0], best if len(path) > 1 else None
+        if subcategory_id is None and snapshot["children"].get(best):
+            subcategory_id = max(snapshot["children"][best], key=lambda child: scores[snapshot["rows"][child]])
+
+        # Runner-up: the best node filed under a different top-level category
+        runner_up = next(
+            (float(scores[row]) for row in ranked[1:] if snapshot["paths"][snapshot["ids"][int(row)]][0] != category_id),
+            None,
+        )
+        top_score = float(scores[int(ranked[0])])
+        confident = top_score >= self.min_score and (runner_up is None or top_score - runner_up >= self.min_margin)
+
+        return {
+            "category": self._describe(snapshot, category_id, scores),
+            "subcategory": self._describe(snapshot, subcategory_id, scores) if subcategory_id is not None else None,
+            "confident": confident,
+            "candidates": [self._describe(snapshot, snapshot["ids"][int(row)], scores) for row in ranked[:k]],
+            "classify_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "categories": len(snapshot["ids"]) if snapshot else 0,
+            "refreshes": self.refreshes,
+            "min_score": self.min_score,
+            "min_margin": self.min_margin,
+        }
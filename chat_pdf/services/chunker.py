@@ -0,0 +1,177 @@
+import re
+from collections import deque
+
+from langchain_core.documents import Document
+from langchain_text_splitters import TextSplitter
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+# Rough stand-in for a BPE tokenizer when no tiktoken encoding can be loaded:
+# words and individual punctuation marks, which tracks GPT token counts for prose
+_APPROXIMATE_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def token_counter(encoding_name: str = None):
+    """
+    Returns a function mapping a list of texts to their token counts.
+
+    Uses the named tiktoken encoding (e.g. "o200k_base" for the gpt-4o
+    family) when it is available locally; tiktoken downloads encodings on
+    first use, so offline hosts fall back to an approximate word and
+    punctuation count instead of failing ingestion.
+    """
+    if encoding_name:
+        try:
+            import tiktoken
+
+            encoding = tiktoken.get_encoding(encoding_name)
+            return lambda texts: [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+        except Exception as error:
+            print(f"Token encoding '{encoding_name}' unavailable ({error.__class__.__name__}), approximating token counts.")
+    return lambda texts: [len(_APPROXIMATE_TOKEN_PATTERN.findall(text)) for text in texts]
+
+
+class RecursiveChunker(TextSplitter):
+    """
+    Drop-in replacement for RecursiveCharacterTextSplitter's default
+    configuration that works on character offsets instead of strings.
+
+    The algorithm is the same: pick the first separator present in the text,
+    cut before every occurrence of it, merge consecutive pieces up to
+    `chunk_size` with `chunk_overlap` carried over, and recurse into pieces
+    that are still too large with the remaining separators. Because the
+    separators are kept at the start of each piece, the pieces are contiguous
+    slices of the input, so a merged chunk is a single slice and nothing is
+    copied or re-joined until the chunk is emitted. Each separator level scans
+    a character at most once, and the merge window is a deque, so splitting
+    is linear in the text length (RecursiveCharacterTextSplitter re-slices
+    its window list on every pop, which is quadratic in pieces per chunk at
+    the character level).
+
+    The chunk boundaries match RecursiveCharacterTextSplitter with the same
+    chunk_size, chunk_overlap and literal separators. It differs where that
+    splitter is configurable beyond its defaults: lengths are always counted
+    in characters (no `length_function`), separators are always kept at the
+    start of a piece, regex separators are not supported, and surrounding
+    whitespace is always stripped. benchmarks.chunker_benchmark checks the
+    boundaries against the LangChain splitter.
+
+    `split_documents` adds to each chunk's metadata:
+        start_index / end_index: Character offsets of the chunk in the
+            source document text.
+        token_count: Tokens in the chunk, see `token_counter`.
+    and keeps the source metadata (including the loader's `page` number).
+    """
+
+    def __init__(self, chunk_size: int = 1024, chunk_overlap: int = 100, separators=None, token_encoding: str = None):
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, keep_separator=True)
+        self._separators = separators or DEFAULT_SEPARATORS
+        self._patterns = [re.compile(re.escape(separator)) if separator else None for separator in self._separators]
+        self._count_tokens = token_counter(token_encoding)
+
+    def split_text(self, text: str):
+        return [text[start:end] for start, end in self.split_offsets(text)]
+
+    def split_offsets(self, text: str):
+        """
+        Returns:
+            list: (start, end) offsets of each chunk in `text`.
+        """
+        spans = []
+        self._split(text, 0, len(text), 0, spans)
+        return spans
+
+    def create_documents(self, texts, metadatas=None):
+        metadatas = metadatas or [{}] * len(texts)
+        documents = []
+        for text, metadata in zip(texts, metadatas):
+            spans = self.split_offsets(text)
+            chunks = [text[start:end] for start, end in spans]
+            for chunk, (start, end), tokens in zip(chunks, spans, self._count_tokens(chunks)):
+                # Shallow copy: loader metadata only holds scalars, and deepcopy per chunk is measurable
+                chunk_metadata = dict(metadata)
+                chunk_metadata["start_index"] = start
+                chunk_metadata["end_index"] = end
+                chunk_metadata["token_count"] = tokens
+                documents.append(Document(page_content=chunk, metadata=chunk_metadata))
+        return documents
+
+    def _pieces(self, text: str, start: int, end: int, level: int):
+        """
+        Chooses the separator for text[start:end] and returns the piece
+        offsets along with the level to recurse into for oversized pieces
+        (None when no finer separator is left).
+        """
+        for index in range(level, len(self._separators)):
+            pattern = self._patterns[index]
+            if pattern is None:
+                return None, None  # Character level, see `_merge_characters`
+            if pattern.search(text, start, end):
+                next_level = index + 1 if index + 1 < len(self._separators) else None
+                cuts = [match.start() for match in pattern.finditer(text, start, end)]
+                bounds = [start, *cuts, end]
+                pieces = [(left, right) for left, right in zip(bounds, bounds[1:]) if right > left]
+                return pieces, next_level
+        # No separator occurs: the last one "splits" the text into itself
+        return [(start, end)], None
+
+    def _split(self, text: str, start: int, end: int, level: int, spans: list):
+        pieces, next_level = self._pieces(text, start, end, level)
+        if pieces is None and self._chunk_size > 1:
+            self._merge_characters(text, start, end, spans)
+            return
+        if pieces is None:
+            pieces = [(position, position + 1) for position in range(start, end)]
+        good = []
+        for piece_start, piece_end in pieces:
+            if piece_end - piece_start < self._chunk_size:
+                good.append((piece_start, piece_end))
+                continue
+            if good:
+                self._merge(text, good, spans)
+                good = []
+            if next_level is None:
+                spans.append((piece_start, piece_end))  # Emitted as-is, like the LangChain splitter
+            else:
+                self._split(text, piece_start, piece_end, next_level, spans)
+        if good:
+            self._merge(text, good, spans)
+
+    def _merge(self, text: str, pieces: list, spans: list):
+        window = deque()
+        total = 0
+        for piece in pieces:
+            length = piece[1] - piece[0]
+            if total + length > self._chunk_size and window:
+                self._emit(text, window[0][0], window[-1][1], spans)
+                while total > self._chunk_overlap or (total + length > self._chunk_size and total > 0):
+                    dropped = window.popleft()
+                    total -= dropped[1] - dropped[0]
+            window.append(piece)
+            total += length
+        if window:
+            self._emit(text, window[0][0], window[-1][1], spans)
+
+    def _merge_characters(self, text: str, start: int, end: int, spans: list):
+        """
+        `_merge` for single-character pieces: every window is exactly
+        chunk_size characters and the next one starts `keep` characters
+        before it ends, so the windows are computed without materialising
+        one piece per character.
+        """
+        keep = min(self._chunk_overlap, self._chunk_size - 1)
+        window_start = start
+        while True:
+            window_end = min(window_start + self._chunk_size, end)
+            self._emit(text, window_start, window_end, spans)
+            if window_end >= end:
+                return
+            window_start = window_end - keep
+
+    @staticmethod
+    def _emit(text: str, start: int, end: int, spans: list):
+        chunk = text[start:end]
+        stripped = chunk.strip()
+        if stripped:
+            start += len(chunk) - len(chunk.lstrip())
+            spans.append((start, start + len(stripped)))
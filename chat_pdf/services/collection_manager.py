@@ -0,0 +1,558 @@
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from langchain.vectorstores import Chroma
+
+from config import settings
+from services import ingest_jobs
+from services.embeddings import check_parity, read_signature, write_signature
+from services.exact_store import CHROMA, EXACT, INDEX_DIRECTORY as EXACT_DIRECTORY, VECTOR_STORES, ExactVectorStore, copy_collection
+from services.ingest_jobs import ingest_queue
+from services.lexical_index import INDEX_DIRECTORY as LEXICAL_INDEX_DIRECTORY, LexicalIndex
+from services.memory import format_bytes
+from services.model_registry import registry
+from services.quantized_index import INDEX_DIRECTORY, MODES as QUANTIZED_MODES, QuantizedIndex
+from services.snapshot import ARCHIVE_SUFFIX, SNAPSHOT_DIRECTORY, SnapshotError, SnapshotStore, unpack_snapshot, write_snapshot
+from services.vector_store import release_store
+
+COLLECTION_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+VERSION_FILENAME = "collection_version"
+CHROMA_DATABASE_FILENAME = "chroma.sqlite3"
+# Written once a Chroma collection has been copied into the exact store, so it is copied only once
+MIGRATED_FILENAME = "migrated_to_exact"
+
+
+class InvalidCollectionName(ValueError):
+    """Raised for collection names that are not safe to use as a directory name."""
+
+
+def directory_size(path: str):
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return total
+
+
+class CollectionManager:
+    """
+    Named vector collections stored as subdirectories of `root_directory`,
+    held in Chroma or, with `vector_store="exact"`, in an ExactVectorStore.
+
+    Handles are opened lazily on first use and kept in an LRU. When more than
+    `max_resident` handles are open, or their estimated footprint exceeds
+    `memory_budget_bytes`, the least recently used ones are released. The
+    footprint of a collection is estimated from its size on disk, which is
+    dominated by the HNSW index that Chroma loads into memory. Collections
+    pinned by an ingest or query in progress are never evicted, so their
+    handles and lexical index stay open until it finishes.
+
+    Writes go through `writing()`: ingests share a collection, while a
+    reset waits for them and holds it exclusively.
+
+    Each collection also records the signature of the embedding backend it
+    was indexed with, so a backend switch that would need a re-index is
+    detected instead of silently returning poor matches, and a content
+    version that changes on every write, so anything derived from the
+    collection (such as cached answers) can tell when it went stale.
+    """
+
+    def __init__(
+        self,
+        root_directory: str,
+        embedding_factory,
+        signature_factory=None,
+        max_resident: int = 16,
+        memory_budget_bytes: int = None,
+        parity_min_cosine: float = 0.99,
+        vector_store: str = CHROMA,
+        exact_dtype: str = "float32",
+    ):
+        if vector_store not in VECTOR_STORES:
+            raise ValueError(f"Unknown vector store '{vector_store}'. Use one of {', '.join(VECTOR_STORES)}.")
+        self.root_directory = root_directory
+        self.vector_store = vector_store
+        self.exact_dtype = exact_dtype
+        self.embedding_factory = embedding_factory
+        self.signature_factory = signature_factory
+        self.parity_min_cosine = parity_min_cosine
+        self._parity = {}
+        self._quantized = {}
+        self._snapshots = {}
+        self._lexical = {}
+        self._versions = {}
+        self._change_listeners = []
+        self.max_resident = max_resident
+        self.memory_budget_bytes = memory_budget_bytes
+        self._handles = OrderedDict()
+        self._sizes = {}
+        self._pins = {}
+        self._lock = threading.RLock()
+        self._writes = threading.Condition()
+        self._writers = {}
+        self._exclusive_writers = {}
+        # Index builds share a staging directory, so concurrent ingests take turns
+        self._build_lock = threading.Lock()
+
+    def path(self, name: str):
+        if not COLLECTION_NAME_PATTERN.match(name or ""):
+            raise InvalidCollectionName(
+                f"Invalid collection name '{name}'. Use up to 64 letters, digits, '-' or '_'."
+            )
+        return os.path.join(self.root_directory, name)
+
+    def exists(self, name: str):
+        path = self.path(name)
+        return os.path.isdir(path) and bool(os.listdir(path))
+
+    def names(self):
+        if not os.path.isdir(self.root_directory):
+            return []
+        return sorted(
+            name
+            for name in os.listdir(self.root_directory)
+            if COLLECTION_NAME_PATTERN.match(name) and os.path.isdir(os.path.join(self.root_directory, name))
+        )
+
+    def create(self, name: str):
+        os.makedirs(self.path(name), exist_ok=True)
+        return self.get(name)
+
+    def get(self, name: str):
+        """
+        Returns the Chroma handle for `name`, opening it if it is not resident.
+        Callers check `exists()` first when a missing collection is an error;
+        otherwise the collection is created on first write.
+        """
+        path = self.path(name)
+        with self._lock:
+            db = self._handles.get(name)
+            if db is not None:
+                self._handles.move_to_end(name)
+                return db
+
+            os.makedirs(path, exist_ok=True)
+            db = self._open(path)
+            self._handles[name] = db
+            self._sizes[name] = directory_size(path)
+            print(f"Opened collection {name} (~{format_bytes(self._sizes[name])}).")
+            self._evict(keep=name)
+            return db
+
+    def pin(self, name: str):
+        """Keeps `name` resident until a matching `unpin()`; pins are counted."""
+        with self._lock:
+            self._pins[name] = self._pins.get(name, 0) + 1
+
+    def unpin(self, name: str):
+        with self._lock:
+            count = self._pins.get(name, 0) - 1
+            if count > 0:
+                self._pins[name] = count
+                return
+            self._pins.pop(name, None)
+            # Evictions skipped while the collection was pinned happen now
+            if name in self._handles:
+                self._evict(keep=None)
+
+    @contextmanager
+    def pinned(self, name: str):
+        self.pin(name)
+        try:
+            yield
+        finally:
+            self.unpin(name)
+
+    @contextmanager
+    def writing(self, name: str, exclusive: bool = False):
+        """
+        Holds `name` for writing until the block exits. Any number of shared
+        writers (ingests syncing documents) run side by side; an exclusive
+        writer (a reset) waits until they are done and keeps new ones out
+        until it is, so nothing writes into a collection while it is dropped.
+        """
+        with self._writes:
+            if exclusive:
+                # Counted while waiting too, so a stream of ingests cannot starve the reset
+                self._exclusive_writers[name] = self._exclusive_writers.get(name, 0) + 1
+                self._writes.wait_for(lambda: not self._writers.get(name))
+                self._writers[name] = -1
+            else:
+                self._writes.wait_for(lambda: not self._exclusive_writers.get(name) and self._writers.get(name, 0) >= 0)
+                self._writers[name] = self._writers.get(name, 0) + 1
+        try:
+            yield
+        finally:
+            with self._writes:
+                if exclusive:
+                    self._exclusive_writers[name] -= 1
+                    if not self._exclusive_writers[name]:
+                        del self._exclusive_writers[name]
+                    del self._writers[name]
+                else:
+                    self._writers[name] -= 1
+                    if not self._writers[name]:
+                        del self._writers[name]
+                self._writes.notify_all()
+
+    def _open(self, path: str):
+        if self.vector_store == CHROMA:
+            return Chroma(persist_directory=path, embedding_function=self.embedding_factory())
+
+        created = not ExactVectorStore.exists(path)
+        db = ExactVectorStore(path, self.embedding_factory(), dtype=self.exact_dtype)
+        migrated = os.path.exists(os.path.join(path, MIGRATED_FILENAME))
+        if created and not migrated and os.path.exists(os.path.join(path, CHROMA_DATABASE_FILENAME)):
+            # Collections indexed with Chroma are copied over once, with their stored vectors
+            chroma = Chroma(persist_directory=path, embedding_function=self.embedding_factory())
+            copied = copy_collection(chroma, db)
+            release_store(chroma)
+            with open(os.path.join(path, MIGRATED_FILENAME), "w") as marker_file:
+                marker_file.write(str(copied))
+            print(f"Copied {copied} records from Chroma into the exact vector store at {path}.")
+        return db
+
+    def _drop_inactive_store(self, path: str):
+        """
+        Drops the copy of a collection held by the vector store that is not
+        active, so a reset cannot be undone by migrating it back in later.
+        """
+        if self.vector_store == EXACT:
+            if os.path.exists(os.path.join(path, CHROMA_DATABASE_FILENAME)):
+                chroma = Chroma(persist_directory=path, embedding_function=self.embedding_factory())
+                chroma.delete_collection()
+                release_store(chroma)
+        else:
+            shutil.rmtree(os.path.join(path, EXACT_DIRECTORY), ignore_errors=True)
+        try:
+            os.remove(os.path.join(path, MIGRATED_FILENAME))
+        except FileNotFoundError:
+            pass
+
+    def parity(self, name: str):
+        """
+        Checks whether the active embedding backend can serve `name`.
+
+        Returns:
+            dict: See `services.embeddings.check_parity`.
+        """
+        with self._lock:
+            if name not in self._parity:
+                stored = read_signature(self.path(name)) if self.exists(name) else None
+                self._parity[name] = check_parity(stored, self.signature_factory(), self.parity_min_cosine)
+                if not self._parity[name]["compatible"]:
+                    print(f"Collection {name} needs a re-index: {self._parity[name]['reason']}")
+            return self._parity[name]
+
+    def stamp(self, name: str, overwrite: bool = False):
+        """Records the active embedding signature for a collection that was just written."""
+        with self._lock:
+            path = self.path(name)
+            if overwrite or read_signature(path) is None:
+                write_signature(path, self.signature_factory())
+            self._parity.pop(name, None)
+
+    def _version_stamp(self, name: str):
+        # The version file is replaced, never rewritten, so inode and mtime change on every bump
+        try:
+            stat = os.stat(os.path.join(self.path(name), VERSION_FILENAME))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def version(self, name: str):
+        """
+        Returns the content version of `name`, kept in the collection
+        directory and re-read whenever that file changes, so replicas sharing
+        the volume agree on it.
+        """
+        stamp = self._version_stamp(name)
+        with self._lock:
+            cached = self._versions.get(name)
+            if cached is None or cached[0] != stamp:
+                version = "0"
+                if stamp is not None:
+                    try:
+                        with open(os.path.join(self.path(name), VERSION_FILENAME)) as version_file:
+                            version = version_file.read().strip()
+                    except FileNotFoundError:
+                        stamp = None
+                cached = self._versions[name] = (stamp, version)
+            return cached[1]
+
+    def bump_version(self, name: str, version: str = None):
+        """
+        Records that the contents of `name` changed and notifies the
+        listeners registered with `on_change()`.
+        """
+        version = version or uuid.uuid4().hex
+        with self._lock:
+            path = self.path(name)
+            if os.path.isdir(path):
+                staged = os.path.join(path, f".{VERSION_FILENAME}.{uuid.uuid4().hex}")
+                with open(staged, "w") as version_file:
+                    version_file.write(version)
+                os.replace(staged, os.path.join(path, VERSION_FILENAME))
+            self._versions[name] = (self._version_stamp(name), version)
+            listeners = list(self._change_listeners)
+        for listener in listeners:
+            try:
+                listener(name)
+            except Exception as e:
+                print(f"Collection change listener failed for {name}: {str(e)}")
+        return version
+
+    def on_change(self, listener):
+        """Registers `listener(name)`, called whenever a collection's version changes."""
+        with self._lock:
+            self._change_listeners.append(listener)
+
+    def quantized_index(self, name: str):
+        """Returns the quantized sidecar index of `name`, or None if it has not been built."""
+        with self._lock:
+            if name not in self._quantized:
+                path = self.path(name)
+                self._quantized[name] = QuantizedIndex(os.path.join(path, INDEX_DIRECTORY)) if QuantizedIndex.exists(path) else None
+            return self._quantized[name]
+
+    def build_quantized_index(self, name: str, mode: str):
+        with self._build_lock:
+            index = QuantizedIndex.build(self.get(name), self.path(name), mode)
+        with self._lock:
+            self._quantized[name] = index
+        return index
+
+    def lexical_index(self, name: str):
+        """
+        Returns the BM25 index of `name`, loading it from disk on first use.
+        Collections ingested before lexical indexing existed are indexed
+        from their stored chunks once. The index is only saved at the end of
+        an ingest, so one that disagrees with the collection on the number
+        of chunks (the process died mid-ingest) is rebuilt the same way.
+        """
+        with self._lock:
+            index = self._lexical.get(name)
+            if index is None:
+                path = self.path(name)
+                db = self.get(name)
+                if LexicalIndex.exists(path):
+                    index = LexicalIndex.load(path)
+                    stored = db._collection.count()
+                    if len(index) != stored:
+                        print(f"Lexical index of {name} has {len(index)} chunks, the collection {stored}; rebuilding it.")
+                        index = None
+                if index is None:
+                    index = LexicalIndex.build(db, path)
+                self._lexical[name] = index
+            return index
+
+    def snapshot_store(self, name: str):
+        """
+        Returns the imported snapshot that serves `name` until it has been
+        loaded into Chroma, or None for collections served by Chroma.
+        """
+        with self._lock:
+            if name not in self._snapshots:
+                path = self.path(name)
+                self._snapshots[name] = (
+                    SnapshotStore(os.path.join(path, SNAPSHOT_DIRECTORY)) if SnapshotStore.exists(path) else None
+                )
+            return self._snapshots[name]
+
+    def export_snapshot(self, name: str, archive_path: str):
+        if self.snapshot_store(name) is not None:
+            raise SnapshotError(f"Collection {name} is still being loaded from a snapshot; export it once that finishes.")
+        return write_snapshot(self.get(name), self.path(name), archive_path, collection_name=name)
+
+    def import_snapshot(self, name: str, archive_path: str):
+        """
+        Replaces the contents of `name` with a snapshot. The collection can
+        serve queries from the memory-mapped snapshot as soon as this
+        returns; `hydrate()` then loads it into Chroma.
+        """
+        path = self.path(name)
+        # Unpacked and verified before taking the lock, which every collection shares, and before
+        # anything is dropped, so a corrupt archive leaves the collection intact. The staging
+        # directory is not a valid collection name, so it never shows up as one
+        os.makedirs(self.root_directory, exist_ok=True)
+        staging = os.path.join(self.root_directory, f".{name}.importing-{uuid.uuid4().hex}")
+        manifest = unpack_snapshot(archive_path, staging)
+        try:
+            with self.writing(name, exclusive=True), self._lock:
+                self.reset(name)
+                target = os.path.join(path, SNAPSHOT_DIRECTORY)
+                shutil.rmtree(target, ignore_errors=True)
+                os.replace(staging, target)
+                if manifest["embedding_signature"] is not None:
+                    write_signature(path, manifest["embedding_signature"])
+                self._parity.pop(name, None)
+                self._quantized.pop(name, None)
+                self._snapshots.pop(name, None)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        # Replicas importing the same snapshot end up on the same version
+        self.bump_version(name, manifest["checksum"][:32])
+        print(f"Imported snapshot of {manifest['count']} records into collection {name}.")
+        return manifest
+
+    def hydrate(self, name: str, on_progress=None):
+        """
+        Writes an imported snapshot into Chroma using its stored vectors (no
+        re-embedding), then drops the snapshot so Chroma serves the
+        collection. Chunks ingested meanwhile become searchable at that point.
+        """
+        store = self.snapshot_store(name)
+        if store is None:
+            return 0
+        with self.pinned(name):
+            db = self.get(name)
+            lexical = self.lexical_index(name)
+            for ids, vectors, texts, metadatas in store.iter_batches():
+                db._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+                lexical.add(ids, texts)
+                if on_progress is not None:
+                    on_progress(len(ids))
+            lexical.save()
+        with self._lock:
+            self._snapshots.pop(name, None)
+            shutil.rmtree(os.path.join(self.path(name), SNAPSHOT_DIRECTORY), ignore_errors=True)
+        return len(store)
+
+    def refresh_size(self, name: str):
+        """Re-estimates the footprint of a resident collection after writes."""
+        with self._lock:
+            if name in self._handles:
+                self._sizes[name] = directory_size(self.path(name))
+                self._evict(keep=name)
+
+    def reset(self, name: str):
+        """
+        Drops every record of a collection, in both vector stores, and
+        returns a fresh, empty handle.
+        """
+        with self._lock:
+            self.get(name).delete_collection()
+            self.release(name)
+            self._drop_inactive_store(self.path(name))
+            shutil.rmtree(os.path.join(self.path(name), LEXICAL_INDEX_DIRECTORY), ignore_errors=True)
+            # A stale quantized index would serve ids that no longer exist until the next rebuild
+            shutil.rmtree(os.path.join(self.path(name), INDEX_DIRECTORY), ignore_errors=True)
+            db = self.get(name)
+        self.bump_version(name)
+        return db
+
+    def delete(self, name: str):
+        with self._lock:
+            self.release(name)
+            self._parity.pop(name, None)
+            shutil.rmtree(self.path(name), ignore_errors=True)
+        self.bump_version(name)
+
+    def release(self, name: str):
+        with self._lock:
+            db = self._handles.pop(name, None)
+            self._sizes.pop(name, None)
+            self._quantized.pop(name, None)
+            self._snapshots.pop(name, None)
+            lexical = self._lexical.pop(name, None)
+        if lexical is not None and lexical.dirty:
+            lexical.save()
+        if db is not None:
+            release_store(db)
+            print(f"Released collection {name}.")
+
+    def _evict(self, keep: str):
+        while len(self._handles) > 1:
+            over_count = len(self._handles) > self.max_resident
+            over_budget = (
+                self.memory_budget_bytes is not None and sum(self._sizes.values()) > self.memory_budget_bytes
+            )
+            if not (over_count or over_budget):
+                return
+            # Least recently used first; pinned collections stay even if that exceeds the limits
+            oldest = next((name for name in self._handles if name != keep and not self._pins.get(name)), None)
+            if oldest is None:
+                return
+            self.release(oldest)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "resident": list(self._handles),
+                "resident_bytes": sum(self._sizes.values()),
+                "pinned": sorted(self._pins),
+                "max_resident": self.max_resident,
+                "memory_budget_bytes": self.memory_budget_bytes,
+            }
+
+
+# Shared collection handles for this process
+collections = CollectionManager(
+    settings.CHROMA_ROOT_DIRECTORY,
+    registry.embedding,
+    signature_factory=registry.embedding_signature,
+    max_resident=settings.COLLECTION_MAX_RESIDENT,
+    memory_budget_bytes=settings.COLLECTION_MEMORY_BUDGET_MB * 1024 * 1024,
+    parity_min_cosine=settings.EMBEDDING_PARITY_MIN_COSINE,
+    vector_store=settings.VECTOR_STORE,
+    exact_dtype=settings.EXACT_STORE_DTYPE,
+)
+
+
+def queue_snapshot_hydration(name: str, session_id: str = None):
+    """
+    Loads the imported snapshot of `name` into Chroma on an ingestion
+    worker. Progress is reported like an ingestion: `chunks_total` records
+    to write and `chunks_embedded` records written so far.
+    """
+
+    def hydrate(job):
+        job.set_stage(ingest_jobs.STREAMING)
+        store = collections.snapshot_store(name)
+        job.chunks_total = len(store) if store is not None else 0
+
+        def on_progress(count):
+            job.chunks_embedded += count
+            job.check_cancelled()
+
+        written = collections.hydrate(name, on_progress=on_progress)
+        job.set_stage(ingest_jobs.FINALIZING)
+        if written and settings.VECTOR_INDEX_MODE in QUANTIZED_MODES:
+            collections.build_quantized_index(name, settings.VECTOR_INDEX_MODE)
+        collections.refresh_size(name)
+        return {"collection": name, "message": "Snapshot loaded into the collection.", "records": written}
+
+    return ingest_queue.submit(session_id or name, None, hydrate)
+
+
+def bootstrap_snapshots(directory: str = None, import_missing: bool = True):
+    """
+    Runs at startup: resumes loading snapshots whose hydration was
+    interrupted and, with `import_missing`, first imports the snapshot of
+    every collection that has one in `directory` but does not exist locally
+    (a fresh replica). Returns the imported names.
+    """
+    directory = directory or settings.SNAPSHOT_DIRECTORY
+    imported = []
+    if import_missing and os.path.isdir(directory):
+        for filename in sorted(os.listdir(directory)):
+            name = filename[: -len(ARCHIVE_SUFFIX)]
+            if not filename.endswith(ARCHIVE_SUFFIX) or not COLLECTION_NAME_PATTERN.match(name) or collections.exists(name):
+                continue
+            try:
+                collections.import_snapshot(name, os.path.join(directory, filename))
+                imported.append(name)
+            except SnapshotError as e:
+                print(f"Skipping snapshot {filename}: {str(e)}")
+    for name in collections.names():
+        if collections.snapshot_store(name) is not None:
+            queue_snapshot_hydration(name)
+    return imported
@@ -0,0 +1,273 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from services.incremental import content_hash, normalize_text
+
+# SQLite limits the number of bound parameters per statement
+LOOKUP_BATCH = 500
+
+
+class EmbeddingCache:
+    """
+    Persistent text -> vector cache stored in the `embeddings` table of
+    embeddings.db.
+
+    Keys combine the model name, the storage dtype and the hash of the
+    normalised text, so switching models or precision never returns a stale
+    vector. Vectors are stored as raw float32/float16 bytes. When the table
+    grows past `max_bytes`, the least recently used rows are evicted.
+    """
+
+    def __init__(self, path: str, model_name: str, dtype: str = "float16", max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._migrate()
+
+    def _migrate(self):
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (id VARCHAR NOT NULL, embedding BLOB, PRIMARY KEY (id))"
+            )
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(embeddings)")}
+            if "last_used_at" not in columns:
+                self._connection.execute("ALTER TABLE embeddings ADD COLUMN last_used_at REAL")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used_at ON embeddings (last_used_at)"
+            )
+
+    def key(self, text: str):
+        return f"{self.model_name}:{self.dtype.name}:{content_hash(text)}"
+
+    def get_many(self, texts):
+        """
+        Looks up `texts` in batches.
+
+        Returns:
+            list: One vector (list of floats) or None per text, in input order.
+        """
+        keys = [self.key(text) for text in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT id, embedding FROM embeddings WHERE id IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                with self._connection:
+                    self._connection.executemany(
+                        "UPDATE embeddings SET last_used_at = ? WHERE id = ?", [(now, key) for key in found]
+                    )
+
+            vectors = [
+                np.frombuffer(found[key], dtype=self.dtype).astype(np.float32).tolist() if key in found else None
+                for key in keys
+            ]
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return vectors
+
+    def put_many(self, texts, vectors):
+        now = time.time()
+        rows = [
+            (self.key(text), np.asarray(vector, dtype=self.dtype).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (id, embedding, last_used_at) VALUES (?, ?, ?)", rows
+                )
+            self._evict()
+
+    def _evict(self):
+        total_bytes, count = self._connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(embedding)), 0), COUNT(*) FROM embeddings"
+        ).fetchone()
+        if total_bytes <= self.max_bytes or not count:
+            return
+
+        excess_rows = -(-(total_bytes - self.max_bytes) * count // total_bytes)
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM embeddings WHERE id IN "
+                "(SELECT id FROM embeddings ORDER BY last_used_at IS NOT NULL, last_used_at LIMIT ?)",
+                (excess_rows,),
+            )
+        self.evictions += excess_rows
+        print(f"Embedding cache evicted {excess_rows} entries.")
+
+    def stats(self):
+        with self._lock:
+            total_bytes, count = self._connection.execute(
+                "SELECT COALESCE(SUM(LENGTH(embedding)), 0), COUNT(*) FROM embeddings"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": count,
+                "bytes": total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+            }
+
+
+class _PendingQuery:
+    def __init__(self, key: str, text: str):
+        self.key = key
+        self.text = text
+        self.vector = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded in-memory LRU of normalised query text -> vector. Normalisation
+    only folds whitespace for the key; the model is given the query as asked.
+
+    The questionnaire flow sends the same fixed questions over and over, so
+    most queries are repeats. Misses are coalesced: the first thread to miss
+    encodes every query pending at that moment in one `encode_many` call,
+    queries that miss while it runs are picked up by its next call, and
+    threads asking for a query that is already pending wait for it instead
+    of encoding it again.
+    """
+
+    def __init__(self, encode_many, max_entries: int = 1024):
+        self.encode_many = encode_many
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.batches = 0
+        self._entries = OrderedDict()
+        self._pending = OrderedDict()
+        self._queue = []
+        self._encoding = False
+        self._lock = threading.Lock()
+
+    def embed_query(self, text: str):
+        key = normalize_text(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(vector)
+            self.misses += 1
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _PendingQuery(key, text)
+                self._queue.append(pending)
+            lead = not self._encoding
+            if lead:
+                self._encoding = True
+
+        if lead:
+            self._encode_pending()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return list(pending.vector)
+
+    def _encode_pending(self):
+        while True:
+            with self._lock:
+                batch, self._queue = self._queue, []
+                if not batch:
+                    self._encoding = False
+                    return
+            try:
+                vectors = self.encode_many([pending.text for pending in batch])
+                error = None
+                if len(vectors) != len(batch):
+                    # Waiters left without a vector would block forever
+                    raise ValueError(f"Query encoder returned {len(vectors)} vectors for {len(batch)} queries.")
+            except Exception as e:
+                vectors, error = [None] * len(batch), e
+            with self._lock:
+                self.batches += 1
+                for pending, vector in zip(batch, vectors):
+                    del self._pending[pending.key]
+                    pending.vector, pending.error = vector, error
+                    if error is None:
+                        self._entries[pending.key] = np.asarray(vector, dtype=np.float32)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            for pending in batch:
+                pending.done.set()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "encoder_batches": self.batches,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding function so document embeddings are served from the
+    persistent cache when possible. Only missing texts reach `inner`, in one
+    batch. Query embeddings bypass the persistent cache because arbitrary
+    user questions would only fill it with one-off entries; they go through
+    the in-memory `query_cache` instead. Either cache may be None.
+    """
+
+    def __init__(self, inner: Embeddings, cache: EmbeddingCache = None, query_cache: QueryEmbeddingCache = None):
+        self.inner = inner
+        self.cache = cache
+        self.query_cache = query_cache
+
+    def embed_documents(self, texts):
+        if self.cache is None:
+            return self.inner.embed_documents(texts)
+        return embed_with_cache(self.cache, self.inner.embed_documents, texts)
+
+    def embed_query(self, text):
+        if self.query_cache is None:
+            return self.inner.embed_query(text)
+        return self.query_cache.embed_query(text)
+
+
+def embed_with_cache(cache: EmbeddingCache, encode, texts):
+    """
+    Returns vectors for `texts`, calling `encode` only on the cache misses and
+    storing its results.
+    """
+    vectors = cache.get_many(texts)
+    missing = [index for index, vector in enumerate(vectors) if vector is None]
+    if missing:
+        computed = encode([texts[index] for index in missing])
+        cache.put_many([texts[index] for index in missing], computed)
+        for index, vector in zip(missing, computed):
+            vectors[index] = list(vector)
+    return vectors
@@ -0,0 +1,105 @@
+import threading
+import time
+
+
+class EmbeddingEngine:
+    """
+    Ingestion-side embedding stage with explicit control over batching.
+
+    Texts are sorted by length before being cut into batches so each batch
+    pads to a similar sequence length, then the vectors are returned in the
+    caller's order. When `processes` > 1 and the wrapped embedding exposes a
+    SentenceTransformer client, batches are encoded by a multi-process pool
+    started on first use; otherwise `embed_documents` runs in-process.
+
+    If `embedding` is a CachedEmbeddings wrapper, texts found in its
+    persistent cache are not encoded again and new vectors are written back.
+    """
+
+    def __init__(self, embedding, batch_size: int = 64, processes: int = 0):
+        self.cache = getattr(embedding, "cache", None)
+        self.embedding = getattr(embedding, "inner", embedding)
+        self.batch_size = batch_size
+        self.processes = processes
+        self._pool = None
+        self._lock = threading.Lock()
+        self._stats = {"texts": 0, "encoded": 0, "seconds": 0.0, "last_chunks_per_sec": None}
+
+    @property
+    def _sentence_transformer(self):
+        return getattr(self.embedding, "client", None)
+
+    def _multi_process_pool(self):
+        with self._lock:
+            if self._pool is None:
+                devices = ["cpu"] * self.processes
+                self._pool = self._sentence_transformer.start_multi_process_pool(target_devices=devices)
+                print(f"Started embedding pool with {self.processes} processes.")
+            return self._pool
+
+    def _encode(self, texts):
+        client = self._sentence_transformer
+        if self.processes > 1 and client is not None and hasattr(client, "encode_multi_process"):
+            encode_kwargs = getattr(self.embedding, "encode_kwargs", {}) or {}
+            vectors = client.encode_multi_process(
+                texts,
+                self._multi_process_pool(),
+                batch_size=self.batch_size,
+                normalize_embeddings=encode_kwargs.get("normalize_embeddings", False),
+            )
+            return vectors.tolist()
+        return self.embedding.embed_documents(texts)
+
+    def embed(self, texts, on_progress=None):
+        """
+        Embeds `texts` and returns one vector per text, in input order.
+
+        Args:
+            texts (list): Strings to embed.
+            on_progress (callable, optional): Called with the number of texts
+                embedded after each window. May raise to abort the run.
+        """
+        started = time.perf_counter()
+        vectors = self.cache.get_many(texts) if self.cache else [None] * len(texts)
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if on_progress and len(missing) < len(texts):
+            on_progress(len(texts) - len(missing))
+
+        order = sorted(missing, key=lambda index: len(texts[index]))
+        # Multi-process runs hand each pool call enough work for every process
+        window = self.batch_size * max(self.processes, 1)
+        for start in range(0, len(order), window):
+            indices = order[start:start + window]
+            batch_vectors = self._encode([texts[index] for index in indices])
+            if self.cache:
+                self.cache.put_many([texts[index] for index in indices], batch_vectors)
+            for index, vector in zip(indices, batch_vectors):
+                vectors[index] = list(vector)
+            if on_progress:
+                on_progress(len(indices))
+        seconds = time.perf_counter() - started
+
+        with self._lock:
+            self._stats["texts"] += len(texts)
+            self._stats["encoded"] += len(missing)
+            self._stats["seconds"] += seconds
+            if texts and seconds > 0:
+                self._stats["last_chunks_per_sec"] = round(len(texts) / seconds, 2)
+        return vectors
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["seconds"] = round(stats["seconds"], 3)
+        stats["chunks_per_sec"] = round(stats["texts"] / stats["seconds"], 2) if stats["seconds"] else None
+        stats["batch_size"] = self.batch_size
+        stats["processes"] = self.processes
+        if self.cache:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._sentence_transformer.stop_multi_process_pool(self._pool)
+                self._pool = None
@@ -0,0 +1,124 @@
+import json
+import os
+
+import numpy as np
+
+SENTENCE_TRANSFORMERS = "sentence_transformers"
+FASTEMBED = "fastembed"
+
+# Fixed texts embedded by every backend so vector spaces can be compared
+PARITY_PROBES = [
+    "How do I create a new page in the LCNC platform?",
+    "Online food delivery connecting restaurants with customers.",
+    "B2B2C",
+    "Template A includes onboarding, sign in and order tracking screens.",
+]
+
+SIGNATURE_FILENAME = "embedding_signature.json"
+
+
+def create_embedding(backend: str, model_name: str, threads: int = None, cache_dir: str = None):
+    """
+    Builds the LangChain embedding function for the configured backend.
+
+    Args:
+        backend (str): "sentence_transformers" (torch) or "fastembed" (ONNX
+            Runtime, no torch import at all).
+        model_name (str): Model identifier understood by the backend.
+        threads (int, optional): ONNX Runtime threads for fastembed.
+        cache_dir (str, optional): Where fastembed keeps downloaded models.
+    """
+    if backend == FASTEMBED:
+        from langchain_community.embeddings import FastEmbedEmbeddings
+
+        return FastEmbedEmbeddings(model_name=model_name, threads=threads, cache_dir=cache_dir)
+    if backend == SENTENCE_TRANSFORMERS:
+        from langchain_community.embeddings import SentenceTransformerEmbeddings
+
+        return SentenceTransformerEmbeddings(model_name=model_name)
+    raise ValueError(f"Unknown embedding backend '{backend}'. Use '{SENTENCE_TRANSFORMERS}' or '{FASTEMBED}'.")
+
+
+def query_encoder(embedding):
+    """
+    Returns a function that embeds a list of queries in one model call and
+    gives the same vectors as calling `embedding.embed_query` on each.
+    Embeddings without a known batched query path are called one by one.
+    """
+    from langchain_community.embeddings import FastEmbedEmbeddings, HuggingFaceEmbeddings
+
+    if isinstance(embedding, FastEmbedEmbeddings):
+        # fastembed may prefix queries differently from passages, so use its query path
+        return lambda texts: [
+            vector.tolist()
+            for vector in embedding._model.query_embed(texts, batch_size=embedding.batch_size, parallel=embedding.parallel)
+        ]
+    if isinstance(embedding, HuggingFaceEmbeddings):
+        # embed_query is embed_documents on a single text
+        return embedding.embed_documents
+    return lambda texts: [embedding.embed_query(text) for text in texts]
+
+
+def embedding_signature(embedding, backend: str, model_name: str):
+    """
+    Describes the vector space produced by `embedding`: backend, model,
+    dimension and the vectors of the parity probes.
+    """
+    probes = embedding.embed_documents(PARITY_PROBES)
+    return {
+        "backend": backend,
+        "model_name": model_name,
+        "dimension": len(probes[0]),
+        "probes": [list(map(float, vector)) for vector in probes],
+    }
+
+
+def check_parity(stored: dict, current: dict, min_cosine: float = 0.99):
+    """
+    Compares the signature an index was built with against the active one.
+
+    Two backends are interchangeable when they produce the same dimension and
+    every probe vector points the same way (e.g. the ONNX export of a model
+    and its torch original). Otherwise the collection has to be re-indexed.
+
+    Returns:
+        dict: {"compatible": bool, "min_cosine": float or None, "reason": str or None}
+    """
+    if stored is None:
+        return {"compatible": True, "min_cosine": None, "reason": None}
+    if stored["dimension"] != current["dimension"]:
+        return {
+            "compatible": False,
+            "min_cosine": None,
+            "reason": f"dimension changed from {stored['dimension']} to {current['dimension']}",
+        }
+
+    stored_probes = np.asarray(stored["probes"], dtype=np.float32)
+    current_probes = np.asarray(current["probes"], dtype=np.float32)
+    cosines = np.sum(stored_probes * current_probes, axis=1) / (
+        np.linalg.norm(stored_probes, axis=1) * np.linalg.norm(current_probes, axis=1)
+    )
+    worst = float(cosines.min())
+    if worst < min_cosine:
+        return {
+            "compatible": False,
+            "min_cosine": round(worst, 4),
+            "reason": (
+                f"{current['backend']}:{current['model_name']} vectors diverge from "
+                f"{stored['backend']}:{stored['model_name']} (cosine {worst:.4f})"
+            ),
+        }
+    return {"compatible": True, "min_cosine": round(worst, 4), "reason": None}
+
+
+def read_signature(directory: str):
+    path = os.path.join(directory, SIGNATURE_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as signature_file:
+        return json.load(signature_file)
+
+
+def write_signature(directory: str, signature: dict):
+    with open(os.path.join(directory, SIGNATURE_FILENAME), "w") as signature_file:
+        json.dump(signature, signature_file)
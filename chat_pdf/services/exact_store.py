@@ -0,0 +1,428 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+CHROMA = "chroma"
+EXACT = "exact"
+VECTOR_STORES = (CHROMA, EXACT)
+
+INDEX_DIRECTORY = "exact"
+INITIAL_CAPACITY = 1024
+# Rows scored per matrix product, so float16 blocks are upcast a slice at a time
+SCORE_BLOCK_ROWS = 16384
+# SQLite limits the number of bound parameters per statement
+LOOKUP_BATCH = 500
+READ_PAGE_SIZE = 2048
+
+_INCLUDE_ALL = ("documents", "metadatas")
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def matches(metadata: dict, where: dict):
+    """
+    Evaluates a Chroma-style metadata filter: {"field": value},
+    {"field": {"$eq" | "$ne" | "$gt" | "$gte" | "$lt" | "$lte" | "$in" | "$nin": value}},
+    and "$and" / "$or" lists of filters.
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, expected in condition.items():
+            if operator == "$eq":
+                ok = value == expected
+            elif operator == "$ne":
+                ok = value != expected
+            elif operator == "$in":
+                ok = value in expected
+            elif operator == "$nin":
+                ok = value not in expected
+            elif operator in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                ok = {
+                    "$gt": value > expected,
+                    "$gte": value >= expected,
+                    "$lt": value < expected,
+                    "$lte": value <= expected,
+                }[operator]
+            else:
+                raise ValueError(f"Unsupported filter operator '{operator}'.")
+            if not ok:
+                return False
+    return True
+
+
+class ExactCollection:
+    """
+    Vector collection answering top-k by an exact, vectorised dot product.
+
+    Vectors are normalised on write and kept in a memory-mapped float32 or
+    float16 matrix (`vectors.bin`), so a query is one matrix product over
+    the live rows plus `argpartition`. Ids, texts and metadata live in a
+    SQLite table keyed by matrix row; ids and metadata are also held in
+    memory for filtering. Deleted rows are zeroed and reused by later
+    writes, so the matrix never needs compacting.
+
+    Implements the subset of Chroma's collection API this service calls
+    (`upsert`, `get`, `query`, `update`, `delete`, `count`) with the same
+    arguments and result layout. Query distances are squared L2 between
+    unit vectors (2 - 2 * cosine), matching Chroma's default space.
+    """
+
+    def __init__(self, directory: str, dtype: str = "float32"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(os.path.join(directory, "records.db"), check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS records "
+                "(row INTEGER PRIMARY KEY, id VARCHAR NOT NULL UNIQUE, document TEXT, metadata TEXT)"
+            )
+            self._connection.execute("CREATE TABLE IF NOT EXISTS settings (key VARCHAR PRIMARY KEY, value TEXT)")
+        stored = dict(self._connection.execute("SELECT key, value FROM settings"))
+        # The dtype a collection was created with wins over the configured one
+        self.dtype = np.dtype(stored.get("dtype", dtype))
+        self.dimension = int(stored["dimension"]) if "dimension" in stored else None
+
+        self._ids = []
+        self._metadatas = []
+        self._rows = {}
+        self._free = []
+        self._vectors = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._load()
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.directory, "vectors.bin")
+
+    def _load(self):
+        if self.dimension is None:
+            return
+        row_count = self._connection.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM records").fetchone()[0]
+        self._open_vectors(max(row_count, INITIAL_CAPACITY))
+        self._ids = [None] * row_count
+        self._metadatas = [None] * row_count
+        self._alive = np.zeros(row_count, dtype=bool)
+        for row, record_id, metadata in self._connection.execute("SELECT row, id, metadata FROM records"):
+            self._ids[row] = record_id
+            self._metadatas[row] = json.loads(metadata) if metadata else {}
+            self._alive[row] = True
+            self._rows[record_id] = row
+        self._free = [row for row in range(row_count) if not self._alive[row]]
+
+    def _open_vectors(self, capacity: int):
+        size = capacity * self.dimension * self.dtype.itemsize
+        with open(self._vectors_path, "ab") as vectors_file:
+            if vectors_file.tell() < size:
+                vectors_file.truncate(size)
+        capacity = os.path.getsize(self._vectors_path) // (self.dimension * self.dtype.itemsize)
+        self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dimension))
+
+    def _ensure_dimension(self, dimension: int):
+        if self.dimension is None:
+            self.dimension = dimension
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                    [("dimension", str(dimension)), ("dtype", self.dtype.name)],
+                )
+            self._open_vectors(INITIAL_CAPACITY)
+        elif dimension != self.dimension:
+            raise ValueError(f"Embedding dimension {dimension} does not match collection dimension {self.dimension}.")
+
+    def _allocate(self, count: int):
+        rows = [self._free.pop() for _ in range(min(count, len(self._free)))]
+        start = len(self._ids)
+        rows.extend(range(start, start + count - len(rows)))
+        if len(self._ids) < (max(rows) + 1 if rows else 0):
+            grown = max(rows) + 1
+            self._ids.extend([None] * (grown - len(self._ids)))
+            self._metadatas.extend([None] * (grown - len(self._metadatas)))
+            self._alive = np.concatenate([self._alive, np.zeros(grown - len(self._alive), dtype=bool)])
+            if grown > len(self._vectors):
+                self._vectors.flush()
+                self._open_vectors(max(grown, 2 * len(self._vectors)))
+        return rows
+
+    def count(self):
+        return len(self._rows)
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None):
+        if embeddings is None:
+            raise ValueError("ExactCollection stores precomputed embeddings only.")
+        vectors = _normalize(embeddings)
+        documents = documents if documents is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [None] * len(ids)
+        with self._lock:
+            self._ensure_dimension(vectors.shape[1])
+            existing = [self._rows.get(record_id) for record_id in ids]
+            new_rows = iter(self._allocate(sum(row is None for row in existing)))
+            rows = [row if row is not None else next(new_rows) for row in existing]
+
+            self._vectors[rows] = vectors.astype(self.dtype)
+            self._vectors.flush()
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO records (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (row, record_id, document, json.dumps(metadata or {}))
+                        for row, record_id, document, metadata in zip(rows, ids, documents, metadatas)
+                    ],
+                )
+            for row, record_id, metadata in zip(rows, ids, metadatas):
+                self._ids[row] = record_id
+                self._metadatas[row] = metadata or {}
+                self._alive[row] = True
+                self._rows[record_id] = row
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        with self._lock:
+            rows = [self._rows[record_id] for record_id in ids if record_id in self._rows]
+            positions = [position for position, record_id in enumerate(ids) if record_id in self._rows]
+            if embeddings is not None:
+                self._vectors[rows] = _normalize([embeddings[position] for position in positions]).astype(self.dtype)
+                self._vectors.flush()
+            with self._connection:
+                if documents is not None:
+                    self._connection.executemany(
+                        "UPDATE records SET document = ? WHERE row = ?",
+                        [(documents[position], row) for position, row in zip(positions, rows)],
+                    )
+                if metadatas is not None:
+                    self._connection.executemany(
+                        "UPDATE records SET metadata = ? WHERE row = ?",
+                        [(json.dumps(metadatas[position] or {}), row) for position, row in zip(positions, rows)],
+                    )
+            if metadatas is not None:
+                for position, row in zip(positions, rows):
+                    self._metadatas[row] = metadatas[position] or {}
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            rows = self._select(ids, where)
+            if not rows:
+                return
+            self._vectors[rows] = 0
+            self._vectors.flush()
+            with self._connection:
+                for start in range(0, len(rows), LOOKUP_BATCH):
+                    batch = rows[start:start + LOOKUP_BATCH]
+                    self._connection.execute(f"DELETE FROM records WHERE row IN ({','.join('?' * len(batch))})", batch)
+            for row in rows:
+                del self._rows[self._ids[row]]
+                self._ids[row] = None
+                self._metadatas[row] = None
+                self._alive[row] = False
+            self._free.extend(rows)
+
+    def _select(self, ids=None, where=None):
+        """Live rows matching `ids` (in that order) and/or `where`, in row order otherwise."""
+        if ids is not None:
+            rows = [self._rows[record_id] for record_id in ids if record_id in self._rows]
+        else:
+            rows = np.flatnonzero(self._alive).tolist()
+        if where:
+            rows = [row for row in rows if matches(self._metadatas[row], where)]
+        return rows
+
+    def _documents(self, rows):
+        found = {}
+        for start in range(0, len(rows), LOOKUP_BATCH):
+            batch = rows[start:start + LOOKUP_BATCH]
+            found.update(
+                self._connection.execute(
+                    f"SELECT row, document FROM records WHERE row IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+            )
+        return [found.get(row) for row in rows]
+
+    def _result(self, rows, include):
+        return {
+            "ids": [self._ids[row] for row in rows],
+            "embeddings": np.asarray(self._vectors[rows], dtype=np.float32).tolist() if "embeddings" in include else None,
+            "documents": self._documents(rows) if "documents" in include else None,
+            "metadatas": [dict(self._metadatas[row]) for row in rows] if "metadatas" in include else None,
+        }
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=_INCLUDE_ALL):
+        with self._lock:
+            rows = self._select(ids, where)
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+            return self._result(rows, include)
+
+    def search(self, query_embedding, k: int = 4, where=None):
+        """
+        Returns the top-k (row, cosine score) pairs for a query vector.
+        """
+        query = _normalize(query_embedding)[0]
+        with self._lock:
+            if not self._rows:
+                return []
+            row_count = len(self._ids)
+            vectors = self._vectors
+            eligible = self._alive.copy()
+            if where:
+                eligible[:] = False
+                eligible[self._select(where=where)] = True
+        k = min(k, int(eligible.sum()))
+        if k <= 0:
+            return []
+
+        scores = np.empty(row_count, dtype=np.float32)
+        for start in range(0, row_count, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, row_count)
+            scores[start:end] = vectors[start:end].astype(np.float32, copy=False) @ query
+        scores[~eligible] = -np.inf
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+    def query(self, query_embeddings, n_results: int = 10, where=None, include=_INCLUDE_ALL + ("distances",)):
+        result = {"ids": [], "embeddings": None, "documents": None, "metadatas": None, "distances": None}
+        for field in ("embeddings", "documents", "metadatas", "distances"):
+            if field in include:
+                result[field] = []
+        for query_embedding in query_embeddings:
+            hits = self.search(query_embedding, n_results, where)
+            rows = [row for row, _ in hits]
+            with self._lock:
+                # A row deleted between scoring and reading is skipped
+                live = [position for position, row in enumerate(rows) if self._alive[row]]
+                rows = [rows[position] for position in live]
+                found = self._result(rows, include)
+            result["ids"].append(found["ids"])
+            for field in ("embeddings", "documents", "metadatas"):
+                if field in include:
+                    result[field].append(found[field])
+            if "distances" in include:
+                result["distances"].append([2.0 - 2.0 * hits[position][1] for position in live])
+        return result
+
+    def drop(self):
+        """Deletes every record and the files backing the collection."""
+        with self._lock:
+            self.close()
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._vectors = None
+            self._connection.close()
+
+
+class ExactVectorStore(VectorStore):
+    """
+    LangChain vector store over an ExactCollection, a drop-in replacement for
+    the Chroma wrapper: it exposes the collection as `_collection` and
+    supports `as_retriever`, similarity search with metadata filters and
+    `delete_collection`.
+    """
+
+    def __init__(self, persist_directory: str, embedding_function, dtype: str = "float32"):
+        self._embedding_function = embedding_function
+        self._collection = ExactCollection(os.path.join(persist_directory, INDEX_DIRECTORY), dtype=dtype)
+
+    @staticmethod
+    def exists(persist_directory: str):
+        return os.path.exists(os.path.join(persist_directory, INDEX_DIRECTORY, "records.db"))
+
+    @property
+    def embeddings(self):
+        return self._embedding_function
+
+    def __len__(self):
+        return self._collection.count()
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        embeddings = self._embedding_function.embed_documents(texts)
+        self._collection.upsert(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
+        return ids
+
+    def similarity_search_by_vector_with_score(self, embedding, k: int = 4, filter: dict = None):
+        hits = self._collection.search(embedding, k, where=filter)
+        found = self._collection.get(ids=[self._collection._ids[row] for row, _ in hits])
+        documents = {
+            record_id: Document(page_content=text or "", metadata=metadata or {})
+            for record_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        results = []
+        for row, score in hits:
+            record_id = self._collection._ids[row]
+            if record_id in documents:
+                results.append((documents[record_id], 2.0 - 2.0 * score))
+        return results
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter: dict = None, **kwargs):
+        return [document for document, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: dict = None, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding_function.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: dict = None, **kwargs):
+        return [document for document, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    def delete(self, ids=None, **kwargs):
+        self._collection.delete(ids=ids)
+        return True
+
+    def delete_collection(self):
+        self._collection.drop()
+
+    def close(self):
+        self._collection.close()
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, persist_directory: str = None, **kwargs):
+        store = cls(persist_directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+
+def copy_collection(source, target: ExactVectorStore):
+    """
+    Copies every record of a Chroma store, with its stored vectors, into an
+    exact store, page by page. Returns the number of records copied.
+    """
+    copied = 0
+    while True:
+        page = source._collection.get(
+            include=["embeddings", "documents", "metadatas"], limit=READ_PAGE_SIZE, offset=copied
+        )
+        if not page["ids"]:
+            return copied
+        target._collection.upsert(
+            ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"], metadatas=page["metadatas"]
+        )
+        copied += len(page["ids"])
@@ -0,0 +1,64 @@
+from typing import Any, Callable
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from services.lexical_index import LexicalIndex
+from services.vector_store import get_documents
+
+VECTOR = "vector"
+HYBRID = "hybrid"
+RETRIEVAL_MODES = (VECTOR, HYBRID)
+
+
+class InvalidRetrievalMode(ValueError):
+    """Raised for a retrieval mode other than "vector" or "hybrid"."""
+
+
+def reciprocal_rank_fusion(rankings, rrf_k: int = 60):
+    """
+    Fuses several ranked id lists: each id scores sum(1 / (rrf_k + rank)),
+    with ranks starting at 1. Only ranks matter, so BM25 and cosine scores
+    never have to be put on a common scale.
+
+    Returns:
+        list: (id, fused score) pairs, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, record_id in enumerate(ranking, start=1):
+            scores[record_id] = scores.get(record_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves `candidates` chunks by vector similarity and by BM25 over the
+    collection's lexical index, fuses both rankings with reciprocal-rank
+    fusion and returns the best `k`. Exact terms such as "B2B2C" or template
+    names reach the top through the lexical ranking even when the embedding
+    ranks them low, so `k` can stay small.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_search: Callable
+    lexical: LexicalIndex
+    db: Any
+    k: int = 4
+    candidates: int = 20
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun):
+        vector_hits = self.vector_search(query, self.candidates)
+        lexical_hits = self.lexical.search(query, self.candidates)
+        fused = reciprocal_rank_fusion(
+            [[record_id for record_id, _ in vector_hits], [record_id for record_id, _ in lexical_hits]], self.rrf_k
+        )[: self.k]
+
+        documents = dict(vector_hits)
+        missing = [record_id for record_id, _ in fused if record_id not in documents]
+        if missing:
+            documents.update(get_documents(self.db, missing))
+        return [documents[record_id] for record_id, _ in fused if record_id in documents]
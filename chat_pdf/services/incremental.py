@@ -0,0 +1,94 @@
+import hashlib
+
+
+def normalize_text(text: str):
+    # Whitespace-only differences (re-flowed lines, trailing spaces) should not force a re-embed
+    return " ".join(text.split())
+
+
+def content_hash(text: str):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class ChunkIdAssigner:
+    """
+    Gives every chunk a deterministic id derived from its document and its
+    normalised content, and records the hash in the chunk metadata.
+
+    Identical chunks inside one document are told apart by an occurrence
+    counter, so the ids stay stable as long as the text does, regardless of
+    which page the text moved to. Chunks can be fed in successive windows;
+    only the per-hash counters are kept between calls.
+    """
+
+    def __init__(self, document_name: str):
+        self.document_name = document_name
+        self._occurrences = {}
+
+    def assign(self, chunks):
+        """
+        Returns:
+            list: One id per chunk, in chunk order.
+        """
+        ids = []
+        for chunk in chunks:
+            digest = content_hash(chunk.page_content)
+            occurrence = self._occurrences.get(digest, 0)
+            self._occurrences[digest] = occurrence + 1
+
+            chunk.metadata["document"] = self.document_name
+            chunk.metadata["content_hash"] = digest
+            ids.append(
+                hashlib.sha256(f"{self.document_name}\0{digest}\0{occurrence}".encode("utf-8")).hexdigest()
+            )
+        return ids
+
+
+class DocumentSync:
+    """
+    Tracks the difference between the chunks stored for a document and a
+    fresh chunking that arrives window by window.
+
+    `plan()` classifies each window: chunks whose id is not stored must be
+    embedded and written, stored chunks are kept (with a metadata update if,
+    for example, their page number changed). Once every window has been
+    planned, `removed()` lists the stored ids that no longer appear.
+    """
+
+    def __init__(self, existing):
+        self._existing = existing
+        self._seen = set()
+        self.added = 0
+        self.kept = 0
+        self.metadata_updated = 0
+        self.removed_count = 0
+
+    def plan(self, ids, chunks):
+        """
+        Returns:
+            tuple: (add, update) lists of indices into this window.
+        """
+        add, update = [], []
+        for index, chunk_id in enumerate(ids):
+            self._seen.add(chunk_id)
+            if chunk_id not in self._existing:
+                add.append(index)
+            elif self._existing[chunk_id] != chunks[index].metadata:
+                update.append(index)
+        self.added += len(add)
+        self.kept += len(ids) - len(add)
+        self.metadata_updated += len(update)
+        return add, update
+
+    def removed(self):
+        removed = [chunk_id for chunk_id in self._existing if chunk_id not in self._seen]
+        self.removed_count = len(removed)
+        return removed
+
+    def summary(self):
+        return {
+            "added": self.added,
+            "kept": self.kept,
+            "removed": self.removed_count,
+            "metadata_updated": self.metadata_updated,
+        }
@@ -0,0 +1,335 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import settings
+
+QUEUED = "queued"
+# Pages are parsed, split, embedded and written window by window
+STREAMING = "streaming"
+# Chunks that vanished from the document are being deleted
+FINALIZING = "finalizing"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STAGES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a running ingestion when its job has been cancelled."""
+
+
+class QueueFull(Exception):
+    """Raised when too many ingestion jobs are already waiting for a worker."""
+
+
+class IngestJob:
+    """
+    Progress record for one PDF ingestion.
+
+    The ingestion code updates the counters as it goes and calls
+    `check_cancelled()` between units of work so a cancel request takes effect
+    at the next page or embedding batch.
+    """
+
+    def __init__(self, session_id: str, pdf_file_path: str, job_id: str = None, document_name: str = None):
+        self.id = job_id or str(uuid.uuid4())
+        self.session_id = session_id
+        self.pdf_file_path = pdf_file_path
+        self.document_name = document_name
+        self.batch = None
+        self.stage = QUEUED
+        self.pages_parsed = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stage_seconds = {}
+        self._stage_started_at = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def set_stage(self, stage: str):
+        with self._lock:
+            now = time.time()
+            if self._stage_started_at is not None and self.stage not in FINISHED_STAGES:
+                self.stage_seconds[self.stage] = round(now - self._stage_started_at, 3)
+            if self.started_at is None and stage != QUEUED:
+                self.started_at = now
+            if stage in FINISHED_STAGES:
+                self.finished_at = now
+            self.stage = stage
+            self._stage_started_at = now
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Ingestion job {self.id} was cancelled.")
+
+    @property
+    def finished(self):
+        return self.stage in FINISHED_STAGES
+
+    def _throughput(self, count, end):
+        if self.started_at is None or end <= self.started_at:
+            return None
+        return round(count / (end - self.started_at), 2)
+
+    def to_dict(self):
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "job_id": self.id,
+                "session_id": self.session_id,
+                "document": self.document_name,
+                "stage": self.stage,
+                "cancel_requested": self.cancel_requested,
+                "progress": {
+                    "pages_parsed": self.pages_parsed,
+                    "chunks_total": self.chunks_total,
+                    "chunks_embedded": self.chunks_embedded,
+                },
+                "throughput": {
+                    "pages_per_sec": self._throughput(self.pages_parsed, end),
+                    "chunks_per_sec": self._throughput(self.chunks_embedded, end),
+                },
+                "stage_seconds": dict(self.stage_seconds),
+                "elapsed_seconds": round(end - (self.started_at or end), 3),
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+class IngestBatch:
+    """
+    Group of ingestion jobs submitted together, typically several PDFs going
+    into one collection.
+
+    `on_started(batch)` runs once, on the worker thread that starts the first
+    job, before any job of the batch does its work; the other jobs wait for
+    it and fail with its exception if it raises. `on_finished(batch)` runs
+    once, on the worker thread that finishes the last job, so work that only
+    needs doing once per batch (such as rebuilding a collection index) is
+    not repeated for every file.
+    """
+
+    def __init__(self, session_id: str, on_finished=None, on_started=None):
+        self.id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.jobs = []
+        self.created_at = time.time()
+        self.on_started = on_started
+        self.on_finished = on_finished
+        self._remaining = 0
+        self._started = False
+        self._start_error = None
+        self._start_lock = threading.Lock()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def _add(self, job: IngestJob):
+        job.batch = self
+        self.jobs.append(job)
+        self._remaining += 1
+
+    def _start(self):
+        with self._start_lock:
+            if not self._started:
+                self._started = True
+                try:
+                    if self.on_started is not None:
+                        self.on_started(self)
+                except Exception as e:
+                    self._start_error = e
+        if self._start_error is not None:
+            raise self._start_error
+
+    def _job_finished(self):
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if not last:
+            return
+        try:
+            if self.on_finished is not None:
+                self.on_finished(self)
+        except Exception as e:
+            print(f"Error finishing ingestion batch {self.id}: {str(e)}")
+        finally:
+            self._done.set()
+
+    @property
+    def finished(self):
+        """True once every job has finished and `on_finished` has returned."""
+        return self._done.is_set()
+
+    def wait(self, timeout: float = None):
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        stages = [job.stage for job in self.jobs]
+        return {
+            "batch_id": self.id,
+            "session_id": self.session_id,
+            "finished": self.finished,
+            "files": len(self.jobs),
+            "completed": stages.count(COMPLETED),
+            "failed": stages.count(FAILED),
+            "cancelled": stages.count(CANCELLED),
+            "jobs": [job.to_dict() for job in self.jobs],
+        }
+
+
+class IngestJobQueue:
+    """
+    Runs ingestion jobs on a bounded pool of background threads.
+
+    At most `max_workers` jobs run at once and at most `max_pending` jobs may
+    wait for a worker; `submit` raises `QueueFull` beyond that. Finished jobs
+    are kept for status queries until `max_history` newer jobs have finished.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 20, max_history: int = 200):
+        self.max_pending = max_pending
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs = OrderedDict()
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, session_id: str, pdf_file_path: str, target):
+        """
+        Queues `target(job)` for execution and returns the new job.
+
+        Args:
+            session_id (str): Session the ingestion belongs to.
+            pdf_file_path (str): Uploaded file; it is removed once the job
+                finishes. None for jobs that do not consume an upload.
+            target (callable): Performs the ingestion, receives the job for
+                progress reporting and returns the result payload.
+        """
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job.stage == QUEUED)
+            if pending >= self.max_pending:
+                raise QueueFull(f"Too many ingestion jobs queued ({pending}). Please retry later.")
+
+            job = IngestJob(session_id, pdf_file_path)
+            self._jobs[job.id] = job
+            self._futures[job.id] = self._executor.submit(self._run, job, target)
+            self._prune()
+            return job
+
+    def submit_batch(self, session_id: str, files, on_finished=None, on_started=None):
+        """
+        Queues one job per file as a single batch. Either every file is
+        accepted or, when the queue lacks room for all of them, none is and
+        `QueueFull` is raised.
+
+        Args:
+            session_id (str): Session the ingestion belongs to.
+            files (list): (document_name, pdf_file_path, target) tuples, see `submit`.
+            on_finished (callable, optional): Called with the batch once
+                every job in it has finished.
+            on_started (callable, optional): Called with the batch on a
+                worker before the first job runs, so destructive preparation
+                (such as resetting the collection) only happens once the
+                batch has been accepted.
+        """
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job.stage == QUEUED)
+            if pending + len(files) > self.max_pending:
+                raise QueueFull(
+                    f"Too many ingestion jobs queued ({pending}) to accept {len(files)} more. Please retry later."
+                )
+
+            batch = IngestBatch(session_id, on_finished=on_finished, on_started=on_started)
+            jobs = []
+            for document_name, pdf_file_path, target in files:
+                job = IngestJob(session_id, pdf_file_path, document_name=document_name)
+                batch._add(job)
+                self._jobs[job.id] = job
+                jobs.append((job, target))
+            # Submit only once the batch is complete, so an early finisher cannot see it half-built
+            for job, target in jobs:
+                self._futures[job.id] = self._executor.submit(self._run, job, target)
+            self._prune()
+            return batch
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str):
+        """
+        Cancels a queued job immediately or asks a running job to stop at its
+        next checkpoint. Returns the job, or None if it is unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            future = self._futures.get(job_id)
+        if job is None:
+            return None
+
+        job.cancel()
+        if future is not None and future.cancel():
+            # The job never started, so nothing else will clean up after it
+            job.set_stage(CANCELLED)
+            self._remove_file(job.pdf_file_path)
+            if job.batch is not None:
+                job.batch._job_finished()
+        return job
+
+    def _run(self, job: IngestJob, target):
+        try:
+            job.check_cancelled()
+            if job.batch is not None:
+                job.batch._start()
+            job.result = target(job)
+            job.set_stage(COMPLETED)
+        except JobCancelled:
+            print(f"Ingestion job {job.id} cancelled.")
+            job.set_stage(CANCELLED)
+        except Exception as e:
+            print(f"Error processing PDF: {str(e)}")
+            job.error = f"Error processing PDF: {str(e)}"
+            job.set_stage(FAILED)
+        finally:
+            self._remove_file(job.pdf_file_path)
+            with self._lock:
+                self._futures.pop(job.id, None)
+            if job.batch is not None:
+                job.batch._job_finished()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[: max(len(finished) - self.max_history, 0)]:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _remove_file(path: str):
+        if path is None:
+            return
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Background workers that run ingestion (and snapshot hydration) jobs outside the request thread
+ingest_queue = IngestJobQueue(
+    max_workers=settings.INGEST_WORKERS,
+    max_pending=settings.INGEST_MAX_PENDING_JOBS,
+)
@@ -0,0 +1,208 @@
+import json
+import math
+import os
+import re
+import shutil
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+
+INDEX_DIRECTORY = "lexical"
+READ_PAGE_SIZE = 2048
+# Tombstoned rows are dropped when saving once they exceed this share of the index
+COMPACT_DEAD_FRACTION = 0.2
+MAX_TERM_FREQUENCY = 65535
+
+# Alphanumeric runs, so product terms such as "B2B2C" stay single tokens
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str):
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class LexicalIndex:
+    """
+    In-process BM25 inverted index over the chunks of one collection.
+
+    Postings are kept per term as two growable typed arrays (rows as uint32,
+    term frequencies as uint16), so adding chunks is an append and scoring
+    views them as NumPy arrays without copying. Deleting a chunk tombstones
+    its row; dead rows are dropped the next time the index is saved with
+    enough of them. Until then document frequencies still count them,
+    which only nudges IDF slightly.
+
+    On disk the index is a directory holding the vocabulary and chunk ids as
+    JSON and every posting concatenated into flat arrays in one .npz file.
+    """
+
+    def __init__(self, directory: str, k1: float = 1.2, b: float = 0.75):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self._rows = {}
+        self._lengths = array("I")
+        self._alive = bytearray()
+        self._live_count = 0
+        self._live_length = 0
+        self._postings = {}
+        self._lock = threading.RLock()
+        self.dirty = False
+
+    @staticmethod
+    def exists(collection_directory: str):
+        return os.path.exists(os.path.join(collection_directory, INDEX_DIRECTORY, "index.npz"))
+
+    @classmethod
+    def load(cls, collection_directory: str):
+        index = cls(os.path.join(collection_directory, INDEX_DIRECTORY))
+        with open(os.path.join(index.directory, "vocabulary.json")) as vocabulary_file:
+            vocabulary = json.load(vocabulary_file)
+        with open(os.path.join(index.directory, "ids.json")) as ids_file:
+            index.ids = json.load(ids_file)
+        with np.load(os.path.join(index.directory, "index.npz")) as arrays:
+            rows, frequencies, offsets = arrays["rows"], arrays["frequencies"], arrays["offsets"]
+            index._lengths = array("I", arrays["lengths"].tobytes())
+            index._alive = bytearray(arrays["alive"].tobytes())
+        for position, term in enumerate(vocabulary):
+            start, end = int(offsets[position]), int(offsets[position + 1])
+            index._postings[term] = (array("I", rows[start:end].tobytes()), array("H", frequencies[start:end].tobytes()))
+        index._rows = {chunk_id: row for row, chunk_id in enumerate(index.ids) if index._alive[row]}
+        index._live_count = len(index._rows)
+        index._live_length = sum(index._lengths[row] for row in index._rows.values())
+        return index
+
+    @classmethod
+    def build(cls, db, collection_directory: str):
+        """Indexes every chunk already stored in a Chroma collection, page by page."""
+        index = cls(os.path.join(collection_directory, INDEX_DIRECTORY))
+        offset = 0
+        while True:
+            page = db._collection.get(include=["documents"], limit=READ_PAGE_SIZE, offset=offset)
+            if not page["ids"]:
+                break
+            index.add(page["ids"], page["documents"])
+            offset += len(page["ids"])
+        index.save()
+        print(f"Built lexical index with {len(index)} chunks.")
+        return index
+
+    def __len__(self):
+        return self._live_count
+
+    def add(self, ids, texts):
+        """Indexes chunks; a chunk id that is already indexed is replaced."""
+        with self._lock:
+            self.delete([chunk_id for chunk_id in ids if chunk_id in self._rows])
+            for chunk_id, text in zip(ids, texts):
+                row = len(self.ids)
+                terms = Counter(tokenize(text or ""))
+                length = sum(terms.values())
+                self.ids.append(chunk_id)
+                self._rows[chunk_id] = row
+                self._lengths.append(length)
+                self._alive.append(1)
+                self._live_count += 1
+                self._live_length += length
+                for term, frequency in terms.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("I"), array("H"))
+                    postings[0].append(row)
+                    postings[1].append(min(frequency, MAX_TERM_FREQUENCY))
+            self.dirty = True
+
+    def delete(self, ids):
+        with self._lock:
+            for chunk_id in ids:
+                row = self._rows.pop(chunk_id, None)
+                if row is None:
+                    continue
+                self._alive[row] = 0
+                self._live_count -= 1
+                self._live_length -= self._lengths[row]
+                self.dirty = True
+
+    def search(self, query: str, k: int = 20):
+        """
+        Returns the top-k (chunk id, BM25 score) pairs for a query.
+        """
+        with self._lock:
+            if not self._live_count:
+                return []
+            row_count = len(self.ids)
+            average_length = self._live_length / self._live_count
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32)[:row_count].astype(np.float32)
+            alive = np.frombuffer(self._alive, dtype=np.uint8)[:row_count]
+            scores = np.zeros(row_count, dtype=np.float32)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                rows = np.frombuffer(postings[0], dtype=np.uint32)
+                frequencies = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+                document_frequency = len(rows)
+                idf = math.log(1 + (self._live_count - document_frequency + 0.5) / (document_frequency + 0.5))
+                normalizer = self.k1 * (1 - self.b + self.b * lengths[rows] / average_length)
+                scores += np.bincount(
+                    rows, weights=idf * frequencies * (self.k1 + 1) / (frequencies + normalizer), minlength=row_count
+                ).astype(np.float32)
+            scores[alive == 0] = 0
+            matched = np.flatnonzero(scores)
+            if not len(matched):
+                return []
+            top = matched[np.argsort(-scores[matched])[:k]]
+            return [(self.ids[row], float(scores[row])) for row in top]
+
+    def _compact(self):
+        """Drops tombstoned rows and renumbers the remaining ones."""
+        remap = np.full(len(self.ids), -1, dtype=np.int64)
+        live_rows = [row for row in range(len(self.ids)) if self._alive[row]]
+        remap[live_rows] = np.arange(len(live_rows))
+        alive = np.frombuffer(self._alive, dtype=np.uint8)[: len(self.ids)].astype(bool)
+
+        postings = {}
+        for term, (rows, frequencies) in self._postings.items():
+            rows = np.frombuffer(rows, dtype=np.uint32)
+            keep = alive[rows]
+            if keep.any():
+                postings[term] = (
+                    array("I", remap[rows[keep]].astype(np.uint32).tobytes()),
+                    array("H", np.frombuffer(frequencies, dtype=np.uint16)[keep].tobytes()),
+                )
+        self._postings = postings
+        self.ids = [self.ids[row] for row in live_rows]
+        self._lengths = array("I", (self._lengths[row] for row in live_rows))
+        self._alive = bytearray(b"\x01" * len(live_rows))
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+    def save(self):
+        with self._lock:
+            dead = len(self.ids) - self._live_count
+            if dead and dead > COMPACT_DEAD_FRACTION * len(self.ids):
+                self._compact()
+
+            vocabulary = list(self._postings)
+            offsets = np.zeros(len(vocabulary) + 1, dtype=np.uint64)
+            offsets[1:] = np.cumsum([len(self._postings[term][0]) for term in vocabulary])
+            staging = f"{self.directory}.saving"
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            np.savez(
+                os.path.join(staging, "index.npz"),
+                rows=np.frombuffer(b"".join(self._postings[term][0].tobytes() for term in vocabulary), dtype=np.uint32),
+                frequencies=np.frombuffer(b"".join(self._postings[term][1].tobytes() for term in vocabulary), dtype=np.uint16),
+                offsets=offsets,
+                lengths=np.frombuffer(self._lengths, dtype=np.uint32),
+                alive=np.frombuffer(bytes(self._alive), dtype=np.uint8),
+            )
+            with open(os.path.join(staging, "vocabulary.json"), "w") as vocabulary_file:
+                json.dump(vocabulary, vocabulary_file)
+            with open(os.path.join(staging, "ids.json"), "w") as ids_file:
+                json.dump(self.ids, ids_file)
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.replace(staging, self.directory)
+            self.dirty = False
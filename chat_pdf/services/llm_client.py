@@ -0,0 +1,296 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+import openai
+from langchain_openai import ChatOpenAI
+
+OPENAI = "openai"
+OLLAMA = "ollama"
+LLM_BACKENDS = (OPENAI, OLLAMA)
+
+# Worth another attempt: the request may succeed once the server or network recovers
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+KEEPALIVE_EXPIRY_SECONDS = 60
+CONNECT_TIMEOUT_SECONDS = 5.0
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """Raised when an LLM call cannot start or finish within its deadline."""
+
+
+def create_http_client(max_connections: int, timeout_seconds: float):
+    """
+    HTTP client shared by every LLM call of the process, so connections to
+    the API are kept alive and reused instead of opened per request.
+    """
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(timeout_seconds, connect=CONNECT_TIMEOUT_SECONDS),
+    )
+
+
+def create_chat_model(
+    backend: str,
+    model_name: str,
+    base_url: str = None,
+    api_key: str = None,
+    organization: str = None,
+    http_client=None,
+    **kwargs,
+):
+    """
+    Builds the LangChain chat model for the configured backend.
+
+    Args:
+        backend (str): "openai", or "ollama" for a local Ollama server, reached
+            through its OpenAI-compatible API at `base_url` (".../v1").
+        model_name (str): Model identifier understood by the backend ("phi3").
+        base_url (str, optional): Endpoint; unset uses the OpenAI API.
+        http_client (httpx.Client, optional): Shared connection pool.
+        **kwargs: Passed to ChatOpenAI (temperature, max_tokens, ...).
+    """
+    if backend == OLLAMA:
+        if not base_url:
+            raise ValueError("The ollama backend needs the base URL of the Ollama server.")
+        # Ollama ignores the key, but the OpenAI client refuses to start without one
+        api_key, organization = "ollama", None
+    elif backend != OPENAI:
+        raise ValueError(f"Unknown LLM backend '{backend}'. Use '{OPENAI}' or '{OLLAMA}'.")
+    # Retries are handled by PooledLLM under a shared budget, not per client
+    return ChatOpenAI(
+        model=model_name,
+        openai_api_key=api_key,
+        organization=organization,
+        base_url=base_url,
+        max_retries=0,
+        http_client=http_client,
+        **kwargs,
+    )
+
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of recent traffic.
+
+    Every call deposits `ratio` tokens and every retry spends one, with
+    `min_per_second` tokens trickling in so a quiet service can still retry.
+    The balance never exceeds `max_tokens`. When the API is down, calls
+    therefore fail fast after about `ratio` extra requests per call instead
+    of multiplying the load on it by the retry count.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._refilled_at) * self.min_per_second)
+        self._refilled_at = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self):
+        with self._lock:
+            self._refill()
+            return round(self._tokens, 2)
+
+
+class PooledLLM:
+    """
+    Process-wide front for a LangChain chat model.
+
+    At most `max_concurrency` calls run at once; further callers queue for
+    a slot. Each call has a deadline of `deadline_seconds` covering queueing,
+    every attempt and backoff. A call waiting past it raises
+    LLMDeadlineExceeded, and each attempt gets the remaining time as its
+    request timeout. Connection, rate-limit and server errors are retried up
+    to `max_retries` times with full-jitter exponential backoff (honouring
+    Retry-After), as long as the shared RetryBudget allows. A stream is only
+    retried before its first token.
+
+    Exposes `invoke` and `stream` like the wrapped model, so RagPipeline uses
+    it unchanged.
+    """
+
+    def __init__(
+        self,
+        llm,
+        max_concurrency: int = 8,
+        deadline_seconds: float = 30.0,
+        max_retries: int = 2,
+        retry_budget: RetryBudget = None,
+        backoff_base_seconds: float = 0.25,
+        backoff_max_seconds: float = 4.0,
+    ):
+        self.inner = llm
+        self.max_concurrency = max_concurrency
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget or RetryBudget()
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._stats = {
+            "queue_depth": 0,
+            "in_flight": 0,
+            "peak_queue_depth": 0,
+            "peak_in_flight": 0,
+            "calls": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "retries_denied": 0,
+            "deadline_exceeded": 0,
+            "queue_seconds": 0.0,
+            "call_seconds": 0.0,
+        }
+
+    def _count(self, name: str, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    @contextmanager
+    def _slot(self, deadline: float):
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["queue_depth"] += 1
+            self._stats["peak_queue_depth"] = max(self._stats["peak_queue_depth"], self._stats["queue_depth"])
+        queued = time.monotonic()
+        acquired = self._slots.acquire(timeout=max(deadline - queued, 0))
+        with self._lock:
+            self._stats["queue_depth"] -= 1
+            self._stats["queue_seconds"] += time.monotonic() - queued
+            if acquired:
+                self._stats["in_flight"] += 1
+                self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._stats["in_flight"])
+        if not acquired:
+            self._count("deadline_exceeded")
+            raise LLMDeadlineExceeded(
+                f"No LLM slot freed up within {self.deadline_seconds}s ({self.max_concurrency} calls in flight)."
+            )
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._stats["in_flight"] -= 1
+                self._stats["call_seconds"] += time.monotonic() - started
+            self._slots.release()
+
+    def _remaining(self, deadline: float):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._count("deadline_exceeded")
+            raise LLMDeadlineExceeded(f"LLM call exceeded its {self.deadline_seconds}s deadline.")
+        return remaining
+
+    def _backoff(self, error: Exception, attempt: int, deadline: float):
+        """Sleeps before retry number `attempt + 1`, or re-raises `error` when no retry is allowed."""
+        if attempt >= self.max_retries:
+            raise error
+        if not self.retry_budget.withdraw():
+            self._count("retries_denied")
+            raise error
+
+        delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2**attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        if time.monotonic() + delay >= deadline:
+            self._count("deadline_exceeded")
+            raise LLMDeadlineExceeded(f"LLM call exceeded its {self.deadline_seconds}s deadline.") from error
+        print(f"LLM call failed ({type(error).__name__}), retrying in {delay:.2f}s.")
+        self._count("retries")
+        time.sleep(delay)
+
+    def invoke(self, input, **kwargs):
+        deadline = time.monotonic() + self.deadline_seconds
+        self.retry_budget.deposit()
+        with self._slot(deadline):
+            attempt = 0
+            while True:
+                try:
+                    result = self.inner.invoke(input, timeout=self._remaining(deadline), **kwargs)
+                    self._count("succeeded")
+                    return result
+                except RETRYABLE_ERRORS as e:
+                    try:
+                        self._backoff(e, attempt, deadline)
+                    except Exception:
+                        self._count("failed")
+                        raise
+                    attempt += 1
+                except Exception:
+                    self._count("failed")
+                    raise
+
+    def stream(self, input, **kwargs):
+        deadline = time.monotonic() + self.deadline_seconds
+        self.retry_budget.deposit()
+        with self._slot(deadline):
+            attempt = 0
+            while True:
+                streamed = False
+                try:
+                    for chunk in self.inner.stream(input, timeout=self._remaining(deadline), **kwargs):
+                        streamed = True
+                        yield chunk
+                        self._remaining(deadline)
+                    self._count("succeeded")
+                    return
+                except RETRYABLE_ERRORS as e:
+                    if streamed:
+                        self._count("failed")
+                        raise
+                    try:
+                        self._backoff(e, attempt, deadline)
+                    except Exception:
+                        self._count("failed")
+                        raise
+                    attempt += 1
+                except Exception:
+                    self._count("failed")
+                    raise
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        finished = stats["succeeded"] + stats["failed"]
+        stats["queue_seconds"] = round(stats["queue_seconds"], 3)
+        stats["call_seconds"] = round(stats["call_seconds"], 3)
+        stats["avg_queue_ms"] = round(stats["queue_seconds"] * 1000 / stats["calls"], 2) if stats["calls"] else None
+        stats["avg_call_ms"] = round(stats["call_seconds"] * 1000 / finished, 2) if finished else None
+        stats["max_concurrency"] = self.max_concurrency
+        stats["deadline_seconds"] = self.deadline_seconds
+        stats["retry_budget_tokens"] = self.retry_budget.tokens
+        return stats
@@ -0,0 +1,33 @@
+import os
+import resource
+
+
+def current_rss_bytes():
+    """
+    Returns the current resident set size of this process in bytes.
+
+    Reads /proc/self/statm on Linux (the container runtime) and falls back to
+    the peak RSS reported by getrusage elsewhere.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    """
+    Returns the peak resident set size of this process in bytes.
+    """
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def format_bytes(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f}{unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f}TB"
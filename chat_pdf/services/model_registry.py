@@ -0,0 +1,279 @@
+import os
+import threading
+import time
+
+from langchain.prompts import PromptTemplate
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from config import settings
+from services.chunker import RecursiveChunker
+from services.embedding_cache import CachedEmbeddings, EmbeddingCache, QueryEmbeddingCache
+from services.embedding_engine import EmbeddingEngine
+from services.embeddings import FASTEMBED, create_embedding, embedding_signature, query_encoder
+from services.llm_client import OLLAMA, PooledLLM, RetryBudget, create_chat_model, create_http_client
+from services.memory import current_rss_bytes, format_bytes
+from services.prompts import DEFAULT_TEMPLATE_NAME, PROMPT_TEMPLATES
+from services.rag_pipeline import RagPipeline
+
+# Models prompts can be routed to, see `ModelRegistry.llm_route`
+DEFAULT_LLM = "default"
+SMALL_LLM = "small"
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for the heavyweight objects used by ChatPDF.
+
+    Each component (embedding model, LLM clients, text splitter, compiled prompt
+    templates and the RAG pipeline built from each) is built at most once per process, on first use or during
+    `warm_up()`. Construction is serialised by a single lock so concurrent
+    Flask threads never load the same model twice, and so the RSS delta
+    recorded for a component is not polluted by another load running in
+    parallel. The handed-out objects are read-only after construction and are
+    safe to share between request threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._components = {}
+        self._stats = {}
+
+    def _get_or_load(self, name, factory):
+        component = self._components.get(name)
+        if component is not None:
+            return component
+
+        with self._lock:
+            # Another thread may have finished loading while we waited for the lock
+            component = self._components.get(name)
+            if component is not None:
+                return component
+
+            rss_before = current_rss_bytes()
+            started = time.perf_counter()
+            component = factory()
+            self._stats[name] = {
+                "load_seconds": round(time.perf_counter() - started, 3),
+                "rss_delta_bytes": max(current_rss_bytes() - rss_before, 0),
+            }
+            self._components[name] = component
+            print(
+                f"Loaded {name} in {self._stats[name]['load_seconds']}s "
+                f"(+{format_bytes(self._stats[name]['rss_delta_bytes'])} RSS)"
+            )
+            return component
+
+    def embedding(self):
+        return self._get_or_load("embedding", self._load_embedding)
+
+    @property
+    def embedding_model_name(self):
+        if settings.EMBEDDING_BACKEND == FASTEMBED:
+            return settings.FASTEMBED_MODEL_NAME
+        return settings.EMBEDDING_MODEL_NAME
+
+    def _load_embedding(self):
+        embedding = create_embedding(
+            settings.EMBEDDING_BACKEND,
+            self.embedding_model_name,
+            threads=settings.FASTEMBED_THREADS,
+            cache_dir=settings.FASTEMBED_CACHE_DIR,
+        )
+        cache = query_cache = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            cache = EmbeddingCache(
+                settings.EMBEDDING_CACHE_PATH,
+                model_name=f"{settings.EMBEDDING_BACKEND}:{self.embedding_model_name}",
+                dtype=settings.EMBEDDING_CACHE_DTYPE,
+                max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+            )
+        if settings.QUERY_EMBEDDING_CACHE_SIZE > 0:
+            query_cache = QueryEmbeddingCache(query_encoder(embedding), max_entries=settings.QUERY_EMBEDDING_CACHE_SIZE)
+        if cache is None and query_cache is None:
+            return embedding
+        return CachedEmbeddings(embedding, cache, query_cache)
+
+    def embedding_cache_stats(self):
+        """
+        Returns:
+            dict: {"documents": persistent cache stats or None, "queries": query LRU stats or None}
+        """
+        embedding = self.embedding()
+        cache = getattr(embedding, "cache", None)
+        query_cache = getattr(embedding, "query_cache", None)
+        return {
+            "documents": cache.stats() if cache is not None else None,
+            "queries": query_cache.stats() if query_cache is not None else None,
+        }
+
+    def embedding_signature(self):
+        """
+        Signature of the active embedding backend, used to detect collections
+        that were indexed with an incompatible model.
+        """
+        return self._get_or_load(
+            "embedding_signature",
+            lambda: embedding_signature(
+                # Probe the model itself so cached (float16) vectors do not blur the comparison
+                getattr(self.embedding(), "inner", self.embedding()),
+                settings.EMBEDDING_BACKEND,
+                self.embedding_model_name,
+            ),
+        )
+
+    def embedding_engine(self):
+        return self._get_or_load(
+            "embedding_engine",
+            lambda: EmbeddingEngine(
+                self.embedding(),
+                batch_size=settings.INGEST_EMBED_BATCH_SIZE,
+                processes=settings.INGEST_EMBED_PROCESSES,
+            ),
+        )
+
+    def llm(self, name=DEFAULT_LLM):
+        """
+        Returns the pooled chat model registered under `name`: "default"
+        (LLM_MODEL_NAME) or "small" (LLM_SMALL_MODEL_NAME, the default model
+        when no small one is configured).
+        """
+        if name == SMALL_LLM and settings.LLM_SMALL_MODEL_NAME:
+            return self._get_or_load("llm_small", self._load_small_llm)
+        return self._get_or_load("llm", self._load_llm)
+
+    def _load_llm(self):
+        return self._pooled_llm(settings.LLM_BACKEND, settings.LLM_MODEL_NAME, settings.LLM_MAX_CONCURRENCY)
+
+    def _load_small_llm(self):
+        return self._pooled_llm(settings.LLM_SMALL_BACKEND, settings.LLM_SMALL_MODEL_NAME, settings.LLM_SMALL_MAX_CONCURRENCY)
+
+    def _pooled_llm(self, backend, model_name, max_concurrency):
+        llm = create_chat_model(
+            backend,
+            model_name,
+            base_url=settings.OLLAMA_BASE_URL if backend == OLLAMA else settings.LLM_BASE_URL,
+            api_key=os.getenv("OPENAI_API_KEY"),
+            organization=os.getenv("ORGANIZATION_ID"),
+            http_client=create_http_client(max_concurrency, settings.LLM_DEADLINE_SECONDS),
+            temperature=settings.LLM_TEMPERATURE,
+            max_tokens=settings.LLM_MAX_TOKENS,
+        )
+        return PooledLLM(
+            llm,
+            max_concurrency=max_concurrency,
+            deadline_seconds=settings.LLM_DEADLINE_SECONDS,
+            max_retries=settings.LLM_MAX_RETRIES,
+            retry_budget=RetryBudget(ratio=settings.LLM_RETRY_BUDGET_RATIO),
+        )
+
+    def llm_route(self, template_name=DEFAULT_TEMPLATE_NAME):
+        """Name of the model that answers prompts built from `template_name`."""
+        if settings.LLM_SMALL_MODEL_NAME and template_name in settings.LLM_SMALL_TEMPLATES:
+            return SMALL_LLM
+        return DEFAULT_LLM
+
+    def llm_stats(self):
+        """
+        Returns:
+            dict: {"models": {name: {"backend", "model", **PooledLLM stats}},
+                   "routes": {template name: model name}}
+        """
+        models = {
+            DEFAULT_LLM: (settings.LLM_BACKEND, settings.LLM_MODEL_NAME),
+            SMALL_LLM: (settings.LLM_SMALL_BACKEND, settings.LLM_SMALL_MODEL_NAME),
+        }
+        routes = {name: self.llm_route(name) for name in PROMPT_TEMPLATES}
+        stats = {}
+        for name in sorted(set(routes.values())):
+            backend, model_name = models[name]
+            stats[name] = {"backend": backend, "model": model_name, **self.llm(name).stats()}
+        return {"models": stats, "routes": routes}
+
+    def text_splitter(self):
+        return self._get_or_load("text_splitter", self._load_text_splitter)
+
+    def _load_text_splitter(self):
+        if settings.TEXT_SPLITTER == "langchain":
+            return RecursiveCharacterTextSplitter(chunk_size=settings.CHUNK_SIZE, chunk_overlap=settings.CHUNK_OVERLAP)
+        return RecursiveChunker(
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            token_encoding=settings.CHUNK_TOKEN_ENCODING,
+        )
+
+    def prompt_templates(self):
+        return self._get_or_load(
+            "prompt_templates",
+            lambda: {
+                name: PromptTemplate.from_template(template)
+                for name, template in PROMPT_TEMPLATES.items()
+            },
+        )
+
+    def prompt_template(self, name=DEFAULT_TEMPLATE_NAME):
+        """
+        Returns the compiled prompt template registered under `name`, falling
+        back to the default template for unknown names.
+        """
+        templates = self.prompt_templates()
+        return templates.get(name, templates[DEFAULT_TEMPLATE_NAME])
+
+    def rag_pipelines(self):
+        return self._get_or_load(
+            "rag_pipelines",
+            lambda: {
+                name: RagPipeline(self.llm(self.llm_route(name)), template)
+                for name, template in self.prompt_templates().items()
+            },
+        )
+
+    def rag_pipeline(self, name=DEFAULT_TEMPLATE_NAME):
+        """
+        Returns the precompiled RAG pipeline for the prompt template `name`,
+        with the same fallback to the default template as `prompt_template`.
+        """
+        pipelines = self.rag_pipelines()
+        return pipelines.get(name, pipelines[DEFAULT_TEMPLATE_NAME])
+
+    def warm_up(self):
+        """
+        Loads every component and runs one embedding call so the first real
+        request does not pay for lazy initialisation inside the model.
+
+        Returns:
+            dict: The memory report, see `memory_report()`.
+        """
+        embedding = self.embedding()
+        self.llm()
+        self.llm(SMALL_LLM)
+        self.text_splitter()
+        self.prompt_templates()
+        self.rag_pipelines()
+
+        with self._lock:
+            rss_before = current_rss_bytes()
+            started = time.perf_counter()
+            embedding.embed_query("warm up")
+            self._stats["embedding"]["warm_up_seconds"] = round(time.perf_counter() - started, 3)
+            self._stats["embedding"]["rss_delta_bytes"] += max(current_rss_bytes() - rss_before, 0)
+
+        report = self.memory_report()
+        for name, stats in report["components"].items():
+            print(f"Model registry: {name} uses ~{format_bytes(stats['rss_delta_bytes'])}")
+        return report
+
+    def memory_report(self):
+        """
+        Reports the approximate resident memory attributed to each loaded
+        component (measured as the RSS growth while it was being loaded) and
+        the current RSS of the process.
+        """
+        with self._lock:
+            return {
+                "process_rss_bytes": current_rss_bytes(),
+                "components": {name: dict(stats) for name, stats in self._stats.items()},
+            }
+
+
+# Shared registry used by every request handled by this process
+registry = ModelRegistry()
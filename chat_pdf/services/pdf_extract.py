@@ -0,0 +1,132 @@
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from langchain.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+from config import settings
+from services.pdf_worker import extract_range
+
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _create_pool(workers: int, start_method: str):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method))
+
+
+def start_pool(workers: int = None):
+    """
+    Starts the extraction processes by forking the current process, so they
+    start instantly and without re-importing the application.
+
+    Only call this at boot, before any other thread exists or any model is
+    loaded: a child forked from a multi-threaded parent inherits locks held
+    by the other threads and can block on them forever. If other threads are
+    already running, the pool is left to `_get_pool`, which spawns instead.
+    """
+    global _pool, _pool_workers
+    workers = workers or settings.PDF_EXTRACT_WORKERS
+    if workers <= 1:
+        return
+    if threading.active_count() > 1:
+        print("PDF extraction pool not forked: other threads are already running.")
+        return
+    with _pool_lock:
+        if _pool is not None:
+            return
+        _pool = _create_pool(workers, "fork")
+        _pool_workers = workers
+        # A fork-based pool starts all of its processes on the first submit
+        _pool.submit(int).result()
+
+
+def _get_pool(workers: int):
+    """
+    Returns the process pool shared by all extractions: the one forked at
+    boot by `start_pool` when its worker count matches, otherwise a pool of
+    spawned processes, (re)created when the requested worker count changes.
+
+    Spawned workers are fresh interpreters that only need services.pdf_worker
+    (pypdf), but they also re-run the top level of the __main__ module, which
+    makes them slower to start than forked ones.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = _create_pool(workers, "spawn")
+            _pool_workers = workers
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drops a pool whose worker died, so the next extraction starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _page_ranges(page_count: int, workers: int):
+    # Several ranges per worker keep the processes busy when some pages are
+    # much heavier than others, and give the caller regular progress updates.
+    range_size = max(8, -(-page_count // (workers * 4)))
+    return [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+
+
+def iter_pages(pdf_file_path: str, workers: int = None, min_pages: int = None):
+    """
+    Yields one Document per page of a PDF, in page order, splitting the page
+    range across worker processes for large files.
+
+    The Documents carry the same metadata as PyPDFLoader ({"source": path,
+    "page": index}). Files with fewer than `min_pages` pages, or a single
+    worker, use the sequential PyPDFLoader path. In the parallel path at most
+    two ranges per worker are in flight, so memory stays bounded by the range
+    size rather than the document size.
+
+    Args:
+        pdf_file_path (str): Path of the PDF on local disk.
+        workers (int, optional): Worker processes, defaults to PDF_EXTRACT_WORKERS.
+        min_pages (int, optional): Smallest page count worth parallelising,
+            defaults to PDF_PARALLEL_MIN_PAGES.
+    """
+    workers = workers or settings.PDF_EXTRACT_WORKERS
+    min_pages = settings.PDF_PARALLEL_MIN_PAGES if min_pages is None else min_pages
+    page_count = len(PdfReader(pdf_file_path).pages)
+
+    if workers <= 1 or page_count < min_pages:
+        yield from PyPDFLoader(file_path=pdf_file_path).lazy_load()
+        return
+
+    pool = _get_pool(workers)
+    ranges = iter(_page_ranges(page_count, workers))
+    in_flight = deque()
+    try:
+        while True:
+            while len(in_flight) < workers * 2:
+                page_range = next(ranges, None)
+                if page_range is None:
+                    break
+                in_flight.append(pool.submit(extract_range, pdf_file_path, *page_range))
+            if not in_flight:
+                return
+            # Ranges are consumed in submission order, which is page order
+            for page_number, text in in_flight.popleft().result():
+                yield Document(page_content=text, metadata={"source": pdf_file_path, "page": page_number})
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        for future in in_flight:
+            future.cancel()
+
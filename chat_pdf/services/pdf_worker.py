@@ -0,0 +1,14 @@
+# Runs inside the PDF extraction processes. Kept free of langchain/torch
+# imports so spawning a worker only pays for pypdf.
+from pypdf import PdfReader
+
+
+def extract_range(pdf_file_path: str, start: int, end: int):
+    """
+    Extracts the text of pages [start, end) in a worker process.
+
+    Returns:
+        list: (page_number, text) tuples in page order.
+    """
+    reader = PdfReader(pdf_file_path)
+    return [(page_number, reader.pages[page_number].extract_text()) for page_number in range(start, end)]
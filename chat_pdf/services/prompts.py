@@ -0,0 +1,31 @@
+DEFAULT_TEMPLATE_NAME = "default_template"
+
+# Raw prompt strings keyed by the `prompt_template_name` accepted by /ask.
+PROMPT_TEMPLATES = {
+    "primary_field_template": (
+        "Given the user's business description, return only the business category and subcategory. "
+        "Question: {question} Context: {context} Answer:"
+    ),
+    "target_customer_template": (
+        "Given the user's target customers, return only the application flow within two sentences. "
+        "Question: {question} Context: {context} Answer:"
+    ),
+    "app_template_choice": (
+        "Given the selected template, thank the user for choosing it for their business type. "
+        "Question: {question} Context: {context} Answer:"
+    ),
+    DEFAULT_TEMPLATE_NAME: """
+            <s>[INST] You are an expert assistant and agent for a Low-Code/No-Code (LCNC) platform.
+            Use the context provided to guide users in developing applications.
+            Keep your response concise and max two sentences. If the context is insufficient, state that clearly.
+            [/INST] Question: {question} Context: {context} Answer: [/INST]
+            """,
+}
+
+# Asked only when the embedding classifier is unsure; the reply is parsed like the
+# primary_field_template answer ("... Subcategory: <name>")
+CATEGORY_FALLBACK_TEMPLATE = (
+    "Given the user's business description, choose the best fitting entry from the list of business categories. "
+    "Reply only with 'Category: <category> Subcategory: <subcategory>' using names from the list. "
+    "Description: {description} Categories: {categories} Answer:"
+)
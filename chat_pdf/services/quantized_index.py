@@ -0,0 +1,252 @@
+import json
+import os
+import shutil
+import time
+from typing import Any
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from services.vector_store import get_documents
+
+INT8 = "int8"
+BINARY = "binary"
+MODES = (INT8, BINARY)
+
+INDEX_DIRECTORY = "quantized"
+# Rows scored per block, so scoring never materialises a float copy of the whole index
+SCORE_BLOCK_ROWS = 16384
+READ_PAGE_SIZE = 2048
+
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class QuantizedIndex:
+    """
+    Two-stage nearest-neighbour index kept next to a Chroma collection.
+
+    The first pass scans compact codes held in memory: int8 codes with a
+    per-dimension scale (4x smaller than float32) or sign bits compared by
+    Hamming distance (32x smaller). The best `rerank_factor * k` candidates
+    are then re-scored exactly against normalised float32 vectors, which stay
+    in a memory-mapped file on disk and are only paged in for those rows.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as meta_file:
+            self.meta = json.load(meta_file)
+        with open(os.path.join(directory, "ids.json")) as ids_file:
+            self.ids = json.load(ids_file)
+        self.mode = self.meta["mode"]
+        self.dimension = self.meta["dimension"]
+        self.scale = np.asarray(self.meta["scale"], dtype=np.float32) if self.mode == INT8 else None
+        self.codes = np.load(os.path.join(directory, "codes.npy"))
+        self.vectors = np.memmap(
+            os.path.join(directory, "vectors.f32"), dtype=np.float32, mode="r", shape=(len(self.ids), self.dimension)
+        )
+
+    @staticmethod
+    def exists(collection_directory: str):
+        return os.path.exists(os.path.join(collection_directory, INDEX_DIRECTORY, "meta.json"))
+
+    @classmethod
+    def build(cls, db, collection_directory: str, mode: str = INT8):
+        """
+        Builds the index from the vectors stored in a Chroma collection,
+        reading them page by page so memory stays bounded.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}'. Use one of {', '.join(MODES)}.")
+
+        started = time.perf_counter()
+        target = os.path.join(collection_directory, INDEX_DIRECTORY)
+        staging = f"{target}.building"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        # Pass 1: normalised float vectors to disk, and the per-dimension range for int8
+        ids = []
+        max_abs = None
+        with open(os.path.join(staging, "vectors.f32"), "wb") as vectors_file:
+            offset = 0
+            while True:
+                page = db._collection.get(include=["embeddings"], limit=READ_PAGE_SIZE, offset=offset)
+                if not page["ids"]:
+                    break
+                vectors = _normalize(page["embeddings"])
+                vectors_file.write(vectors.tobytes())
+                page_max = np.abs(vectors).max(axis=0)
+                max_abs = page_max if max_abs is None else np.maximum(max_abs, page_max)
+                ids.extend(page["ids"])
+                offset += len(page["ids"])
+
+        if not ids:
+            shutil.rmtree(staging)
+            raise ValueError("Cannot build a quantized index for an empty collection.")
+
+        dimension = len(max_abs)
+        vectors = np.memmap(os.path.join(staging, "vectors.f32"), dtype=np.float32, mode="r", shape=(len(ids), dimension))
+
+        # Pass 2: compact codes
+        scale = np.maximum(max_abs, 1e-12)
+        if mode == INT8:
+            codes = np.empty((len(ids), dimension), dtype=np.int8)
+        else:
+            codes = np.empty((len(ids), (dimension + 7) // 8), dtype=np.uint8)
+        for start in range(0, len(ids), SCORE_BLOCK_ROWS):
+            block = vectors[start:start + SCORE_BLOCK_ROWS]
+            if mode == INT8:
+                codes[start:start + len(block)] = np.clip(np.rint(block / scale * 127), -127, 127)
+            else:
+                codes[start:start + len(block)] = np.packbits(block > 0, axis=1)
+        del vectors
+
+        np.save(os.path.join(staging, "codes.npy"), codes)
+        with open(os.path.join(staging, "ids.json"), "w") as ids_file:
+            json.dump(ids, ids_file)
+        with open(os.path.join(staging, "meta.json"), "w") as meta_file:
+            json.dump(
+                {
+                    "mode": mode,
+                    "dimension": dimension,
+                    "count": len(ids),
+                    "scale": scale.tolist(),
+                    "built_at": time.time(),
+                },
+                meta_file,
+            )
+
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+        print(f"Built {mode} index with {len(ids)} vectors in {time.perf_counter() - started:.2f}s.")
+        return cls(target)
+
+    def _approximate_scores(self, query):
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        if self.mode == INT8:
+            # code * scale / 127 approximates each component, so fold the scale into the query
+            scaled_query = query * self.scale / 127
+            for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+                block = self.codes[start:start + SCORE_BLOCK_ROWS]
+                scores[start:start + len(block)] = block.astype(np.float32) @ scaled_query
+        else:
+            query_bits = np.packbits(query > 0)
+            for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+                block = self.codes[start:start + SCORE_BLOCK_ROWS]
+                hamming = _POPCOUNT[np.bitwise_xor(block, query_bits)].sum(axis=1, dtype=np.int32)
+                scores[start:start + len(block)] = -hamming
+        return scores
+
+    def search(self, query_vector, k: int = 4, rerank_factor: int = 8, exclude: int = None):
+        """
+        Returns the top-k (row, cosine score) pairs for a query vector.
+
+        Args:
+            query_vector: Query embedding (normalised internally).
+            k (int): Number of results.
+            rerank_factor (int): Candidates kept from the first pass, per result.
+            exclude (int, optional): Row to leave out (used by `evaluate`).
+        """
+        query = _normalize(query_vector)
+        scores = self._approximate_scores(query)
+        if exclude is not None:
+            scores[exclude] = -np.inf
+
+        candidate_count = min(len(self.ids), k * rerank_factor)
+        candidates = np.argpartition(-scores, candidate_count - 1)[:candidate_count]
+        if exclude is not None:
+            candidates = candidates[candidates != exclude]
+        candidates.sort()  # Sequential reads from the memory-mapped file
+
+        exact = self.vectors[candidates] @ query
+        order = np.argsort(-exact)[:k]
+        return [(int(candidates[index]), float(exact[index])) for index in order]
+
+    def exact_search(self, query_vector, k: int = 4, exclude: int = None):
+        query = _normalize(query_vector)
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+            block = self.vectors[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block @ query
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        return [int(row) for row in top[np.argsort(-scores[top])]]
+
+    def memory_report(self):
+        float_bytes = len(self.ids) * self.dimension * 4
+        return {
+            "mode": self.mode,
+            "vectors": len(self.ids),
+            "dimension": self.dimension,
+            "float_bytes": float_bytes,
+            "resident_code_bytes": int(self.codes.nbytes),
+            "bytes_saved": float_bytes - int(self.codes.nbytes),
+            "compression_ratio": round(float_bytes / max(self.codes.nbytes, 1), 2),
+        }
+
+    def evaluate(self, k: int = 4, rerank_factor: int = 8, samples: int = 100, seed: int = 0):
+        """
+        Measures recall@k of the two-stage search against exact float search.
+
+        Stored vectors are used as queries (their own row is excluded from
+        both result lists), so no extra text has to be embedded.
+        """
+        rng = np.random.default_rng(seed)
+        rows = rng.choice(len(self.ids), size=min(samples, len(self.ids)), replace=False)
+        hits = 0
+        total = 0
+        search_seconds = 0.0
+        for row in rows:
+            query = np.asarray(self.vectors[row])
+            expected = set(self.exact_search(query, k, exclude=int(row)))
+            started = time.perf_counter()
+            found = {index for index, _ in self.search(query, k, rerank_factor, exclude=int(row))}
+            search_seconds += time.perf_counter() - started
+            hits += len(expected & found)
+            total += len(expected)
+        return {
+            "k": k,
+            "rerank_factor": rerank_factor,
+            "queries": len(rows),
+            "recall_at_k": round(hits / total, 4) if total else None,
+            "avg_query_ms": round(search_seconds * 1000 / max(len(rows), 1), 3),
+            **self.memory_report(),
+        }
+
+
+class QuantizedRetriever(BaseRetriever):
+    """
+    LangChain retriever that searches a QuantizedIndex and loads the matching
+    chunk texts and metadata from the Chroma collection.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: QuantizedIndex
+    db: Any
+    embedding: Any
+    k: int = 4
+    rerank_factor: int = 8
+
+    def search(self, query: str, k: int = None):
+        """
+        Returns:
+            list: (id, Document) pairs, best match first.
+        """
+        results = self.index.search(self.embedding.embed_query(query), k or self.k, self.rerank_factor)
+        ids = [self.index.ids[row] for row, _ in results]
+        by_id = get_documents(self.db, ids)
+        return [(record_id, by_id[record_id]) for record_id in ids if record_id in by_id]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun):
+        return [document for _, document in self.search(query)]
@@ -0,0 +1,108 @@
+import time
+
+from langchain.prompts import PromptTemplate
+
+# Same layout as the "stuff" chain RetrievalQA used: chunk texts separated by a blank line
+DOCUMENT_SEPARATOR = "\n\n"
+
+
+def sources(documents):
+    """
+    Returns:
+        list: {"source", "page"} for each retrieved chunk, in retrieval order.
+    """
+    return [{"source": document.metadata.get("source"), "page": document.metadata.get("page")} for document in documents]
+
+
+class RagPipeline:
+    """
+    Retrieve -> format -> generate for one prompt template, built once per
+    process and shared between requests.
+
+    Replaces a RetrievalQA chain constructed on every /ask: the chunks are
+    retrieved exactly once and formatted straight into the prompt, and the
+    LLM receives the same prompt text the "stuff" chain produced.
+    """
+
+    def __init__(self, llm, prompt: PromptTemplate):
+        self.llm = llm
+        self.prompt = prompt
+
+    def format(self, query: str, documents):
+        context = DOCUMENT_SEPARATOR.join(document.page_content for document in documents)
+        return self.prompt.format(context=context, question=query)
+
+    def run(self, retriever, query: str):
+        """
+        Answers `query` from the chunks returned by `retriever`.
+
+        Returns:
+            dict: {"answer": str or None (no chunks matched), "documents": list,
+                   "timings": {"retrieve_ms", "format_ms", "generate_ms", "total_ms"}}
+        """
+        started = time.perf_counter()
+        documents = retriever.invoke(query)
+        retrieved = time.perf_counter()
+
+        answer = None
+        formatted = generated = retrieved
+        if documents:
+            prompt = self.format(query, documents)
+            formatted = time.perf_counter()
+            answer = self.llm.invoke(prompt).content
+            generated = time.perf_counter()
+
+        return {
+            "answer": answer,
+            "documents": documents,
+            "timings": {
+                "retrieve_ms": round((retrieved - started) * 1000, 2),
+                "format_ms": round((formatted - retrieved) * 1000, 2),
+                "generate_ms": round((generated - formatted) * 1000, 2),
+                "total_ms": round((generated - started) * 1000, 2),
+            },
+        }
+
+    def stream(self, retriever, query: str):
+        """
+        Answers `query` like `run()`, yielding the answer as the LLM produces it.
+
+        Yields:
+            tuple: ("token", str) for each piece of the answer (nothing when no
+                chunks matched), then ("done", {"answer": str or None,
+                "documents": list, "timings": {"retrieve_ms", "format_ms",
+                "ttft_ms", "generate_ms", "total_ms"}}). `ttft_ms` is measured
+                from the start of retrieval to the first token.
+        """
+        started = time.perf_counter()
+        documents = retriever.invoke(query)
+        retrieved = time.perf_counter()
+
+        answer = None
+        formatted = first_token = generated = retrieved
+        if documents:
+            prompt = self.format(query, documents)
+            formatted = time.perf_counter()
+            pieces = []
+            for chunk in self.llm.stream(prompt):
+                if not chunk.content:
+                    continue
+                if not pieces:
+                    first_token = time.perf_counter()
+                pieces.append(chunk.content)
+                yield "token", chunk.content
+            generated = time.perf_counter()
+            first_token = first_token if pieces else generated
+            answer = "".join(pieces)
+
+        yield "done", {
+            "answer": answer,
+            "documents": documents,
+            "timings": {
+                "retrieve_ms": round((retrieved - started) * 1000, 2),
+                "format_ms": round((formatted - retrieved) * 1000, 2),
+                "ttft_ms": round((first_token - started) * 1000, 2),
+                "generate_ms": round((generated - formatted) * 1000, 2),
+                "total_ms": round((generated - started) * 1000, 2),
+            },
+        }
@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+STARTING = "starting"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+class Readiness:
+    """
+    Tracks the boot sequence of the service for /healthz and /readyz.
+
+    The warm-up runs as named steps (`with readiness.step(name): ...`) whose
+    status and duration are reported, so a slow or failing boot can be
+    diagnosed from the readiness endpoint alone.
+    """
+
+    def __init__(self):
+        self.state = STARTING
+        self.error = None
+        self.created_at = time.time()
+        self.ready_at = None
+        self._steps = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name: str):
+        with self._lock:
+            if self.state == STARTING:
+                self.state = WARMING
+            self._steps[name] = {"status": "running", "seconds": None}
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self._finish_step(name, "failed", started, error=str(e))
+            raise
+        self._finish_step(name, "done", started)
+
+    def skip(self, name: str, reason: str):
+        with self._lock:
+            self._steps[name] = {"status": "skipped", "seconds": 0.0, "reason": reason}
+
+    def _finish_step(self, name: str, status: str, started: float, error: str = None):
+        with self._lock:
+            self._steps[name]["status"] = status
+            self._steps[name]["seconds"] = round(time.perf_counter() - started, 3)
+            if error is not None:
+                self._steps[name]["error"] = error
+
+    def mark_ready(self):
+        with self._lock:
+            self.state = READY
+            self.ready_at = time.time()
+        print(f"Service ready after {self.ready_at - self.created_at:.2f}s.")
+
+    def mark_failed(self, error: str):
+        with self._lock:
+            self.state = FAILED
+            self.error = error
+        print(f"Warm start failed: {error}")
+
+    @property
+    def is_ready(self):
+        return self.state == READY
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "ready": self.state == READY,
+                "error": self.error,
+                "boot_seconds": round(self.ready_at - self.created_at, 3) if self.ready_at else None,
+                "steps": {name: dict(step) for name, step in self._steps.items()},
+            }
+
+
+# Boot state of this process
+readiness = Readiness()
@@ -0,0 +1,149 @@
+import threading
+
+
+class _Flight:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.items = []
+        self.finished = False
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent computations.
+
+    The first caller for a key (the leader) runs the computation; callers
+    arriving with the same key while it is in flight (followers) wait for it
+    and get the same result, or the same exception. Once it finishes the key
+    is free again, so later callers compute afresh; reusing finished results
+    is the answer cache's job.
+
+    `do` shares a return value and `stream` shares an iterator: followers
+    replay what the leader has produced so far and then receive each new
+    item as it arrives.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {"calls": 0, "executions": 0, "deduplicated": 0, "failed": 0, "peak_followers": 0}
+
+    def _join(self, key):
+        """Returns (flight, True if the caller leads it)."""
+        with self._lock:
+            self._stats["calls"] += 1
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self._stats["executions"] += 1
+                return flight, True
+            flight.followers += 1
+            self._stats["deduplicated"] += 1
+            self._stats["peak_followers"] = max(self._stats["peak_followers"], flight.followers)
+            return flight, False
+
+    def _finish(self, key, flight, error=None):
+        with self._lock:
+            # Callers arriving from now on start a new flight
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if error is not None:
+                self._stats["failed"] += 1
+        with flight.condition:
+            flight.error = error
+            flight.finished = True
+            flight.condition.notify_all()
+
+    def _publish(self, flight, item):
+        with flight.condition:
+            flight.items.append(item)
+            flight.condition.notify_all()
+
+    def do(self, key, fn):
+        """
+        Returns:
+            tuple: (result of `fn()`, True if it was computed for another caller)
+        """
+        flight, leader = self._join(key)
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self._finish(key, flight, e)
+                raise
+            self._publish(flight, result)
+            self._finish(key, flight)
+            return result, False
+
+        with flight.condition:
+            flight.condition.wait_for(lambda: flight.finished)
+        if flight.error is not None:
+            raise flight.error
+        return flight.items[0], True
+
+    def stream(self, key, factory):
+        """
+        Yields (item, shared) for each item of the iterable returned by
+        `factory()`, which is only called by the leader. If the leader stops
+        iterating early (its client disconnected) while followers are
+        waiting, it drains the rest for them before returning.
+        """
+        flight, leader = self._join(key)
+        if not leader:
+            yield from self._follow(flight)
+            return
+
+        source = iter(factory())
+        try:
+            for item in source:
+                self._publish(flight, item)
+                yield item, False
+        except GeneratorExit:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            if flight.followers:
+                self._drain(key, flight, source)
+            else:
+                # Nobody else is listening: stop the computation as well
+                close = getattr(source, "close", None)
+                if close is not None:
+                    close()
+                self._finish(key, flight)
+            raise
+        except BaseException as e:
+            self._finish(key, flight, e)
+            raise
+        self._finish(key, flight)
+
+    def _drain(self, key, flight, source):
+        try:
+            for item in source:
+                self._publish(flight, item)
+        except Exception as e:
+            self._finish(key, flight, e)
+            return
+        self._finish(key, flight)
+
+    def _follow(self, flight):
+        index = 0
+        while True:
+            with flight.condition:
+                flight.condition.wait_for(lambda: flight.finished or len(flight.items) > index)
+                items = flight.items[index:]
+                finished = flight.finished
+            index += len(items)
+            for item in items:
+                yield item, True
+            if finished:
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, in_flight=len(self._flights))
+        stats["dedup_ratio"] = round(stats["deduplicated"] / stats["calls"], 4) if stats["calls"] else None
+        return stats
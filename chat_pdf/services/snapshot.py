@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import time
+from typing import Any
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from services.embeddings import read_signature
+from services.vector_store import MAX_WRITE_BATCH
+
+FORMAT_VERSION = 1
+SNAPSHOT_DIRECTORY = "snapshot"
+ARCHIVE_SUFFIX = ".snapshot.tar"
+
+READ_PAGE_SIZE = 2048
+SCORE_BLOCK_ROWS = 16384
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+class SnapshotError(ValueError):
+    """Raised for snapshot bundles that are corrupt or in an unsupported format."""
+
+
+def _file_digest(path: str):
+    digest = hashlib.sha256()
+    with open(path, "rb") as snapshot_file:
+        for block in iter(lambda: snapshot_file.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _bundle_checksum(files: dict):
+    lines = "".join(f"{name}:{files[name]['sha256']}\n" for name in sorted(files))
+    return hashlib.sha256(lines.encode("utf-8")).hexdigest()
+
+
+class _RecordWriter:
+    """Appends variable-length byte records to a blob and remembers their offsets."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "wb")
+        self.offsets = [0]
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self):
+        self._file.close()
+
+
+def write_snapshot(db, collection_directory: str, archive_path: str, collection_name: str = None):
+    """
+    Exports a Chroma collection into a portable snapshot archive.
+
+    The archive is an uncompressed tar (the vectors do not compress) holding:
+        manifest.json: Format version, counts, embedding signature and the
+            sha256 of every file plus a checksum over all of them.
+        ids.json: Record ids, in row order.
+        vectors.f32 / norms.f32: Row-major float32 vectors as stored, and
+            their norms, both memory-mappable.
+        texts.bin / text_offsets.npy: Chunk texts as UTF-8, addressed by
+            row through an offsets array.
+        metadata.bin / metadata_offsets.npy: Chunk metadata as JSON, same layout.
+
+    Records are read from Chroma page by page, so memory stays bounded.
+
+    Returns:
+        dict: The manifest.
+    """
+    started = time.perf_counter()
+    staging = f"{archive_path}.building"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    ids = []
+    dimension = None
+    texts = _RecordWriter(os.path.join(staging, "texts.bin"))
+    metadatas = _RecordWriter(os.path.join(staging, "metadata.bin"))
+    try:
+        with open(os.path.join(staging, "vectors.f32"), "wb") as vectors_file, open(
+            os.path.join(staging, "norms.f32"), "wb"
+        ) as norms_file:
+            offset = 0
+            while True:
+                page = db._collection.get(
+                    include=["embeddings", "documents", "metadatas"], limit=READ_PAGE_SIZE, offset=offset
+                )
+                if not page["ids"]:
+                    break
+                vectors = np.asarray(page["embeddings"], dtype=np.float32)
+                dimension = vectors.shape[1]
+                vectors_file.write(vectors.tobytes())
+                norms_file.write(np.linalg.norm(vectors, axis=1).astype(np.float32).tobytes())
+                for text, metadata in zip(page["documents"], page["metadatas"]):
+                    texts.write((text or "").encode("utf-8"))
+                    metadatas.write(json.dumps(metadata or {}).encode("utf-8"))
+                ids.extend(page["ids"])
+                offset += len(page["ids"])
+    finally:
+        texts.close()
+        metadatas.close()
+
+    if not ids:
+        shutil.rmtree(staging)
+        raise SnapshotError("Cannot snapshot an empty collection.")
+
+    np.save(os.path.join(staging, "text_offsets.npy"), np.asarray(texts.offsets, dtype=np.uint64))
+    np.save(os.path.join(staging, "metadata_offsets.npy"), np.asarray(metadatas.offsets, dtype=np.uint64))
+    with open(os.path.join(staging, "ids.json"), "w") as ids_file:
+        json.dump(ids, ids_file)
+
+    files = {
+        name: {"bytes": os.path.getsize(os.path.join(staging, name)), "sha256": _file_digest(os.path.join(staging, name))}
+        for name in sorted(os.listdir(staging))
+    }
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "collection": collection_name or os.path.basename(collection_directory.rstrip(os.sep)),
+        "created_at": time.time(),
+        "count": len(ids),
+        "dimension": dimension,
+        "dtype": "float32",
+        "embedding_signature": read_signature(collection_directory),
+        "files": files,
+        "checksum": _bundle_checksum(files),
+    }
+    with open(os.path.join(staging, "manifest.json"), "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+
+    partial = f"{archive_path}.partial"
+    with tarfile.open(partial, "w") as archive:
+        for name in ["manifest.json", *files]:
+            archive.add(os.path.join(staging, name), arcname=name)
+    os.replace(partial, archive_path)
+    shutil.rmtree(staging)
+    print(f"Exported {len(ids)} records to {archive_path} in {time.perf_counter() - started:.2f}s.")
+    return manifest
+
+
+def unpack_snapshot(archive_path: str, directory: str):
+    """
+    Unpacks a snapshot archive into the new `directory` and checks its
+    format version and every file checksum. On failure the directory is
+    removed again, so nothing half-verified is left behind.
+
+    Returns:
+        dict: The manifest.
+    """
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    try:
+        try:
+            with tarfile.open(archive_path, "r") as archive:
+                archive.extractall(directory, filter="data")
+        except tarfile.TarError as e:
+            raise SnapshotError(f"Snapshot archive is unreadable: {str(e)}")
+        return verify_snapshot(directory)
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+
+def verify_snapshot(directory: str):
+    manifest_path = os.path.join(directory, "manifest.json")
+    if not os.path.exists(manifest_path):
+        raise SnapshotError("Snapshot has no manifest.json.")
+    with open(manifest_path) as manifest_file:
+        manifest = json.load(manifest_file)
+
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise SnapshotError(
+            f"Unsupported snapshot format version {manifest.get('format_version')} (expected {FORMAT_VERSION})."
+        )
+    files = manifest["files"]
+    if _bundle_checksum(files) != manifest["checksum"]:
+        raise SnapshotError("Snapshot manifest checksum mismatch.")
+    for name, expected in files.items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path) or os.path.getsize(path) != expected["bytes"] or _file_digest(path) != expected["sha256"]:
+            raise SnapshotError(f"Snapshot file {name} is missing or corrupt.")
+    return manifest
+
+
+class SnapshotStore:
+    """
+    Read-only, memory-mapped view of an imported snapshot.
+
+    Nothing is parsed up front beyond the manifest and ids: vectors, texts
+    and metadata are mapped from disk and only the pages touched by a query
+    are read, so a node can serve a large collection seconds after import.
+    Search is exact cosine similarity, scored block by block.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json")) as manifest_file:
+            self.manifest = json.load(manifest_file)
+        with open(os.path.join(directory, "ids.json")) as ids_file:
+            self.ids = json.load(ids_file)
+        count, dimension = self.manifest["count"], self.manifest["dimension"]
+        self.vectors = np.memmap(os.path.join(directory, "vectors.f32"), dtype=np.float32, mode="r", shape=(count, dimension))
+        self.norms = np.memmap(os.path.join(directory, "norms.f32"), dtype=np.float32, mode="r", shape=(count,))
+        self._texts = np.memmap(os.path.join(directory, "texts.bin"), dtype=np.uint8, mode="r") if self._size("texts.bin") else None
+        self._text_offsets = np.load(os.path.join(directory, "text_offsets.npy"), mmap_mode="r")
+        self._metadata = np.memmap(os.path.join(directory, "metadata.bin"), dtype=np.uint8, mode="r")
+        self._metadata_offsets = np.load(os.path.join(directory, "metadata_offsets.npy"), mmap_mode="r")
+
+    @staticmethod
+    def exists(collection_directory: str):
+        return os.path.exists(os.path.join(collection_directory, SNAPSHOT_DIRECTORY, "manifest.json"))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _size(self, name: str):
+        return self.manifest["files"][name]["bytes"]
+
+    @staticmethod
+    def _record(blob, offsets, row: int):
+        if blob is None:
+            return b""
+        return blob[int(offsets[row]):int(offsets[row + 1])].tobytes()
+
+    def text(self, row: int):
+        return self._record(self._texts, self._text_offsets, row).decode("utf-8")
+
+    def metadata(self, row: int):
+        return json.loads(self._record(self._metadata, self._metadata_offsets, row))
+
+    def document(self, row: int):
+        return Document(page_content=self.text(row), metadata=self.metadata(row))
+
+    def search(self, query_vector, k: int = 4):
+        """
+        Returns the top-k (row, cosine score) pairs for a query vector.
+        """
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+            block = self.vectors[start:start + SCORE_BLOCK_ROWS]
+            norms = np.maximum(self.norms[start:start + len(block)], 1e-12)
+            scores[start:start + len(block)] = (block @ query) / norms
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+    def iter_batches(self, batch_size: int = MAX_WRITE_BATCH):
+        """
+        Yields (ids, vectors, texts, metadatas) in row order, for loading the
+        snapshot into another store.
+        """
+        for start in range(0, len(self.ids), batch_size):
+            rows = range(start, min(start + batch_size, len(self.ids)))
+            yield (
+                self.ids[start:rows.stop],
+                np.asarray(self.vectors[start:rows.stop]).tolist(),
+                [self.text(row) for row in rows],
+                [self.metadata(row) for row in rows],
+            )
+
+
+class SnapshotRetriever(BaseRetriever):
+    """LangChain retriever that answers from a SnapshotStore."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    store: SnapshotStore
+    embedding: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun):
+        results = self.store.search(self.embedding.embed_query(query), self.k)
+        return [self.store.document(row) for row, _ in results]
@@ -0,0 +1,122 @@
+import uuid
+
+from langchain_core.documents import Document
+
+# Chroma rejects single writes larger than its max batch size (~5k records)
+MAX_WRITE_BATCH = 4096
+
+
+def upsert_embedded_documents(db, documents, embeddings, ids=None):
+    """
+    Writes documents with precomputed embeddings into a Chroma store, so the
+    store does not re-run its embedding function on them.
+
+    Args:
+        db (Chroma): The LangChain Chroma wrapper to write to.
+        documents (list): Documents to store.
+        embeddings (list): One vector per document.
+        ids (list, optional): Record ids; random UUIDs are used when omitted.
+
+    Returns:
+        list: The ids that were written.
+    """
+    ids = ids or [str(uuid.uuid4()) for _ in documents]
+    for start in range(0, len(documents), MAX_WRITE_BATCH):
+        end = start + MAX_WRITE_BATCH
+        db._collection.upsert(
+            ids=ids[start:end],
+            embeddings=embeddings[start:end],
+            documents=[doc.page_content for doc in documents[start:end]],
+            metadatas=[doc.metadata for doc in documents[start:end]],
+        )
+    return ids
+
+
+def get_document_metadatas(db, document_name: str):
+    """
+    Returns {id: metadata} for every record stored for `document_name`.
+    """
+    records = db._collection.get(where={"document": document_name}, include=["metadatas"])
+    return dict(zip(records["ids"], records["metadatas"]))
+
+
+def legacy_source_paths(document_name: str):
+    """
+    Values of the "source" metadata that ingests before chunk ids were
+    introduced stored for `document_name`: the upload was saved to
+    /tmp/<filename> and loaded from there.
+    """
+    return [document_name, f"/tmp/{document_name}"]
+
+
+def get_legacy_metadatas(db, document_name: str):
+    """
+    Returns {id: metadata} for records of `document_name` written without
+    "document" metadata. They carry random ids, so a sync never matches them
+    and deletes them once the document's new chunks are written.
+    """
+    records = db._collection.get(where={"source": {"$in": legacy_source_paths(document_name)}}, include=["metadatas"])
+    return {
+        record_id: metadata
+        for record_id, metadata in zip(records["ids"], records["metadatas"])
+        if "document" not in (metadata or {})
+    }
+
+
+def similarity_search_with_ids(db, query_embedding, k: int = 4):
+    """
+    Vector search that keeps the record ids, which LangChain's Chroma
+    wrapper drops from the Documents it returns.
+
+    Returns:
+        list: (id, Document) pairs, best match first.
+    """
+    results = db._collection.query(query_embeddings=[query_embedding], n_results=k, include=["documents", "metadatas"])
+    return [
+        (record_id, Document(page_content=text, metadata=metadata or {}))
+        for record_id, text, metadata in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])
+    ]
+
+
+def get_documents(db, ids):
+    """
+    Returns {id: Document} for the given record ids.
+    """
+    records = db._collection.get(ids=ids, include=["documents", "metadatas"])
+    return {
+        record_id: Document(page_content=text, metadata=metadata or {})
+        for record_id, text, metadata in zip(records["ids"], records["documents"], records["metadatas"])
+    }
+
+
+def update_metadatas(db, ids, metadatas):
+    for start in range(0, len(ids), MAX_WRITE_BATCH):
+        end = start + MAX_WRITE_BATCH
+        db._collection.update(ids=ids[start:end], metadatas=metadatas[start:end])
+
+
+def delete_ids(db, ids):
+    for start in range(0, len(ids), MAX_WRITE_BATCH):
+        db._collection.delete(ids=ids[start:start + MAX_WRITE_BATCH])
+
+
+def release_store(db):
+    """
+    Drops the process-wide chromadb system cached for a store's directory, so
+    its HNSW index can be garbage collected once in-flight queries finish.
+    Stores with their own `close()` (the exact store) are closed instead.
+    """
+    close = getattr(db, "close", None)
+    if close is not None:
+        close()
+        return
+    client = getattr(db, "_client", None)
+    identifier = getattr(client, "_identifier", None)
+    if identifier is None:
+        return
+    try:
+        from chromadb.api.client import SharedSystemClient
+
+        SharedSystemClient._identifer_to_system.pop(identifier, None)
+    except (ImportError, AttributeError):
+        pass
@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+# Configuration is read at import time, so point every store at a scratch directory first
+_scratch = tempfile.mkdtemp(prefix="chat_pdf_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/test.db")
+os.environ.setdefault("CHROMA_ROOT_DIRECTORY", os.path.join(_scratch, "chroma"))
+os.environ.setdefault("SNAPSHOT_DIRECTORY", os.path.join(_scratch, "snapshots"))
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from benchmarks.common import StubEmbeddings  # noqa: E402
+from services.model_registry import registry  # noqa: E402
+
+
+@pytest.fixture
+def stub_embedding():
+    """Deterministic embeddings in place of the configured model, restored afterwards."""
+    previous = registry._components.get("embedding")
+    registry._components["embedding"] = StubEmbeddings()
+    yield registry._components["embedding"]
+    if previous is None:
+        registry._components.pop("embedding", None)
+    else:
+        registry._components["embedding"] = previous
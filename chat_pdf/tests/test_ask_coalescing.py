@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+
+import pytest
+
+from services.collection_manager import collections
+from services.model_registry import registry
+from services.rag_pipeline import RagPipeline
+
+
+COLLECTION = "coalescing"
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+class Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class GatedLLM:
+    """Answers once `release` is set, counting calls per mode."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = {"invoke": 0, "stream": 0}
+        self._lock = threading.Lock()
+
+    def _wait(self, mode):
+        with self._lock:
+            self.calls[mode] += 1
+        assert self.release.wait(5)
+
+    def invoke(self, prompt):
+        self._wait("invoke")
+        return Message("Food > Delivery")
+
+    def stream(self, prompt):
+        self._wait("stream")
+        for piece in ("Food", " > ", "Delivery"):
+            yield Message(piece)
+
+
+@pytest.fixture
+def gated_llm(stub_embedding, monkeypatch):
+    db = collections.get(COLLECTION)
+    if not db._collection.count():
+        db.add_texts(["Online food delivery connecting restaurants with customers."], ids=["delivery"])
+        collections.stamp(COLLECTION)
+    llm = GatedLLM()
+    pipeline = RagPipeline(llm, registry.prompt_template())
+    monkeypatch.setattr(registry, "rag_pipeline", lambda name=None: pipeline)
+    yield llm
+    llm.release.set()
+
+
+def post(path, query, results, index):
+    import chat_pdf
+
+    response = chat_pdf.app.test_client().post(path, json={"query": query, "collection": COLLECTION})
+    if path.endswith("/stream"):
+        events = [json.loads(line[len("data: "):]) for line in response.get_data(as_text=True).splitlines() if line.startswith("data: ")]
+        results[index] = (response.status_code, events[-1])
+    else:
+        results[index] = (response.status_code, response.get_json())
+
+
+def start(paths, query):
+    results = [None] * len(paths)
+    threads = [threading.Thread(target=post, args=(path, query, results, index)) for index, path in enumerate(paths)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def join(threads):
+    for thread in threads:
+        thread.join(10)
+        assert not thread.is_alive()
+
+
+def test_concurrent_asks_share_one_answer(gated_llm):
+    import chat_pdf
+
+    before = chat_pdf.ask_flights.stats()["deduplicated"]
+    threads, results = start(["/ask"] * 4, "Which category fits food delivery?")
+    wait_until(lambda: chat_pdf.ask_flights.stats()["deduplicated"] - before == 3)
+    gated_llm.release.set()
+    join(threads)
+
+    assert gated_llm.calls == {"invoke": 1, "stream": 0}
+    assert all(status == 200 and body["response"] == "Food > Delivery" for status, body in results)
+    assert sorted(body["coalesced"] for _, body in results) == [False, True, True, True]
+
+
+def test_concurrent_streams_share_one_stream(gated_llm):
+    import chat_pdf
+
+    before = chat_pdf.ask_flights.stats()["deduplicated"]
+    threads, results = start(["/ask/stream"] * 3, "Which subcategory fits food delivery?")
+    wait_until(lambda: chat_pdf.ask_flights.stats()["deduplicated"] - before == 2)
+    gated_llm.release.set()
+    join(threads)
+
+    assert gated_llm.calls == {"invoke": 0, "stream": 1}
+    assert all(status == 200 and done["response"] == "Food > Delivery" for status, done in results)
+    assert sorted(done["coalesced"] for _, done in results) == [False, True, True]
+
+
+def test_ask_and_stream_of_the_same_question_run_separately(gated_llm):
+    import chat_pdf
+
+    before = chat_pdf.ask_flights.stats()
+    threads, results = start(["/ask", "/ask/stream"], "Which business category is food delivery?")
+    wait_until(lambda: sum(gated_llm.calls.values()) == 2)
+    gated_llm.release.set()
+    join(threads)
+
+    (ask_status, ask_body), (stream_status, done) = results
+    assert (ask_status, ask_body["response"], ask_body["coalesced"]) == (200, "Food > Delivery", False)
+    assert (stream_status, done["response"], done["coalesced"]) == (200, "Food > Delivery", False)
+    assert chat_pdf.ask_flights.stats()["deduplicated"] == before["deduplicated"]
+
+
+def test_cached_answers_are_kept_per_retrieval_mode(gated_llm):
+    import chat_pdf
+
+    gated_llm.release.set()
+    client = chat_pdf.app.test_client()
+    query = "Which retrieval mode answered food delivery?"
+
+    def ask(retrieval_mode):
+        response = client.post("/ask", json={"query": query, "collection": COLLECTION, "retrieval_mode": retrieval_mode})
+        assert response.status_code == 200
+        return response.get_json()
+
+    assert not ask("vector").get("cached")
+    assert not ask("hybrid").get("cached")
+    assert ask("hybrid")["cached"]
+    assert ask("vector")["cached"]
+    assert gated_llm.calls == {"invoke": 2, "stream": 0}
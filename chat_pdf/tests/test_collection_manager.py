@@ -0,0 +1,132 @@
+import os
+import shutil
+import threading
+
+from benchmarks.common import StubEmbeddings
+from services.collection_manager import CollectionManager
+from services.exact_store import EXACT
+from services.quantized_index import INT8, QuantizedIndex
+
+
+def manager(tmp_path, **options):
+    embedding = StubEmbeddings()
+    return CollectionManager(str(tmp_path), lambda: embedding, lambda: {"model": "stub"}, **options)
+
+
+def test_pinned_collection_is_not_evicted(tmp_path):
+    collections = manager(tmp_path, max_resident=1)
+
+    with collections.pinned("ingesting"):
+        db = collections.get("ingesting")
+        lexical = collections.lexical_index("ingesting")
+        collections.get("other")
+        collections.get("third")
+
+        assert collections.stats()["resident"] == ["ingesting", "third"]
+        assert collections.get("ingesting") is db
+        assert collections.lexical_index("ingesting") is lexical
+
+    # Evictions skipped while it was pinned happen once it is unpinned
+    assert collections.stats()["resident"] == ["ingesting"]
+    assert collections.stats()["pinned"] == []
+
+
+def test_pins_are_counted(tmp_path):
+    collections = manager(tmp_path, max_resident=1)
+
+    collections.pin("shared")
+    collections.pin("shared")
+    collections.get("shared")
+    collections.unpin("shared")
+    collections.get("other")
+
+    assert "shared" in collections.stats()["resident"]
+    collections.unpin("shared")
+    assert collections.stats()["resident"] == ["other"]
+
+
+def test_exclusive_writer_waits_for_shared_writers(tmp_path):
+    collections = manager(tmp_path)
+    events = []
+
+    def reset():
+        with collections.writing("shared", exclusive=True):
+            events.append("reset")
+
+    with collections.writing("shared"):
+        thread = threading.Thread(target=reset)
+        thread.start()
+        thread.join(0.2)
+        events.append("ingest done")
+    thread.join(5)
+
+    assert events == ["ingest done", "reset"]
+
+
+def test_lexical_index_out_of_step_with_the_collection_is_rebuilt(tmp_path):
+    collections = manager(tmp_path)
+    db = collections.get("lexical")
+    db.add_texts(["online food delivery"], ids=["first"])
+    collections.lexical_index("lexical").add(["first"], ["online food delivery"])
+    collections.lexical_index("lexical").save()
+
+    # Chunks written by an ingest that died before saving the lexical index
+    db.add_texts(["restaurant checkout"], ids=["second"])
+    collections.release("lexical")
+
+    index = collections.lexical_index("lexical")
+    assert len(index) == 2
+    assert index.search("checkout", k=1)[0][0] == "second"
+
+
+def test_reset_exact_collection_does_not_bring_chroma_records_back(tmp_path):
+    chroma = manager(tmp_path)
+    chroma.get("migrated").add_texts(["online food delivery", "restaurant checkout"], ids=["first", "second"])
+    chroma.release("migrated")
+
+    exact = manager(tmp_path, vector_store=EXACT)
+    assert exact.get("migrated")._collection.count() == 2
+    exact.reset("migrated")
+    exact.release("migrated")
+
+    # The exact store is reopened from disk, as after a restart
+    reopened = manager(tmp_path, vector_store=EXACT)
+    assert reopened.get("migrated")._collection.count() == 0
+    assert manager(tmp_path).get("migrated")._collection.count() == 0
+
+
+def test_exact_store_copies_a_chroma_collection_once(tmp_path):
+    chroma = manager(tmp_path)
+    chroma.get("migrated").add_texts(["online food delivery"], ids=["first"])
+    chroma.release("migrated")
+
+    exact = manager(tmp_path, vector_store=EXACT)
+    exact.get("migrated")._collection.delete(ids=["first"])
+    exact.release("migrated")
+    shutil.rmtree(tmp_path / "migrated" / "exact")
+
+    assert manager(tmp_path, vector_store=EXACT).get("migrated")._collection.count() == 0
+
+
+def test_reset_drops_the_quantized_index(tmp_path):
+    collections = manager(tmp_path)
+    collections.get("quantized").add_texts(["online food delivery", "restaurant checkout"], ids=["first", "second"])
+    collections.build_quantized_index("quantized", INT8)
+    assert collections.quantized_index("quantized") is not None
+
+    collections.reset("quantized")
+
+    assert collections.quantized_index("quantized") is None
+    assert not QuantizedIndex.exists(collections.path("quantized"))
+
+
+def test_version_bumped_by_another_replica_is_seen(tmp_path):
+    writer = manager(tmp_path)
+    reader = manager(tmp_path)
+    os.makedirs(writer.path("faq"))
+
+    assert reader.version("faq") == "0"
+    first = writer.bump_version("faq")
+    assert reader.version("faq") == first
+    second = writer.bump_version("faq")
+    assert reader.version("faq") == second
@@ -0,0 +1,69 @@
+import pytest
+
+from benchmarks.common import StubEmbeddings
+from services.exact_store import ExactVectorStore
+
+TEXTS = [f"chunk number {index}" for index in range(20)]
+
+
+def store_with_texts(tmp_path, dtype="float32"):
+    store = ExactVectorStore(str(tmp_path), StubEmbeddings(), dtype=dtype)
+    store.add_texts(
+        TEXTS,
+        metadatas=[{"source": "even" if index % 2 == 0 else "odd"} for index in range(len(TEXTS))],
+        ids=[f"chunk-{index}" for index in range(len(TEXTS))],
+    )
+    return store
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_search_finds_the_added_text(tmp_path, dtype):
+    store = store_with_texts(tmp_path, dtype)
+
+    assert len(store) == len(TEXTS)
+    for text in TEXTS:
+        (document, distance), *_ = store.similarity_search_with_score(text, k=3)
+        assert document.page_content == text
+        assert distance == pytest.approx(0, abs=1e-2)
+
+
+def test_metadata_filter_limits_the_results(tmp_path):
+    store = store_with_texts(tmp_path)
+
+    documents = store.similarity_search(TEXTS[0], k=5, filter={"source": "odd"})
+
+    assert len(documents) == 5
+    assert all(document.metadata == {"source": "odd"} for document in documents)
+    assert TEXTS[0] not in [document.page_content for document in documents]
+
+
+def test_deleted_texts_are_no_longer_found(tmp_path):
+    store = store_with_texts(tmp_path)
+
+    store.delete(ids=["chunk-3", "chunk-4"])
+
+    assert len(store) == len(TEXTS) - 2
+    found = [document.page_content for document in store.similarity_search(TEXTS[3], k=len(TEXTS))]
+    assert len(found) == len(TEXTS) - 2
+    assert TEXTS[3] not in found and TEXTS[4] not in found
+
+    # Freed rows are reused by the next write
+    store.add_texts(["a new chunk"], ids=["chunk-new"])
+    assert len(store) == len(TEXTS) - 1
+    assert store.similarity_search("a new chunk", k=1)[0].page_content == "a new chunk"
+
+
+def test_store_is_reopened_from_disk(tmp_path):
+    store = store_with_texts(tmp_path)
+    store.delete(ids=["chunk-0"])
+    expected = store.similarity_search_with_score(TEXTS[1], k=4)
+    store.close()
+
+    reopened = ExactVectorStore(str(tmp_path), StubEmbeddings())
+
+    assert ExactVectorStore.exists(str(tmp_path))
+    assert len(reopened) == len(TEXTS) - 1
+    found = reopened.similarity_search_with_score(TEXTS[1], k=4)
+    assert [document.page_content for document, _ in found] == [document.page_content for document, _ in expected]
+    assert [distance for _, distance in found] == pytest.approx([distance for _, distance in expected])
+    assert reopened.similarity_search(TEXTS[2], k=1, filter={"source": "even"})[0].metadata == {"source": "even"}
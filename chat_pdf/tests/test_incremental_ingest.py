@@ -0,0 +1,39 @@
+import os
+
+from benchmarks.common import write_synthetic_pdf
+from services.collection_manager import collections
+
+
+def ingest(tmp_path, collection_name, pages=3):
+    import chat_pdf
+
+    path = os.path.join(tmp_path, "faq.pdf")
+    write_synthetic_pdf(path, pages)
+    return chat_pdf.ChatPDF().ingest(path, "test", document_name="faq.pdf", collection_name=collection_name)
+
+
+def test_reingest_keeps_unchanged_chunks(tmp_path, stub_embedding):
+    first = ingest(tmp_path, "incremental")
+    second = ingest(tmp_path, "incremental")
+
+    assert first["chunks"]["added"] > 0
+    assert second["chunks"] == {"added": 0, "kept": first["chunks"]["added"], "removed": 0, "metadata_updated": 0}
+
+
+def test_reingest_replaces_chunks_stored_without_document_metadata(tmp_path, stub_embedding):
+    db = collections.get("legacy")
+    # What ingests wrote before chunk ids: random ids, the upload path as source, no "document"
+    db.add_texts(
+        ["legacy chunk one", "legacy chunk two"],
+        metadatas=[{"source": "/tmp/faq.pdf", "page": 0}, {"source": "/tmp/faq.pdf", "page": 1}],
+        ids=["legacy-1", "legacy-2"],
+    )
+    db.add_texts(["another document"], metadatas=[{"source": "/tmp/other.pdf", "page": 0}], ids=["other-1"])
+
+    result = ingest(tmp_path, "legacy")
+
+    stored = collections.get("legacy")._collection.get()["ids"]
+    assert "legacy-1" not in stored and "legacy-2" not in stored
+    assert "other-1" in stored
+    assert result["chunks"]["removed"] == 2
+    assert len(stored) == result["chunks"]["added"] + 1
@@ -0,0 +1,78 @@
+import io
+import json
+import os
+import threading
+
+from benchmarks.common import write_synthetic_pdf
+from services.collection_manager import collections
+from services.ingest_jobs import FAILED, IngestJobQueue, ingest_queue
+
+
+def pdf_bytes(tmp_path, name, pages=2, seed=0):
+    path = write_synthetic_pdf(os.path.join(tmp_path, name), pages, seed=seed)
+    with open(path, "rb") as pdf_file:
+        return pdf_file.read()
+
+
+def post_batch(tmp_path, collection_name, names, overwrite=True):
+    import chat_pdf
+
+    files = [(io.BytesIO(pdf_bytes(tmp_path, name, seed=index)), name) for index, name in enumerate(names)]
+    data = {"files": files, "collection": collection_name, "overwrite_embeddings": str(overwrite).lower()}
+    return chat_pdf.app.test_client().post("/ingest/batch", data=data, content_type="multipart/form-data")
+
+
+def stored_sources(collection_name):
+    return {metadata["source"] for metadata in collections.get(collection_name)._collection.get()["metadatas"]}
+
+
+def test_rejected_overwrite_batch_keeps_the_collection(tmp_path, stub_embedding, monkeypatch):
+    post_batch(tmp_path, "batch-full", ["old.pdf"]).get_data()
+    count = collections.get("batch-full")._collection.count()
+    assert count > 0
+
+    monkeypatch.setattr(ingest_queue, "max_pending", 0)
+    response = post_batch(tmp_path, "batch-full", ["new-1.pdf", "new-2.pdf"])
+
+    assert response.status_code == 503
+    assert collections.get("batch-full")._collection.count() == count
+
+
+def test_overwrite_batch_resets_before_its_files(tmp_path, stub_embedding):
+    post_batch(tmp_path, "batch-reset", ["old.pdf"], overwrite=False).get_data()
+
+    response = post_batch(tmp_path, "batch-reset", ["new-1.pdf", "new-2.pdf"])
+    completed = json.loads(response.get_data(as_text=True).splitlines()[-1])
+
+    assert completed["completed"] == 2
+    assert stored_sources("batch-reset") == {"new-1.pdf", "new-2.pdf"}
+
+
+def test_batch_start_runs_once_before_every_job():
+    queue = IngestJobQueue(max_workers=3)
+    events = []
+    lock = threading.Lock()
+
+    def record(name):
+        with lock:
+            events.append(name)
+
+    batch = queue.submit_batch(
+        "session",
+        [(f"{index}.pdf", None, lambda job: record("job")) for index in range(3)],
+        on_started=lambda batch: record("started"),
+    )
+    assert batch.wait(5)
+    assert events == ["started", "job", "job", "job"]
+
+
+def test_failed_batch_start_fails_every_job():
+    queue = IngestJobQueue(max_workers=2)
+
+    def fail(batch):
+        raise RuntimeError("reset failed")
+
+    batch = queue.submit_batch("session", [(f"{index}.pdf", None, lambda job: "ok") for index in range(2)], on_started=fail)
+    assert batch.wait(5)
+    assert [job.stage for job in batch.jobs] == [FAILED, FAILED]
+    assert all("reset failed" in job.error for job in batch.jobs)
@@ -0,0 +1,25 @@
+import io
+import os
+
+import pytest
+
+from services.ingest_jobs import QueueFull, ingest_queue
+
+
+@pytest.mark.parametrize("error, status", [(QueueFull("queue full"), 503), (RuntimeError("job not built"), 500)])
+def test_upload_is_removed_when_it_is_not_queued(monkeypatch, error, status):
+    import chat_pdf
+
+    uploads = []
+
+    def submit(session_id, pdf_file_path, target):
+        uploads.append(pdf_file_path)
+        raise error
+
+    monkeypatch.setattr(ingest_queue, "submit", submit)
+    response = chat_pdf.app.test_client().post(
+        "/ingest", data={"file": (io.BytesIO(b"%PDF-1.4"), "faq.pdf")}, content_type="multipart/form-data"
+    )
+
+    assert response.status_code == status
+    assert len(uploads) == 1 and not os.path.exists(uploads[0])
@@ -0,0 +1,140 @@
+import threading
+import time
+
+import openai
+import pytest
+
+from benchmarks.fake_openai_server import start_server
+from services import llm_client
+from services.llm_client import OPENAI, LLMDeadlineExceeded, PooledLLM, RetryBudget, create_chat_model, create_http_client
+
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(**options):
+        options.setdefault("latency", 0.0)
+        options.setdefault("token_delay", 0.0)
+        options.setdefault("tokens", 3)
+        servers.append(start_server(**options))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def pooled(server, max_concurrency=4, **options):
+    llm = create_chat_model(
+        OPENAI,
+        "gpt-4o-mini",
+        base_url=server.url,
+        api_key="fake",
+        http_client=create_http_client(max_concurrency, 10),
+    )
+    options.setdefault("backoff_base_seconds", 0.01)
+    return PooledLLM(llm, max_concurrency=max_concurrency, **options)
+
+
+def test_retries_server_errors_until_a_call_succeeds(fake_server):
+    server = fake_server(fail_first=2)
+    llm = pooled(server, max_retries=2)
+
+    assert llm.invoke("question").content.startswith("Answer0")
+    assert server.stats["requests"] == 3
+    assert llm.stats()["retries"] == 2
+    assert llm.stats()["succeeded"] == 1
+
+
+def test_retries_rate_limits_then_gives_up(fake_server):
+    server = fake_server(rate_limit_rate=1.0)
+    llm = pooled(server, max_retries=2)
+
+    with pytest.raises(openai.RateLimitError):
+        llm.invoke("question")
+    assert server.stats["rate_limited"] == 3
+    assert llm.stats()["failed"] == 1
+
+
+def test_stream_is_retried_before_its_first_token(fake_server):
+    server = fake_server(fail_first=1)
+    llm = pooled(server, max_retries=1)
+
+    assert "".join(chunk.content for chunk in llm.stream("question")).startswith("Answer0")
+    assert server.stats["requests"] == 2
+
+
+def test_exhausted_retry_budget_fails_fast_instead_of_retrying(fake_server):
+    server = fake_server(error_rate=1.0)
+    llm = pooled(server, max_retries=5, retry_budget=RetryBudget(ratio=0.0, min_per_second=0.0, max_tokens=2))
+
+    for _ in range(5):
+        with pytest.raises(openai.InternalServerError):
+            llm.invoke("question")
+
+    # Two retries in total, not five per call
+    assert server.stats["requests"] == 5 + 2
+    assert llm.stats()["retries"] == 2
+    assert llm.stats()["retries_denied"] == 5
+
+
+def test_deadline_covers_the_wait_for_a_slot(fake_server):
+    server = fake_server()
+    llm = pooled(server, max_concurrency=1, deadline_seconds=0.3)
+
+    with llm._slot(time.monotonic() + 5):
+        started = time.monotonic()
+        with pytest.raises(LLMDeadlineExceeded):
+            llm.invoke("question")
+    assert time.monotonic() - started < 1.0
+    assert server.stats["requests"] == 0
+
+
+def test_deadline_covers_slot_wait_and_attempts(fake_server):
+    server = fake_server(latency=0.6)
+    llm = pooled(server, max_concurrency=1, deadline_seconds=1.0, max_retries=3)
+    holder = threading.Thread(target=llm.invoke, args=("first",))
+    holder.start()
+    time.sleep(0.1)
+
+    # Waits about 0.5s for the slot, then has too little time left for a 0.6s answer
+    started = time.monotonic()
+    with pytest.raises(LLMDeadlineExceeded):
+        llm.invoke("second")
+    holder.join()
+    assert time.monotonic() - started < 1.3
+
+
+def test_deadline_covers_backoff(fake_server, monkeypatch):
+    server = fake_server(error_rate=1.0)
+    llm = pooled(server, deadline_seconds=1.0, max_retries=3, backoff_base_seconds=5.0, backoff_max_seconds=5.0)
+    # Full jitter drawing its maximum: a 5s backoff cannot fit in the 1s deadline
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: high)
+
+    started = time.monotonic()
+    with pytest.raises(LLMDeadlineExceeded):
+        llm.invoke("question")
+    assert time.monotonic() - started < 0.5
+    assert server.stats["requests"] == 1
+
+
+def test_concurrency_cap_bounds_requests_and_connections(fake_server):
+    server = fake_server(latency=0.05)
+    llm = pooled(server, max_concurrency=3)
+    answers = []
+
+    def ask(index):
+        answers.append(llm.invoke(f"question {index}").content)
+
+    threads = [threading.Thread(target=ask, args=(index,)) for index in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(answers) == 12
+    assert server.stats["peak_in_flight"] <= 3
+    assert llm.stats()["peak_in_flight"] <= 3
+    # Kept-alive connections are reused instead of opened per call
+    assert server.stats["connections"] <= 3
@@ -0,0 +1,79 @@
+import pytest
+from langchain_core.documents import Document
+
+from benchmarks.fake_openai_server import start_server
+from config import settings
+from services.llm_client import OLLAMA, OPENAI
+from services.model_registry import DEFAULT_LLM, SMALL_LLM, ModelRegistry
+from services.prompts import DEFAULT_TEMPLATE_NAME, PROMPT_TEMPLATES
+
+LARGE_MODEL = "gpt-4o-mini"
+SMALL_MODEL = "phi3"
+SMALL_TEMPLATES = ["primary_field_template", "app_template_choice"]
+
+
+class FixedRetriever:
+    def invoke(self, query):
+        return [Document(page_content="Online food delivery. Category: Food, subcategory: Delivery.")]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = start_server(latency=0.0, token_delay=0.0, tokens=3)
+    monkeypatch.setattr(settings, "LLM_BACKEND", OPENAI)
+    monkeypatch.setattr(settings, "LLM_MODEL_NAME", LARGE_MODEL)
+    monkeypatch.setattr(settings, "LLM_BASE_URL", server.url)
+    monkeypatch.setattr(settings, "LLM_SMALL_BACKEND", OLLAMA)
+    monkeypatch.setattr(settings, "OLLAMA_BASE_URL", server.url)
+    monkeypatch.setattr(settings, "LLM_SMALL_TEMPLATES", SMALL_TEMPLATES)
+    yield server
+    server.shutdown()
+
+
+def answer_every_template(registry):
+    for name in PROMPT_TEMPLATES:
+        registry.rag_pipeline(name).run(FixedRetriever(), "Which category fits an online food delivery business?")
+
+
+def test_small_templates_go_to_the_small_model(server, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SMALL_MODEL_NAME", SMALL_MODEL)
+    registry = ModelRegistry()
+
+    answer_every_template(registry)
+
+    assert all(template in PROMPT_TEMPLATES for template in SMALL_TEMPLATES)
+    assert server.stats["models"] == {SMALL_MODEL: len(SMALL_TEMPLATES), LARGE_MODEL: len(PROMPT_TEMPLATES) - len(SMALL_TEMPLATES)}
+    for name in PROMPT_TEMPLATES:
+        assert registry.llm_route(name) == (SMALL_LLM if name in SMALL_TEMPLATES else DEFAULT_LLM)
+
+
+def test_every_template_goes_to_the_large_model_without_a_small_one(server, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SMALL_MODEL_NAME", None)
+    registry = ModelRegistry()
+
+    answer_every_template(registry)
+
+    assert server.stats["models"] == {LARGE_MODEL: len(PROMPT_TEMPLATES)}
+    assert registry.llm(SMALL_LLM) is registry.llm(DEFAULT_LLM)
+    assert set(registry.llm_stats()["models"]) == {DEFAULT_LLM}
+
+
+def test_llm_stats_endpoint_reports_each_model(server, monkeypatch):
+    import chat_pdf
+
+    monkeypatch.setattr(settings, "LLM_SMALL_MODEL_NAME", SMALL_MODEL)
+    registry = ModelRegistry()
+    monkeypatch.setattr(chat_pdf, "registry", registry)
+    answer_every_template(registry)
+
+    stats = chat_pdf.app.test_client().get("/models/llm").get_json()
+
+    assert stats["routes"] == {name: SMALL_LLM if name in SMALL_TEMPLATES else DEFAULT_LLM for name in PROMPT_TEMPLATES}
+    assert stats["routes"][DEFAULT_TEMPLATE_NAME] == DEFAULT_LLM
+    small, large = stats["models"][SMALL_LLM], stats["models"][DEFAULT_LLM]
+    assert (small["backend"], small["model"]) == (OLLAMA, SMALL_MODEL)
+    assert (large["backend"], large["model"]) == (OPENAI, LARGE_MODEL)
+    assert small["calls"] == small["succeeded"] == len(SMALL_TEMPLATES)
+    assert large["calls"] == large["succeeded"] == len(PROMPT_TEMPLATES) - len(SMALL_TEMPLATES)
+    assert small["max_concurrency"] == settings.LLM_SMALL_MAX_CONCURRENCY
+    assert large["max_concurrency"] == settings.LLM_MAX_CONCURRENCY
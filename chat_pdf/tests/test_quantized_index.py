@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from benchmarks.common import StubEmbeddings
+from services.exact_store import ExactVectorStore
+from services.quantized_index import BINARY, INT8, QuantizedIndex, QuantizedRetriever
+
+
+def toy_store(tmp_path, rows=300, dimension=384, seed=0):
+    # Clusters of ten related chunks, so a query's nearest neighbours stand out as real embeddings' do
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((rows // 10, dimension))
+    vectors = (np.repeat(centers, 10, axis=0) + 0.5 * rng.standard_normal((rows, dimension))).astype(np.float32)
+    store = ExactVectorStore(str(tmp_path), StubEmbeddings(dimension))
+    ids = [f"chunk-{row}" for row in range(rows)]
+    store._collection.upsert(ids=ids, embeddings=vectors.tolist(), documents=[f"text {row}" for row in range(rows)])
+    return store, vectors
+
+
+@pytest.mark.parametrize("mode", [INT8, BINARY])
+def test_search_returns_the_exact_top_k_after_rerank(tmp_path, mode):
+    store, vectors = toy_store(tmp_path)
+    index = QuantizedIndex.build(store, str(tmp_path), mode)
+    rng = np.random.default_rng(1)
+
+    for row in rng.choice(len(vectors), size=20, replace=False):
+        query = vectors[row] + 0.1 * rng.standard_normal(vectors.shape[1]).astype(np.float32)
+        found = [found_row for found_row, _ in index.search(query, k=4, rerank_factor=8)]
+        assert found == index.exact_search(query, k=4)
+        assert found[0] == row
+
+
+def test_index_is_reloaded_from_disk(tmp_path):
+    store, vectors = toy_store(tmp_path, rows=50)
+    built = QuantizedIndex.build(store, str(tmp_path), INT8)
+
+    assert QuantizedIndex.exists(str(tmp_path))
+    loaded = QuantizedIndex(built.directory)
+    assert loaded.ids == built.ids
+    assert loaded.search(vectors[7], k=3) == built.search(vectors[7], k=3)
+
+
+def test_retriever_loads_the_matching_chunks(tmp_path):
+    store, vectors = toy_store(tmp_path, rows=50)
+    index = QuantizedIndex.build(store, str(tmp_path), INT8)
+
+    class FixedQuery:
+        def embed_query(self, text):
+            return vectors[12].tolist()
+
+    retriever = QuantizedRetriever(index=index, db=store, embedding=FixedQuery(), k=2)
+    results = retriever.search("anything")
+
+    assert results[0][0] == "chunk-12"
+    assert results[0][1].page_content == "text 12"
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from services.embedding_cache import QueryEmbeddingCache
+
+
+def test_encodes_the_query_as_asked_and_caches_it_by_normalized_text():
+    encoded = []
+
+    def encode_many(texts):
+        encoded.extend(texts)
+        return [[float(len(text))] for text in texts]
+
+    cache = QueryEmbeddingCache(encode_many)
+
+    assert cache.embed_query("  What is\nB2B2C? ") == [float(len("  What is\nB2B2C? "))]
+    assert cache.embed_query("What is\nB2B2C?") == [float(len("  What is\nB2B2C? "))]
+    assert encoded == ["  What is\nB2B2C? "]
+    assert cache.stats()["hits"] == 1
+
+
+def test_short_encoder_result_fails_every_waiter():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def encode_many(texts):
+        calls.append(list(texts))
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+            return [[0.0]]
+        # Queries queued while the first batch ran, answered with one vector too few
+        return [[1.0]] * (len(texts) - 1)
+
+    cache = QueryEmbeddingCache(encode_many)
+    errors = []
+
+    def ask(text):
+        try:
+            cache.embed_query(text)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=ask, args=("first",))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=ask, args=(f"query {index}",)) for index in range(3)]
+    for thread in followers:
+        thread.start()
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+        assert not thread.is_alive()
+
+    assert len(errors) == 3
+    assert cache.stats()["entries"] == 1
+
+
+def test_encoder_error_reaches_the_caller_and_is_not_cached():
+    def encode_many(texts):
+        raise RuntimeError("model unavailable")
+
+    cache = QueryEmbeddingCache(encode_many)
+    with pytest.raises(RuntimeError):
+        cache.embed_query("question")
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,99 @@
+import threading
+import time
+
+from services.single_flight import SingleFlight
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def run_in_threads(count, target):
+    results = [None] * count
+
+    def call(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_followers_share_the_leaders_result():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"answer": 42}
+
+    threads, results = run_in_threads(4, lambda: flights.do("key", compute))
+    wait_until(lambda: flights.stats()["deduplicated"] == 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result[0] == {"answer": 42} for result in results)
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+
+
+def test_followers_get_the_leaders_exception():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise RuntimeError("LLM down")
+
+    errors = []
+
+    def call():
+        try:
+            flights.do("key", fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads, _ = run_in_threads(3, call)
+    wait_until(lambda: flights.stats()["deduplicated"] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert flights.stats()["failed"] == 1
+
+
+def test_late_stream_follower_replays_what_was_already_streamed():
+    flights = SingleFlight()
+    first_sent, release = threading.Event(), threading.Event()
+
+    def tokens():
+        yield "a"
+        first_sent.set()
+        release.wait(5)
+        yield "b"
+
+    leader = flights.stream("key", tokens)
+    assert next(leader) == ("a", False)
+    threads, results = run_in_threads(1, lambda: list(flights.stream("key", tokens)))
+    wait_until(lambda: flights.stats()["deduplicated"] == 1)
+    release.set()
+
+    assert list(leader) == [("b", False)]
+    threads[0].join()
+    assert results[0] == [("a", True), ("b", True)]
+
+
+def test_finished_flight_frees_its_key():
+    flights = SingleFlight()
+
+    assert flights.do("key", lambda: 1) == (1, False)
+    assert flights.do("key", lambda: 2) == (2, False)
+    assert flights.stats()["executions"] == 2
@@ -0,0 +1,94 @@
+import tarfile
+import threading
+
+import pytest
+
+from benchmarks.common import StubEmbeddings
+from services import collection_manager
+from services.collection_manager import CollectionManager
+from services.snapshot import SnapshotError, SnapshotRetriever
+
+TEXTS = [
+    "Online food delivery connecting restaurants with customers.",
+    "Checkout with saved payment cards.",
+    "Admin dashboard with role permissions.",
+    "Push notifications for order status.",
+]
+QUERY = "Which page handles payment at checkout?"
+
+
+def manager(tmp_path, name):
+    embedding = StubEmbeddings()
+    return CollectionManager(str(tmp_path / name), lambda: embedding, lambda: {"model": "stub"})
+
+
+def exported(tmp_path):
+    source = manager(tmp_path, "source")
+    pages = range(len(TEXTS))
+    source.get("faq").add_texts(TEXTS, metadatas=[{"page": page} for page in pages], ids=[f"chunk-{page}" for page in pages])
+    archive_path = str(tmp_path / "faq.snapshot.tar")
+    source.export_snapshot("faq", archive_path)
+    return source, archive_path
+
+
+def top_texts(documents):
+    return [document.page_content for document in documents]
+
+
+def test_imported_snapshot_answers_like_the_exported_collection(tmp_path):
+    source, archive_path = exported(tmp_path)
+    expected = top_texts(source.get("faq").similarity_search(QUERY, k=2))
+
+    replica = manager(tmp_path, "replica")
+    manifest = replica.import_snapshot("faq", archive_path)
+    store = replica.snapshot_store("faq")
+    retriever = SnapshotRetriever(store=store, embedding=StubEmbeddings(), k=2)
+
+    assert manifest["count"] == len(TEXTS)
+    assert top_texts(retriever.invoke(QUERY)) == expected
+
+    # Once hydrated, Chroma serves the same answer and the snapshot is gone
+    assert replica.hydrate("faq") == len(TEXTS)
+    assert replica.snapshot_store("faq") is None
+    assert top_texts(replica.get("faq").similarity_search(QUERY, k=2)) == expected
+
+
+def test_corrupt_archive_leaves_the_collection_intact(tmp_path):
+    _, archive_path = exported(tmp_path)
+    with tarfile.open(archive_path) as archive:
+        offset = archive.getmember("vectors.f32").offset_data
+    # Flip stored vectors in place: the archive still reads, the checksum no longer matches
+    with open(archive_path, "r+b") as archive_file:
+        archive_file.seek(offset)
+        archive_file.write(b"\xff" * 64)
+
+    replica = manager(tmp_path, "replica")
+    replica.get("faq").add_texts(["Existing chunk."], ids=["existing"])
+    version = replica.version("faq")
+
+    with pytest.raises(SnapshotError):
+        replica.import_snapshot("faq", archive_path)
+
+    assert replica.get("faq")._collection.get()["ids"] == ["existing"]
+    assert replica.snapshot_store("faq") is None
+    assert replica.version("faq") == version
+    assert replica.names() == ["faq"]
+
+
+def test_archive_is_unpacked_without_holding_the_manager_lock(tmp_path, monkeypatch):
+    _, archive_path = exported(tmp_path)
+    replica = manager(tmp_path, "replica")
+    unpack = collection_manager.unpack_snapshot
+    served = []
+
+    def unpack_while_other_collections_are_used(*args):
+        # Another request thread must not wait for the import
+        thread = threading.Thread(target=lambda: served.append(replica.version("other")))
+        thread.start()
+        thread.join(2)
+        return unpack(*args)
+
+    monkeypatch.setattr(collection_manager, "unpack_snapshot", unpack_while_other_collections_are_used)
+    replica.import_snapshot("faq", archive_path)
+
+    assert served == ["0"]
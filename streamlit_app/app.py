@@ -1,52 +1,102 @@
 # app.py
 
-import os
-import tempfile
+import json
 import requests
 import streamlit as st
 
 API_URL = "http://middle_layer:8000"
 
-def send_to_api(endpoint, data=None, files=None):
-    try:
-        response = requests.post(f"{API_URL}/{endpoint}", json=data, files=files)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"API request failed: {e}")
-        return None
-
 st.set_page_config(page_title="Admin: PDF Ingestion & Testing", page_icon=":robot:")
 st.title("Admin: PDF Ingestion & Testing")
 
 if "session_id" not in st.session_state:
     st.session_state.session_id = None
 
+if "collection" not in st.session_state:
+    st.session_state.collection = "global"
+
 if "messages" not in st.session_state:
     st.session_state.messages = [
         {"role": "assistant", "content": "Upload a PDF document for training and ask questions to test it."}
     ]
 
+def stream_batch_ingest(files, data):
+    """
+    Posts every file to /ingest/batch and yields the progress events the
+    server streams back, one JSON object per line.
+    """
+    try:
+        with requests.post(f"{API_URL}/ingest/batch", data=data, files=files, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+    except requests.exceptions.RequestException as e:
+        st.error(f"API request failed: {e}")
+
+def stream_answer_tokens(data, final):
+    """
+    Posts a question to /ask/stream and yields the answer text as the server
+    streams it. The closing event (response, sources, timings) is copied
+    into `final`.
+    """
+    try:
+        with requests.post(f"{API_URL}/ask/stream", json=data, stream=True) as response:
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    payload = json.loads(line[len("data: "):])
+                    if event == "token":
+                        yield payload["text"]
+                    elif event == "done":
+                        final.update(payload)
+                    elif event == "error":
+                        st.error(payload["error"])
+    except requests.exceptions.RequestException as e:
+        st.error(f"API request failed: {e}")
+
 def read_and_save_file():
     if st.session_state["file_uploader"]:
         st.session_state["messages"] = [
             {"role": "assistant", "content": "Upload a PDF document for training and ask questions to test it."}
         ]
 
-        for file in st.session_state["file_uploader"]:
-            with tempfile.NamedTemporaryFile(delete=False) as tf:
-                tf.write(file.getbuffer())
-                file_path = tf.name
+        uploads = st.session_state["file_uploader"]
+        files = [("files", (file.name, file.getvalue(), "application/pdf")) for file in uploads]
+        data = {"collection": st.session_state.collection}
+        if st.session_state.session_id:
+            data["session_id"] = st.session_state.session_id
+
+        # One progress line per file, updated in place as events arrive
+        rows = {file.name: st.empty() for file in uploads}
+        summary = None
+        with st.spinner(f"Ingesting {len(uploads)} file(s)"):
+            for event in stream_batch_ingest(files, data):
+                if event["event"] == "batch":
+                    st.session_state.session_id = event["session_id"]
+                elif event["event"] == "progress":
+                    progress = event["progress"]
+                    rows[event["document"]].write(
+                        f"{event['document']}: {event['stage']} - pages parsed: {progress['pages_parsed']}, "
+                        f"chunks embedded: {progress['chunks_embedded']}/{progress['chunks_total']}"
+                    )
+                elif event["event"] == "completed":
+                    summary = event
 
-            with st.spinner(f"Ingesting {file.name}"):
-                response = send_to_api('ingest', files={"file": open(file_path, 'rb')}, data={"session_id": st.session_state.session_id})
-                os.remove(file_path)
+        if summary is None:
+            st.write("Failed to ingest PDF")
+            return
+        for job in summary["jobs"]:
+            if job["stage"] == "completed":
+                rows[job["document"]].write(f"{job['document']}: {job['result']['message']}")
+            else:
+                rows[job["document"]].write(f"{job['document']}: {job['error'] or job['stage']}")
 
-                if response and "session_id" in response:
-                    st.session_state.session_id = response["session_id"]
-                    st.write(response["message"])
-                else:
-                    st.write("Failed to ingest PDF")
+st.text_input("Collection", key="collection")
 
 st.file_uploader(
     "Upload a PDF document",
@@ -66,9 +116,21 @@ for message in st.session_state.messages:
 
 if st.session_state.messages and st.session_state.messages[-1]["role"] == "user":
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            response = send_to_api('ask', data={"session_id": st.session_state.session_id, "query": prompt})
-            response_text = response["response"] if response and "response" in response else "Failed to get response"
+        final = {}
+        data = {"session_id": st.session_state.session_id, "query": prompt, "collection": st.session_state.collection}
+        # Tokens are written as they arrive instead of behind a spinner
+        st.write_stream(stream_answer_tokens(data, final))
+        if final:
+            response_text = final["response"]
+            timings = final["timings"]
+            pages = ", ".join(f"{source['source']} p.{source['page']}" for source in final["sources"])
+            st.caption(
+                f"First token after {timings['ttft_ms']} ms, full answer after {timings['total_ms']} ms"
+                + (" (cached)" if final["cached"] else "")
+                + (f" - sources: {pages}" if pages else "")
+            )
+        else:
+            response_text = "Failed to get response"
             st.write(response_text)
-            st.session_state.messages.append({"role": "assistant", "content": response_text})
+        st.session_state.messages.append({"role": "assistant", "content": response_text})
 
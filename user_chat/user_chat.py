@@ -1,5 +1,6 @@
 # user_chat.py
 
+import json
 import requests
 import streamlit as st
 import uuid
@@ -17,16 +18,78 @@ def send_to_api(endpoint, data=None):
         return None
 
 
+def stream_answer_tokens(data, final):
+    """
+    Posts a question to /ask/stream and yields the answer text as the server
+    streams it. The closing event (response, sources, timings) is copied
+    into `final`.
+    """
+    try:
+        with requests.post(f"{API_URL}/ask/stream", json=data, stream=True) as response:
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    payload = json.loads(line[len("data: "):])
+                    if event == "token":
+                        yield payload["text"]
+                    elif event == "done":
+                        final.update(payload)
+                    elif event == "error":
+                        st.error(payload["error"])
+    except requests.exceptions.RequestException as e:
+        st.error(f"API request failed: {e}")
+
+
+def stream_answer(data):
+    """
+    Renders the answer in the current container as it is generated.
+
+    Returns:
+        dict: The closing event (response, sources, timings), or None if the request failed.
+    """
+    final = {}
+    st.write_stream(stream_answer_tokens(data, final))
+    if not final:
+        return None
+    timings = final["timings"]
+    st.caption(f"First token after {timings['ttft_ms']} ms, full answer after {timings['total_ms']} ms")
+    return final
+
+
+def classify_business(description):
+    """
+    Saves the business category matched to the user's description, without
+    waiting for an LLM answer, and renders the match.
+
+    Returns:
+        dict: {"response": text shown to the user}, or None if the request failed.
+    """
+    payload = {"session_id": st.session_state.session_id, "description": description}
+    result = send_to_api("agent_actions/business_category/1", data=payload)
+    if not result:
+        return None
+    classification = result.get("classification") or {}
+    category, subcategory = classification.get("category"), classification.get("subcategory")
+    if not category:
+        text = "I couldn't match your business to one of our categories yet."
+    elif subcategory:
+        text = f"Category: {category['name']} Subcategory: {subcategory['name']}"
+    else:
+        text = f"Category: {category['name']}"
+    st.write(text)
+    elapsed_ms = round(classification.get("classify_ms", 0) + classification.get("llm_ms", 0), 2)
+    st.caption(f"Matched by {classification.get('method', 'embedding')} in {elapsed_ms} ms")
+    return {"response": text}
+
+
 def execute_task(step, response, user_input):
     if step == 0:
-        st.write(f"Saving business category field: {user_input}")
-        payload = {
-            "session_id": st.session_state.session_id,
-            "response": response["response"]
-        }
-        send_to_api("agent_actions/business_category/1",data=payload)
-
-        # Logic to save to database
+        # Saved by classify_business
+        st.write(f"Saved business category field: {user_input}")
     elif step == 1:  # Example task: Save target customer type
         st.write(f"Saving target customer: {user_input}")
         payload = {
@@ -95,78 +158,63 @@ steps = [
 ]
 
 
+def add_assistant_message(content):
+    st.session_state.messages.append({"role": "assistant", "content": content})
+    with st.chat_message("assistant"):
+        st.write(content)
+
+
 def handle_user_input(prompt):
     if not prompt or prompt.strip() == "":
         return  # Skip if prompt is None or empty
 
     st.session_state.messages.append({"role": "user", "content": prompt})
+    with st.chat_message("user"):
+        st.write(prompt)
 
+    data = {"session_id": st.session_state.session_id, "query": prompt}
     if st.session_state.current_step < len(steps):
-        step = steps[st.session_state.current_step]
-
-        # Ensure that `query` is not None before calling the API
-        response = send_to_api(
-            "ask",
-            data={
-                "session_id": st.session_state.session_id,
-                "query": prompt,
-                "prompt_template": step["prompt_template"],
-            },
-        )
-
-        if response:
-            st.session_state.messages.append(
-                {"role": "assistant", "content": response["response"]}
-            )
-
-            execute_task(st.session_state.current_step, response, prompt)
-
-            # Move to the next step
-            st.session_state.current_step += 1
-
-            # Add the next question if available
-            if st.session_state.current_step < len(steps):
-                next_step = steps[st.session_state.current_step]
-                st.session_state.messages.append(
-                    {
-                        "role": "assistant",
-                        "content": next_step["query"] + " " + next_step["placeholder"],
-                    }
-                )
+        data["prompt_template_name"] = steps[st.session_state.current_step]["prompt_template"]
 
+    # The answer is rendered token by token while it is generated; the business
+    # category is matched directly instead
+    with st.chat_message("assistant"):
+        if st.session_state.current_step == 0:
+            response = classify_business(prompt)
         else:
-            st.session_state.messages.append(
-                {
-                    "role": "assistant",
-                    "content": "I didn't get that. Can you please provide more details?",
-                }
-            )
+            response = stream_answer(data)
+
+    if st.session_state.current_step >= len(steps):
+        # Questionnaire finished: default Q&A flow
+        response_text = response["response"] if response else "Failed to get response"
+        st.session_state.messages.append({"role": "assistant", "content": response_text})
+        return
+
+    if response:
+        st.session_state.messages.append({"role": "assistant", "content": response["response"]})
+
+        execute_task(st.session_state.current_step, response, prompt)
+
+        # Move to the next step
+        st.session_state.current_step += 1
+
+        # Add the next question if available
+        if st.session_state.current_step < len(steps):
+            next_step = steps[st.session_state.current_step]
+            add_assistant_message(next_step["query"] + " " + next_step["placeholder"])
+
+    else:
+        add_assistant_message("I didn't get that. Can you please provide more details?")
 
 
 # Input field for user response
 prompt = st.chat_input("Your response here")
 
-if prompt and prompt.strip() != "" and len(prompt) <= 200:
-    handle_user_input(prompt)
-
 # Display chat messages
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.write(message["content"])
 
-# Handle assistant's response
-if st.session_state.messages and st.session_state.messages[-1]["role"] == "user":
-    with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            response = send_to_api(
-                "ask", data={"session_id": st.session_state.session_id, "query": prompt}
-            )
-            response_text = (
-                response["response"]
-                if response and "response" in response
-                else "Failed to get response"
-            )
-            print(f"***********************{response_text}****************************")
-            st.session_state.messages.append(
-                {"role": "assistant", "content": response_text}
-            )
+# New messages are rendered below the history as they arrive
+if prompt and prompt.strip() != "" and len(prompt) <= 200:
+    handle_user_input(prompt)